@@ -5,18 +5,50 @@ boto3のみで動作（依存パッケージゼロ）
 """
 import json
 import os
-from typing import Any, Dict
+import time
+import hashlib
+from typing import Any, Dict, Optional
 from datetime import datetime
 import base64
 import pytz
 
-from database import DiaryDatabase
+import cloudfront_signer
+import diary_export
+import diary_import
+import metrics
+import photo_ref
+import photo_upload
+from compression import compress_response
+from calendar_projection import sorted_month_entries
+from database import (
+    BATCH_GET_MAX_KEYS,
+    DiaryDatabase,
+    PHOTO_URL_CACHE_TTL_SECONDS,
+    SUMMARY_ATTRIBUTES,
+    make_excerpt,
+)
 from models import DiaryEntry
+from structured_logging import get_logger, is_debug_enabled, redact_headers, request_context
+
+logger = get_logger("api")
 
 # 環境変数
 DYNAMODB_TABLE = os.environ.get("DYNAMODB_TABLE_NAME")
 PHOTO_BUCKET = os.environ.get("PHOTO_BUCKET_NAME")
 ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS", "https://d1l985y7ocpo2p.cloudfront.net")
+# 写真URLの返却方式
+# - presigned: カレンダーに署名付きURLを埋め込む（デフォルト）
+# - redirect: カレンダーには署名付きの photo_ref のみを返し、GET /photo/{ref}（認可なし、<img> から読み込む）で
+#   署名付きURLへリダイレクト
+# - cloudfront: CloudFront 上の素のパスを返し、GET /photo/session で発行する署名付きCookieで認可
+PHOTO_URL_MODE = os.environ.get("PHOTO_URL_MODE", "presigned").lower()
+# ページサイズ（1リクエストあたりの最大件数）
+RECENT_DIARIES_PAGE_SIZE = 30
+CALENDAR_PAGE_SIZE = int(os.environ.get("CALENDAR_PAGE_SIZE", "200"))
+MAX_PAGE_SIZE = 500
+# 複数日の日記取得（GET /diary?from=&to= / ?dates=）の上限
+MAX_DIARY_RANGE_DAYS = 62
+MAX_DIARY_DATES = BATCH_GET_MAX_KEYS
 
 # データベース初期化
 db = DiaryDatabase(DYNAMODB_TABLE, PHOTO_BUCKET)
@@ -28,49 +60,124 @@ ALLOWED_ORIGINS_LIST = [origin.strip() for origin in ALLOWED_ORIGINS.split(",")
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     API Gateway Lambda Proxyイベントを処理
+    ルーティング後、Accept-Encoding に応じてレスポンスを圧縮する
+    処理時間の内訳は EMF で出力し、Server-Timing ヘッダーでも返す
+    """
+    headers = event.get("headers") or {}
+    request_id = get_request_id(event, context)
+    with request_context(request_id, headers), metrics.request_timer() as timer:
+        response = route_request(event, context)
+        with metrics.phase("compress"):
+            response = compress_response(response, get_header(headers, "Accept-Encoding"))
+        timer.finish()
+        
+        status = response.get("statusCode")
+        if metrics.SERVER_TIMING_ENABLED:
+            response["headers"] = {**(response.get("headers") or {}), "Server-Timing": timer.server_timing()}
+        metrics.emit(timer, route_name(event.get("httpMethod", ""), event.get("path", "")), status, request_id)
+        # アクセスログ（1リクエスト1行）
+        logger.info("%s %s %s", event.get("httpMethod"), event.get("path"), status, extra={"fields": {
+            "method": event.get("httpMethod"),
+            "path": event.get("path"),
+            "status": status,
+            "duration_ms": round(timer.total_ms, 2),
+            "cold_start": timer.cold_start,
+        }})
+        return response
+
+
+def get_request_id(event: Dict[str, Any], context: Any) -> Optional[str]:
+    """API Gateway のリクエストID（なければ Lambda のリクエストID）"""
+    request_id = (event.get("requestContext") or {}).get("requestId")
+    return request_id or getattr(context, "aws_request_id", None)
+
+
+def normalize_path(path: str) -> str:
+    """/prod/ プレフィックスとダブルスラッシュを除去（空のパスは "/"）"""
+    if path.startswith("/prod"):
+        path = path[5:]
+    while "//" in path:
+        path = path.replace("//", "/")
+    return path or "/"
+
+
+def route_name(method: str, path: str) -> str:
+    """
+    メトリクス用のルート名（パスパラメータはテンプレートに置き換える）
+    
+    ディメンションの値が増えすぎないよう、未知のパスはまとめて "other" とする
+    """
+    path = normalize_path(path)
+    if method == "OPTIONS":
+        return "OPTIONS"
+    if path in ("/", "/health", "/diary", "/diary/import", "/diary/export", "/prompt", "/photo/session"):
+        template = path
+    elif path.startswith("/diary/") and path.endswith("/photo"):
+        template = "/diary/{date}/photo"
+    elif path.startswith("/diary/") and path.endswith("/photo/confirm"):
+        template = "/diary/{date}/photo/confirm"
+    elif path.startswith("/diary/") and path.endswith(
+        ("/photo/multipart", "/photo/multipart/complete", "/photo/multipart/abort")
+    ):
+        template = "/diary/{date}" + path[path.index("/photo/multipart"):]
+    elif path.startswith("/diary/"):
+        template = "/diary/{date}"
+    elif path.startswith("/family/calendar/"):
+        template = "/family/calendar/{year}/{month}"
+    elif path.startswith("/my/calendar/"):
+        template = "/my/calendar/{year}/{month}"
+    elif path.startswith("/photo/"):
+        template = "/photo/{ref}"
+    else:
+        return "other"
+    return f"{method} {template}"
+
+
+def route_request(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    リクエストを各ハンドラーに振り分け
     認証はAPI Gateway JWT Authorizerで完了済み
     """
+    cors_headers = {}
     try:
         # リクエスト情報を取得
         path = event.get("path", "")
         method = event.get("httpMethod", "")
-        headers = event.get("headers", {})
-        query_params = event.get("queryStringParameters") or {}  # 将来的にページネーションやフィルタリングで使用予定
+        headers = event.get("headers") or {}
+        query_params = event.get("queryStringParameters") or {}
         body = event.get("body", "")
+        # バイナリメディアタイプ設定により、リクエストボディが base64 で届く場合がある
+        if body and event.get("isBase64Encoded"):
+            body = base64.b64decode(body).decode("utf-8")
         
         # パス正規化（/prod/ プレフィックスを削除、ダブルスラッシュを除去）
-        if path.startswith("/prod"):
-            path = path[5:]
-        # ダブルスラッシュを単一スラッシュに置換
-        while "//" in path:
-            path = path.replace("//", "/")
-        # 空のパスは "/" にする
-        if not path:
-            path = "/"
+        path = normalize_path(path)
         
-        print(f"Request: {method} {path}")
-        print(f"[DEBUG] Headers: {headers}")
-        print(f"[DEBUG] ALLOWED_ORIGINS_LIST: {ALLOWED_ORIGINS_LIST}")
+        if is_debug_enabled():
+            # Authorization などの認証情報はマスクする
+            logger.debug("Request headers", extra={"fields": {"headers": redact_headers(headers)}})
         
         # 動的CORS処理: リクエストのOriginを検証
         request_origin = headers.get("origin") or headers.get("Origin", "")
-        print(f"[DEBUG] Request Origin: '{request_origin}'")
         allowed_origin = get_allowed_origin(request_origin)
-        print(f"[DEBUG] Allowed Origin: '{allowed_origin}'")
         
         # CORSヘッダー（許可されたOriginのみ）
         cors_headers = {
-            "Access-Control-Allow-Methods": "GET,POST,DELETE,OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            "Access-Control-Allow-Methods": "GET,POST,PATCH,DELETE,OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization,If-None-Match",
+            "Access-Control-Expose-Headers": "ETag,Server-Timing",
         }
         
         # 許可されたOriginの場合のみAccess-Control-Allow-Originを追加
         if allowed_origin:
             cors_headers["Access-Control-Allow-Origin"] = allowed_origin
             cors_headers["Access-Control-Allow-Credentials"] = "true"
-            print(f"CORS: Allowed origin = {allowed_origin}")
+            # クロスオリジンでも Resource Timing API から Server-Timing を参照できるようにする
+            cors_headers["Timing-Allow-Origin"] = allowed_origin
+            logger.debug("CORS: allowed origin %s", allowed_origin)
         else:
-            print(f"CORS: Origin '{request_origin}' not in allowed list: {ALLOWED_ORIGINS_LIST}")
+            if request_origin:
+                logger.info("CORS: origin %s not in allowed list %s", request_origin, ALLOWED_ORIGINS_LIST)
             # プリフライト対応: 許可されたオリジンでなくても、OPTIONSレスポンスは返す
             # ただしAccess-Control-Allow-Originは設定しない
         
@@ -88,8 +195,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 return {
                     "statusCode": 200,
                     "headers": {
-                        "Access-Control-Allow-Methods": "GET,POST,DELETE,OPTIONS",
-                        "Access-Control-Allow-Headers": "Content-Type,Authorization",
+                        "Access-Control-Allow-Methods": "GET,POST,PATCH,DELETE,OPTIONS",
+                        "Access-Control-Allow-Headers": "Content-Type,Authorization,If-None-Match",
                     },
                     "body": ""
                 }
@@ -98,6 +205,10 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if path == "/health" and method == "GET":
             return handle_health(cors_headers)
         
+        # 写真参照のリダイレクト（<img> は Authorization を送れないため、ref の署名で認可）
+        if path.startswith("/photo/") and path != "/photo/session" and method == "GET":
+            return handle_get_photo(path[len("/photo/"):], cors_headers)
+        
         # 認証済みユーザー情報を取得（API Gateway Authorizerから）
         request_context = event.get("requestContext", {})
         authorizer = request_context.get("authorizer", {})
@@ -111,31 +222,56 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             # - それ以外は 401 を返す
             allow_dev_bypass = os.environ.get("ALLOW_DEV_AUTH_BYPASS", "").lower() == "true"
             if allow_dev_bypass:
-                print("Warning: No username in claims, using development bypass as 'test-user'")
+                logger.warning("No username in claims, using development bypass as 'test-user'")
                 username = "test-user"
             else:
-                print("Error: No username in claims and development bypass is disabled")
+                logger.error("No username in claims and development bypass is disabled")
                 return error_response(401, "認証情報が無効です", cors_headers)
         
-        print(f"Authenticated user: {username}")
+        logger.debug("Authenticated user: %s", username)
         
         # ルーティング（すべて認証済み）
         if path == "/" and method == "GET":
-            return handle_get_recent_diaries(username, cors_headers)
+            return handle_get_recent_diaries(username, query_params, cors_headers)
+        
+        # 複数日の日記取得（週表示など）
+        elif path == "/diary" and method == "GET":
+            return handle_get_diaries(username, query_params, headers, cors_headers)
+        
+        # エクスポート（/diary/{date} より先にチェック）
+        elif path == "/diary/export" and method == "GET":
+            return handle_export_diaries(username, cors_headers)
+        
+        # 一括インポート（/diary/{date} より先にチェック）
+        elif path == "/diary/import" and method == "POST":
+            return handle_import_diaries(username, body, headers, cors_headers)
         
         # 写真アップロード（より具体的なパスを先にチェック）
+        elif path.startswith("/diary/") and "/photo/multipart" in path and method == "POST":
+            prefix, _, action = path.partition("/photo/multipart")
+            date_str = prefix.split("/")[-1]
+            return handle_photo_multipart(username, date_str, action.lstrip("/"), body, cors_headers)
+        
+        elif path.startswith("/diary/") and path.endswith("/photo/confirm") and method == "POST":
+            date_str = path.split("/")[-3]
+            return handle_confirm_photo(username, date_str, body, cors_headers)
+        
         elif path.startswith("/diary/") and path.endswith("/photo") and method == "POST":
             date_str = path.split("/")[-2]
             return handle_upload_photo(username, date_str, body, cors_headers)
         
         elif path.startswith("/diary/") and method == "GET":
             date_str = path.split("/")[-1]
-            return handle_get_diary(username, date_str, cors_headers)
+            return handle_get_diary(username, date_str, headers, cors_headers)
         
         elif path.startswith("/diary/") and method == "POST":
             date_str = path.split("/")[-1]
             return handle_save_diary(username, date_str, body, cors_headers)
         
+        elif path.startswith("/diary/") and method == "PATCH":
+            date_str = path.split("/")[-1]
+            return handle_patch_diary(username, date_str, body, cors_headers)
+        
         elif path.startswith("/diary/") and method == "DELETE":
             date_str = path.split("/")[-1]
             return handle_delete_diary(username, date_str, cors_headers)
@@ -143,12 +279,15 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         elif path.startswith("/family/calendar/") and method == "GET":
             parts = path.split("/")
             year, month = int(parts[-2]), int(parts[-1])
-            return handle_get_calendar(username, year, month, cors_headers)
+            return handle_get_calendar(username, year, month, query_params, headers, cors_headers)
         
         elif path.startswith("/my/calendar/") and method == "GET":
             parts = path.split("/")
             year, month = int(parts[-2]), int(parts[-1])
-            return handle_get_my_calendar(username, year, month, cors_headers)
+            return handle_get_my_calendar(username, year, month, query_params, headers, cors_headers)
+        
+        elif path == "/photo/session" and method == "GET":
+            return handle_get_photo_session(username, cors_headers)
         
         elif path == "/prompt" and method == "GET":
             date_str = query_params.get("date") if query_params else None
@@ -160,39 +299,103 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # 404
         return error_response(404, "エンドポイントが見つかりません", cors_headers)
         
-    except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Unhandled error")
         return error_response(500, "内部サーバーエラー", cors_headers)
 
 
 def handle_health(headers: Dict) -> Dict:
     """ヘルスチェック"""
-    return success_response({"status": "healthy", "message": "API is running"}, headers)
+    return success_response({
+        "status": "healthy",
+        "message": "API is running",
+        "photo_url_cache": db.get_photo_url_cache_stats(),
+        "prompt_cache": db.get_prompt_cache_stats(),
+    }, headers)
 
 
-def handle_get_recent_diaries(username: str, headers: Dict) -> Dict:
-    """最近の日記一覧取得"""
-    entries = db.get_user_diaries(username, limit=30)
-    return success_response({"entries": entries}, headers)
+def handle_get_recent_diaries(username: str, query_params: Dict, headers: Dict) -> Dict:
+    """最近の日記一覧取得（カーソルページング）"""
+    try:
+        limit, cursor = parse_page_params(query_params, RECENT_DIARIES_PAGE_SIZE)
+        entries, next_cursor = db.get_user_diaries_page(username, limit=limit, cursor=cursor)
+    except ValueError:
+        return error_response(400, "無効なページング指定です", headers)
+    return success_response({"entries": entries, "next_cursor": next_cursor}, headers)
 
 
-def handle_get_diary(username: str, date_str: str, headers: Dict) -> Dict:
-    """特定日の日記取得"""
+def handle_get_diary(username: str, date_str: str, request_headers: Dict, headers: Dict) -> Dict:
+    """特定日の日記取得（If-None-Match 対応）"""
     entry = db.get_diary_entry(username, date_str)
     if not entry:
         return error_response(404, "日記が見つかりません", headers)
     
-    # 写真のS3キーから署名付きURLを生成
-    photo_url = ""
-    photos = entry.get("photos", [])
-    if photos and len(photos) > 0:
-        photo_key = photos[0]
-        photo_url = db.get_photo_url(photo_key) if photo_key else ""
+    with metrics.phase("transform"):
+        response_data = transform_diary_entry(entry, username)
+    return conditional_response(response_data, request_headers, headers)
+
+
+def handle_get_diaries(username: str, query_params: Dict, request_headers: Dict, headers: Dict) -> Dict:
+    """
+    複数日の日記をまとめて取得（週表示・前後の日の表示を1リクエストで行うため）
     
-    # フロントエンド向けにフィールド名を変換
-    response_data = {
+    - ?from=YYYY-MM-DD&to=YYYY-MM-DD: 期間内の日記（user_id-date-index の Query）
+    - ?dates=YYYY-MM-DD,YYYY-MM-DD,...: 指定日の日記（BatchGetItem）
+    
+    エントリは /diary/{date} と同じ形式で日付順に返す（日記がない日は含めない）。
+    どちらも指定しない場合は最近の日記一覧を返す
+    """
+    try:
+        if query_params.get("dates"):
+            entries = db.get_diary_entries(username, parse_date_list(query_params["dates"]))
+        elif query_params.get("from") or query_params.get("to"):
+            start_date, end_date = parse_date_range(query_params.get("from"), query_params.get("to"))
+            entries = db.get_diary_entries_range(username, start_date, end_date)
+        else:
+            return handle_get_recent_diaries(username, query_params, headers)
+    except ValueError as e:
+        return error_response(400, str(e), headers)
+    
+    with metrics.phase("transform"):
+        transformed_entries = [transform_diary_entry(entry, username) for entry in entries]
+    return conditional_response({"entries": transformed_entries}, request_headers, headers)
+
+
+def parse_date(value: str) -> str:
+    """YYYY-MM-DD 形式の日付を検証（不正な場合は ValueError）"""
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+    except (AttributeError, ValueError):
+        raise ValueError(f"無効な日付です: {value}")
+
+
+def parse_date_range(start: Optional[str], end: Optional[str]) -> tuple:
+    """from / to クエリパラメータを検証（両方必須、最大 MAX_DIARY_RANGE_DAYS 日）"""
+    if not start or not end:
+        raise ValueError("from と to の両方を指定してください")
+    start_date, end_date = parse_date(start), parse_date(end)
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+    if days < 1:
+        raise ValueError("to は from 以降の日付を指定してください")
+    if days > MAX_DIARY_RANGE_DAYS:
+        raise ValueError(f"期間は最大{MAX_DIARY_RANGE_DAYS}日です")
+    return start_date, end_date
+
+
+def parse_date_list(value: str) -> list:
+    """dates クエリパラメータ（カンマ区切り）を検証（最大 MAX_DIARY_DATES 件）"""
+    dates = sorted({parse_date(date) for date in value.split(",") if date.strip()})
+    if len(dates) > MAX_DIARY_DATES:
+        raise ValueError(f"日付は最大{MAX_DIARY_DATES}件です")
+    return dates
+
+
+def transform_diary_entry(entry: Dict, viewer: str) -> Dict:
+    """日記エントリをフロントエンド向けに変換（/diary/{date} と /diary の共通形式）"""
+    # 写真のS3キーから表示用URLを生成（縮小版があれば中サイズ）
+    photo_url = resolve_photo_url(display_photo_key(entry, "medium"), viewer)
+    
+    return {
         "entry_text": entry.get("content", ""),
         "photo_url": photo_url,
         "is_public": entry.get("is_public", "false") == "true",  # 文字列からbooleanに変換
@@ -202,7 +405,6 @@ def handle_get_diary(username: str, date_str: str, headers: Dict) -> Dict:
         "created_at": entry.get("created_at", ""),
         "updated_at": entry.get("updated_at", ""),
     }
-    return success_response(response_data, headers)
 
 
 def handle_save_diary(username: str, date_str: str, body: str, headers: Dict) -> Dict:
@@ -240,8 +442,109 @@ def handle_save_diary(username: str, date_str: str, body: str, headers: Dict) ->
     return success_response({"message": "日記を保存しました", "entry": entry.__dict__}, headers)
 
 
+# PATCH /diary/{date} で更新できる項目
+PATCHABLE_FIELDS = ("entry_text", "content", "mood", "weather", "is_public", "photo_url")
+
+
+def handle_patch_diary(username: str, date_str: str, body: str, headers: Dict) -> Dict:
+    """
+    日記の部分更新（変更した項目のみを送る。自動保存用）
+    
+    受け付ける項目: entry_text（または content）, mood, weather, is_public, photo_url（null / "" で写真を外す）
+    既存の日記のみ更新でき、日記がない場合は 404
+    """
+    try:
+        data = json.loads(body) if body else {}
+    except json.JSONDecodeError:
+        return error_response(400, "無効なJSON形式", headers)
+    if not isinstance(data, dict) or not data:
+        return error_response(400, "更新する項目がありません", headers)
+    
+    unknown = set(data) - set(PATCHABLE_FIELDS)
+    if unknown:
+        return error_response(400, f"更新できない項目です: {', '.join(sorted(unknown))}", headers)
+    try:
+        changes = parse_diary_changes(data)
+    except ValueError as e:
+        return error_response(400, str(e), headers)
+    
+    item = db.patch_diary_entry(username, date_str, changes)
+    if item is None:
+        return error_response(404, "日記が見つかりません", headers)
+    with metrics.phase("transform"):
+        transformed = transform_diary_entry(item, username)
+    return success_response(transformed, headers)
+
+
+def parse_diary_changes(data: Dict) -> Dict:
+    """PATCH の項目を日記テーブルの属性に変換（不正な値は ValueError）"""
+    changes: Dict[str, Any] = {}
+    if "entry_text" in data or "content" in data:
+        content = data.get("entry_text", data.get("content"))
+        if not content or not isinstance(content, str):
+            raise ValueError("日記内容が必要です")
+        changes["content"] = content
+        changes["excerpt"] = make_excerpt(content)
+    for field in ("mood", "weather"):
+        if field in data:
+            if not data[field] or not isinstance(data[field], str):
+                raise ValueError(f"{field} は文字列で指定してください")
+            changes[field] = data[field]
+    if "is_public" in data:
+        if not isinstance(data["is_public"], bool):
+            raise ValueError("is_public は true / false で指定してください")
+        changes["is_public"] = "true" if data["is_public"] else "false"
+    if "photo_url" in data:
+        photo_url = data["photo_url"]
+        if photo_url is not None and not isinstance(photo_url, str):
+            raise ValueError("photo_url は文字列で指定してください")
+        changes["photos"] = [photo_url] if photo_url else []
+    return changes
+
+
+def handle_export_diaries(username: str, headers: Dict) -> Dict:
+    """
+    全日記のエクスポート（NDJSON、バックアップ用）
+    
+    S3 にアップロードして署名付きのダウンロードURLを返す。
+    写真バケットが未設定のローカル環境では NDJSON をそのままレスポンスボディで返す
+    """
+    if db.s3_client is None:
+        return {
+            "statusCode": 200,
+            "headers": {
+                **headers,
+                "Content-Type": "application/x-ndjson; charset=utf-8",
+                "Content-Disposition": f'attachment; filename="{diary_export.export_filename(username)}"',
+            },
+            "body": diary_export.export_inline(db, username),
+        }
+    return success_response(diary_export.export_to_s3(db, username), headers)
+
+
+def handle_import_diaries(username: str, body: str, request_headers: Dict, headers: Dict) -> Dict:
+    """
+    日記の一括インポート（JSON 配列または NDJSON）
+    
+    エントリは BatchWriteItem で25件ずつ保存し、行ごとの結果をレポートとして返す
+    （一部の行が失敗しても 200。1件も読み込めない場合は 400）
+    """
+    if not body or not body.strip():
+        return error_response(400, "インポートするデータがありません", headers)
+    
+    report = diary_import.import_diaries(db, username, body, get_header(request_headers, "Content-Type"))
+    if report.total == 0:
+        return error_response(400, "インポートするデータがありません", headers)
+    return success_response(report.to_dict(), headers)
+
+
 def handle_upload_photo(username: str, date_str: str, body: str, headers: Dict) -> Dict:
-    """写真をS3にアップロード"""
+    """
+    写真のアップロード
+    
+    - {"content_type", "size"}: S3 に直接アップロードするための署名付き POST を返す（photo_upload 参照）
+    - {"image": base64}: 画像を Lambda で受け取って S3 に保存する（旧クライアント用）
+    """
     try:
         data = json.loads(body) if body else {}
     except json.JSONDecodeError:
@@ -249,7 +552,11 @@ def handle_upload_photo(username: str, date_str: str, body: str, headers: Dict)
     
     image_data = data.get("image")
     if not image_data:
-        return error_response(400, "画像データが必要です", headers)
+        try:
+            upload = photo_upload.create_upload(db, username, date_str, data.get("content_type"), data.get("size"))
+        except photo_upload.PhotoUploadError as e:
+            return error_response(400, str(e), headers)
+        return success_response(upload, headers)
     
     # Base64デコード
     try:
@@ -260,99 +567,395 @@ def handle_upload_photo(username: str, date_str: str, body: str, headers: Dict)
     # S3にアップロード（S3キーを返す）
     try:
         jst = pytz.timezone('Asia/Tokyo')
-        photo_key = f"{username}/{date_str}/{datetime.now(jst).timestamp()}.jpg"
+        # 家族の写真プレフィックス（photos/）配下に保存し、CloudFront からも配信できるようにする
+        photo_key = f"photos/{username}/{date_str}/{datetime.now(jst).timestamp()}.jpg"
         photo_key = db.upload_photo(username, date_str, image_bytes, photo_key)
         
-        # 表示用に24時間有効な署名付きURLも生成して返す
-        photo_url = db.get_photo_url(photo_key)
+        # 表示用URLも生成して返す（presigned モードでは24時間有効な署名付きURL）
+        photo_url = resolve_photo_url(photo_key, username)
         
         return success_response({"photo_url": photo_url, "photo_key": photo_key}, headers)
     except Exception as e:
         return error_response(500, f"アップロードエラー: {str(e)}", headers)
 
 
+def handle_confirm_photo(username: str, date_str: str, body: str, headers: Dict) -> Dict:
+    """署名付き POST でアップロードされた写真を確認し、日記に添付"""
+    try:
+        data = json.loads(body) if body else {}
+    except json.JSONDecodeError:
+        return error_response(400, "無効なJSON形式", headers)
+    
+    try:
+        result = photo_upload.confirm_upload(db, username, date_str, data.get("photo_key"))
+    except photo_upload.PhotoUploadError as e:
+        return error_response(400, str(e), headers)
+    
+    # 表示用URLも生成して返す（base64 アップロードと同じ形式）
+    return success_response({**result, "photo_url": resolve_photo_url(result["photo_key"], username)}, headers)
+
+
+def handle_photo_multipart(username: str, date_str: str, action: str, body: str, headers: Dict) -> Dict:
+    """
+    大きな写真のマルチパートアップロード（photo_upload 参照）
+    
+    - action なし: 開始（{"content_type", "size"}）または再開（{"photo_key", "upload_id", "size"}）
+    - complete: パートを結合して日記に添付（{"photo_key", "upload_id", "parts"}）
+    - abort: 中止（{"photo_key", "upload_id"}）
+    """
+    try:
+        data = json.loads(body) if body else {}
+    except json.JSONDecodeError:
+        return error_response(400, "無効なJSON形式", headers)
+    if not isinstance(data, dict):
+        return error_response(400, "無効なJSON形式", headers)
+    
+    try:
+        if action == "":
+            if data.get("upload_id"):
+                result = photo_upload.resume_multipart_upload(
+                    db, username, date_str, data.get("photo_key"), data.get("upload_id"), data.get("size")
+                )
+            else:
+                result = photo_upload.create_multipart_upload(
+                    db, username, date_str, data.get("content_type"), data.get("size")
+                )
+        elif action == "complete":
+            result = photo_upload.complete_multipart_upload(
+                db, username, date_str, data.get("photo_key"), data.get("upload_id"), data.get("parts")
+            )
+            result = {**result, "photo_url": resolve_photo_url(result["photo_key"], username)}
+        elif action == "abort":
+            result = photo_upload.abort_multipart_upload(
+                db, username, date_str, data.get("photo_key"), data.get("upload_id")
+            )
+        else:
+            return error_response(404, "エンドポイントが見つかりません", headers)
+    except photo_upload.PhotoUploadError as e:
+        return error_response(400, str(e), headers)
+    return success_response(result, headers)
+
+
 def handle_delete_diary(username: str, date_str: str, headers: Dict) -> Dict:
     """日記削除"""
     db.delete_diary_entry(username, date_str)
     return success_response({"message": "日記を削除しました"}, headers)
 
 
-def handle_get_calendar(username: str, year: int, month: int, headers: Dict) -> Dict:
-    """カレンダー取得（公開日記のみ、全ユーザー）"""
-    entries = db.get_calendar_entries(username, year, month)
+def handle_get_calendar(
+    username: str, year: int, month: int, query_params: Dict, request_headers: Dict, headers: Dict
+) -> Dict:
+    """
+    カレンダー取得（公開日記のみ、全ユーザー）
+    
+    月次ドキュメントがあれば GetItem 1回で返し、なければ GSI をカーソルページングで Query する
+    月次ドキュメントのバージョンを ETag にし、If-None-Match が一致すればエントリを読まずに 304 を返す
+    """
+    try:
+        limit, cursor = parse_page_params(query_params, CALENDAR_PAGE_SIZE)
+        view = parse_calendar_view(query_params)
+    except ValueError:
+        return error_response(400, "無効なページング指定です", headers)
+    
+    etag = None
+    document = None
+    if not cursor:
+        if_none_match = get_header(request_headers, "If-None-Match")
+        if if_none_match:
+            version = db.get_calendar_month_version(year, month)
+            if version is not None:
+                etag = calendar_version_etag(year, month, version, view, username)
+                if etag_matches(if_none_match, etag):
+                    return not_modified_response(etag, headers)
+        document = db.get_calendar_month_document(year, month)
+    
+    try:
+        if document is not None:
+            entries, next_cursor = sorted_month_entries(document), None
+            if view == "full":
+                # 月次ドキュメントは本文を含まない（アイテムサイズの上限のため）
+                entries = db.load_entry_contents(entries)
+            etag = calendar_version_etag(year, month, document["version"], view, username)
+        else:
+            entries, next_cursor = db.get_calendar_entries_page(
+                username, year, month, limit=limit, cursor=cursor, attributes=calendar_view_attributes(view)
+            )
+            etag = None
+    except ValueError:
+        return error_response(400, "無効なページング指定です", headers)
     
     # フロントエンド向けにフィールド名を変換
-    transformed_entries = []
-    for entry in entries:
-        # 写真のS3キーから署名付きURLを生成
-        photo_url = ""
-        photos = entry.get("photos", [])
-        if photos and len(photos) > 0:
-            photo_key = photos[0]
-            photo_url = db.get_photo_url(photo_key) if photo_key else ""
-        
-        transformed_entry = {
-            "user_id": entry.get("user_id", ""),
-            "date": entry.get("date", ""),
-            "entry_text": entry.get("content", ""),
-            "photo_url": photo_url,
-            "is_public": entry.get("is_public", "false") == "true",
-            "mood": entry.get("mood", "normal"),
-            "weather": entry.get("weather", "sunny"),
-            "created_at": entry.get("created_at", ""),
-            "updated_at": entry.get("updated_at", ""),
-        }
-        transformed_entries.append(transformed_entry)
+    with metrics.phase("transform"):
+        transformed_entries = [transform_calendar_view(entry, view, username) for entry in entries]
     
-    return success_response({"entries": transformed_entries}, headers)
+    return conditional_response(
+        {"entries": transformed_entries, "next_cursor": next_cursor}, request_headers, headers, etag=etag
+    )
 
 
-def handle_get_my_calendar(username: str, year: int, month: int, headers: Dict) -> Dict:
-    """自分のカレンダー取得（公開・非公開の両方）"""
-    entries = db.query_month(username, year, month)
+def calendar_version_etag(year: int, month: int, version: Any, view: str = "full", viewer: str = "") -> str:
+    """
+    月次ドキュメントのバージョンから ETag を生成
+    
+    署名付きURLを埋め込むモードでは、URLが入れ替わる周期（URLキャッシュのTTL）も含め、
+    クライアントが期限切れ間近のURLを使い続けないようにする。
+    cloudfront / redirect モードは閲覧者によって写真URL・参照が変わるため閲覧者も含める
+    """
+    if view == "summary":
+        # サマリー表示は写真URLを含まない
+        return f'W/"cal-{year:04d}-{month:02d}-v{int(version)}-summary"'
+    suffix = PHOTO_URL_MODE
+    if PHOTO_URL_MODE in ("presigned", "cloudfront"):
+        # cloudfront モードでも他のユーザーの写真は署名付きURL
+        suffix += f"-{int(time.time() // PHOTO_URL_CACHE_TTL_SECONDS)}"
+    elif PHOTO_URL_MODE == "redirect":
+        suffix += f"-{photo_ref.rotation_period()}"
+    if PHOTO_URL_MODE in ("cloudfront", "redirect"):
+        suffix += f"-{hashlib.sha256(viewer.encode('utf-8')).hexdigest()[:12]}"
+    return f'W/"cal-{year:04d}-{month:02d}-v{int(version)}-{suffix}"'
+
+
+def handle_get_my_calendar(
+    username: str, year: int, month: int, query_params: Dict, request_headers: Dict, headers: Dict
+) -> Dict:
+    """自分のカレンダー取得（公開・非公開の両方、カーソルページング）"""
+    try:
+        limit, cursor = parse_page_params(query_params, CALENDAR_PAGE_SIZE)
+        view = parse_calendar_view(query_params)
+        entries, next_cursor = db.query_month_page(
+            username, year, month, limit=limit, cursor=cursor, attributes=calendar_view_attributes(view)
+        )
+    except ValueError:
+        return error_response(400, "無効なページング指定です", headers)
     
     # フロントエンド向けにフィールド名を変換
-    transformed_entries = []
-    for entry in entries:
-        # 写真のS3キーから署名付きURLを生成
-        photo_url = ""
-        photos = entry.get("photos", [])
-        if photos and len(photos) > 0:
-            photo_key = photos[0]
-            photo_url = db.get_photo_url(photo_key) if photo_key else ""
-        
-        transformed_entry = {
-            "user_id": entry.get("user_id", ""),
-            "date": entry.get("date", ""),
-            "entry_text": entry.get("content", ""),
-            "photo_url": photo_url,
-            "is_public": entry.get("is_public", "false") == "true",
-            "mood": entry.get("mood", "normal"),
-            "weather": entry.get("weather", "sunny"),
-            "created_at": entry.get("created_at", ""),
-            "updated_at": entry.get("updated_at", ""),
-        }
-        transformed_entries.append(transformed_entry)
+    with metrics.phase("transform"):
+        transformed_entries = [transform_calendar_view(entry, view, username) for entry in entries]
+    
+    return conditional_response(
+        {"entries": transformed_entries, "next_cursor": next_cursor}, request_headers, headers
+    )
+
+
+def parse_page_params(query_params: Dict, default_limit: int) -> tuple:
+    """
+    クエリパラメータ limit / cursor を取得
+    
+    Returns:
+        (limit, cursor)。limit は 1〜MAX_PAGE_SIZE に制限
+    
+    Raises:
+        ValueError: limit が数値でない場合
+    """
+    query_params = query_params or {}
+    limit = int(query_params.get("limit") or default_limit)
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {limit}")
+    return min(limit, MAX_PAGE_SIZE), query_params.get("cursor") or None
+
+
+def parse_calendar_view(query_params: Dict) -> str:
+    """
+    クエリパラメータ view を取得
+    
+    Returns:
+        "full"（デフォルト、本文と写真URLを含む）または "summary"（抜粋と写真有無のみ）
+    
+    Raises:
+        ValueError: 未知の view の場合
+    """
+    view = (query_params or {}).get("view") or "full"
+    if view not in ("full", "summary"):
+        raise ValueError(f"Invalid view: {view}")
+    return view
+
+
+def calendar_view_attributes(view: str) -> Optional[tuple]:
+    """view に応じて Query で読み込む属性（summary は本文を読まない）"""
+    return SUMMARY_ATTRIBUTES if view == "summary" else None
+
+
+def transform_calendar_view(entry: Dict, view: str, viewer: str) -> Dict:
+    """view に応じてカレンダーのエントリを変換"""
+    if view == "summary":
+        return transform_calendar_summary(entry)
+    return transform_calendar_entry(entry, viewer)
+
+
+def transform_calendar_summary(entry: Dict) -> Dict:
+    """
+    DynamoDBアイテムをカレンダーのサマリー表示用の形式に変換
     
-    return success_response({"entries": transformed_entries}, headers)
+    本文全体は GET /diary/{date} で必要になった時に取得する
+    """
+    excerpt = entry.get("excerpt")
+    if excerpt is None:
+        # excerpt 属性がない古いアイテム（月次ドキュメント経由なら本文から作成できる）
+        excerpt = make_excerpt(entry.get("content", ""))
+    return {
+        "user_id": entry.get("user_id", ""),
+        "date": entry.get("date", ""),
+        "excerpt": excerpt,
+        "has_photo": bool(entry.get("photos")),
+        "is_public": entry.get("is_public", "false") == "true",
+        "mood": entry.get("mood", "normal"),
+        "weather": entry.get("weather", "sunny"),
+    }
+
+
+def transform_calendar_entry(entry: Dict, viewer: str) -> Dict:
+    """DynamoDBアイテムをカレンダー表示用の形式に変換（viewer は閲覧するユーザー）"""
+    transformed_entry = {
+        "user_id": entry.get("user_id", ""),
+        "date": entry.get("date", ""),
+        "entry_text": entry.get("content", ""),
+        "is_public": entry.get("is_public", "false") == "true",
+        "mood": entry.get("mood", "normal"),
+        "weather": entry.get("weather", "sunny"),
+        "created_at": entry.get("created_at", ""),
+        "updated_at": entry.get("updated_at", ""),
+    }
+    transformed_entry.update(build_calendar_photo_fields(entry, viewer))
+    return transformed_entry
+
+
+def build_calendar_photo_fields(entry: Dict, viewer: str) -> Dict:
+    """
+    カレンダー用の写真フィールドを生成
+    
+    - presigned モード: photo_url に署名付きURLを埋め込む
+    - redirect モード: photo_ref（GET /photo/{ref} 用の閲覧者ごとの署名付き参照）のみを返す
+    - cloudfront モード: 閲覧者本人の写真は photo_url に CloudFront 上の素のパス、他のユーザーの写真は署名付きURL
+    """
+    photo_key = display_photo_key(entry, "thumb")
+    
+    if PHOTO_URL_MODE == "redirect":
+        return {"photo_ref": photo_ref.issue_photo_ref(viewer, photo_key) if photo_key else ""}
+    
+    # 写真のS3キーから表示用URLを生成
+    return {"photo_url": resolve_photo_url(photo_key, viewer)}
+
+
+def display_photo_key(entry: Dict, rendition: str) -> str:
+    """
+    表示する写真（先頭1枚）のS3キー
+    
+    縮小版が作成済み（rendered_photos に記録済み）なら縮小版、そうでなければ元の写真のキー
+    """
+    photos = entry.get("photos") or []
+    if not photos:
+        return ""
+    photo_key = db.extract_photo_key_from_url_or_key(photos[0])
+    if photo_key in (entry.get("rendered_photos") or []):
+        return photo_upload.rendition_key(photo_key, rendition)
+    return photo_key
+
+
+def resolve_photo_url(photo_key: str, viewer: str) -> str:
+    """
+    写真の表示用URLを生成
+    
+    cloudfront モードでは閲覧者本人の写真プレフィックス配下のキーを CloudFront の素のパスとして返す
+    （認可は本人のプレフィックスに限定した署名付きCookieで行う）。それ以外は署名付きURL
+    """
+    if not photo_key:
+        return ""
+    
+    if PHOTO_URL_MODE == "cloudfront":
+        s3_key = db.extract_photo_key_from_url_or_key(photo_key)
+        if cloudfront_signer.is_cdn_photo_key(s3_key, viewer):
+            return cloudfront_signer.get_cdn_photo_url(s3_key)
+    
+    return db.get_photo_url(photo_key)
+
+
+def handle_get_photo_session(username: str, headers: Dict) -> Dict:
+    """
+    自分の写真を閲覧するための CloudFront 署名付きCookieを発行（期限が近づくまでセッションごとに1回）
+    
+    API とは別ドメインのため Set-Cookie は使わず、フロントエンドがレスポンスボディの値を
+    CloudFront のドメインに設定する（apiService.ensurePhotoSession）
+    """
+    if PHOTO_URL_MODE != "cloudfront":
+        return error_response(404, "エンドポイントが見つかりません", headers)
+    
+    with metrics.phase("presign"):
+        issued = cloudfront_signer.issue_photo_cookies(username)
+    return success_response(issued, headers)
+
+
+def handle_get_photo(ref: str, headers: Dict) -> Dict:
+    """
+    写真参照から署名付きURLへリダイレクト（302）
+    
+    ref は photo_ref.issue_photo_ref で発行した閲覧者ごとの署名付きトークン（API Gateway の認可なし）。
+    閲覧者本人の写真、または公開日記に添付された写真のみアクセス可能
+    """
+    try:
+        viewer, photo_key, expires_at = photo_ref.verify_photo_ref(ref)
+    except ValueError:
+        # 期限切れの ref はカレンダーの再取得で新しいものに入れ替わる
+        return error_response(404, "写真が見つかりません", headers)
+    
+    if not can_view_photo(viewer, photo_key):
+        # 存在有無を漏らさないよう、権限なしも 404 とする
+        return error_response(404, "写真が見つかりません", headers)
+    
+    photo_url = db.get_photo_url(photo_key)
+    if not photo_url:
+        return error_response(404, "写真が見つかりません", headers)
+    
+    # 署名付きURLはキャッシュTTL以上の有効期間が残っているため、リダイレクト自体も
+    # その間（ref の期限を超えない範囲で）キャッシュ可能
+    max_age = max(0, min(PHOTO_URL_CACHE_TTL_SECONDS, expires_at - int(time.time())))
+    return {
+        "statusCode": 302,
+        "headers": {
+            **headers,
+            "Location": photo_url,
+            "Cache-Control": f"private, max-age={max_age}",
+        },
+        "body": "",
+    }
+
+
+def can_view_photo(username: str, photo_key: str) -> bool:
+    """
+    写真の閲覧権限を確認
+    
+    S3キーは "{username}/{date}/..." または "photos/{username}/{date}/..." 形式
+    （縮小版は元の写真と同じ権限）
+    """
+    parsed = photo_upload.parse_photo_key(photo_key)
+    if parsed is None:
+        return False
+    
+    owner, date_str = parsed
+    if owner == username:
+        return True
+    
+    # 他のユーザーの写真は、公開日記に添付されている場合のみ許可
+    entry = db.get_diary_entry(owner, date_str)
+    if not entry or entry.get("is_public", "false") != "true":
+        return False
+    
+    attached_keys = [db.extract_photo_key_from_url_or_key(photo) for photo in entry.get("photos", [])]
+    return photo_upload.original_photo_key(photo_key) in attached_keys
 
 
 def handle_get_prompt(date_str: str, headers: Dict) -> Dict:
     """指定日のお題を取得"""
-    print(f"[DEBUG] Fetching prompt for date: {date_str}")
     prompt_item = db.get_prompt(date_str)
-    print(f"[DEBUG] Prompt item retrieved: {prompt_item}")
     
     if not prompt_item:
         # お題が存在しない場合、デフォルトメッセージを返す
-        print(f"[DEBUG] No prompt found for {date_str}")
+        logger.debug("No prompt found for %s", date_str)
         return success_response({
             "date": date_str,
             "prompt": None,
             "message": "お題はまだ生成されていません"
         }, headers)
     
-    print(f"[DEBUG] Returning prompt: {prompt_item.get('prompt')}")
     return success_response({
         "date": prompt_item.get("date"),
         "prompt": prompt_item.get("prompt"),
@@ -361,15 +964,81 @@ def handle_get_prompt(date_str: str, headers: Dict) -> Dict:
     }, headers)
 
 
+def serialize(data: Any) -> str:
+    """レスポンスボディの JSON 文字列化"""
+    with metrics.phase("serialize"):
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
 def success_response(data: Any, headers: Dict) -> Dict:
     """成功レスポンス"""
     return {
         "statusCode": 200,
         "headers": {**headers, "Content-Type": "application/json"},
-        "body": json.dumps(data, ensure_ascii=False, default=str)
+        "body": serialize(data),
+    }
+
+
+def conditional_response(data: Any, request_headers: Dict, headers: Dict, etag: Optional[str] = None) -> Dict:
+    """
+    ETag 付きの成功レスポンス
+    
+    etag を省略した場合はレスポンスボディのハッシュから生成する。
+    If-None-Match が一致した場合はボディなしの 304 を返す
+    """
+    body = serialize(data)
+    if etag is None:
+        etag = 'W/"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+    
+    if etag_matches(get_header(request_headers, "If-None-Match"), etag):
+        return not_modified_response(etag, headers)
+    
+    return {
+        "statusCode": 200,
+        "headers": {
+            **headers,
+            "Content-Type": "application/json",
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+        },
+        "body": body,
     }
 
 
+def not_modified_response(etag: str, headers: Dict) -> Dict:
+    """304 Not Modified レスポンス"""
+    return {
+        "statusCode": 304,
+        "headers": {**headers, "ETag": etag, "Cache-Control": "private, no-cache"},
+        "body": "",
+    }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match ヘッダーが ETag と一致するか（弱い比較）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    
+    return any(opaque(candidate) == opaque(etag) for candidate in if_none_match.split(","))
+
+
+def get_header(headers: Optional[Dict], name: str) -> str:
+    """リクエストヘッダーを大文字小文字を区別せずに取得"""
+    if not headers:
+        return ""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value or ""
+    return ""
+
+
 def get_allowed_origin(request_origin: str) -> str:
     """
     リクエストのOriginが許可リストに含まれているか検証
@@ -392,7 +1061,7 @@ def get_allowed_origin(request_origin: str) -> str:
         # 開発環境バイパスが有効な場合のみ許可
         allow_dev_bypass = os.environ.get("ALLOW_DEV_CORS_BYPASS", "").lower() == "true"
         if allow_dev_bypass:
-            print(f"Warning: Development CORS bypass enabled for {request_origin}")
+            logger.warning("Development CORS bypass enabled for %s", request_origin)
             return request_origin
     
     return ""
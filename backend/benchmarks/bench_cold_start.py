@@ -0,0 +1,445 @@
+"""
+Lambda エントリポイントのコールドスタート・インポート時間ベンチマーク
+
+各エントリポイントを新しいインタープリタで読み込み、以下を計測する
+- インポート時間と -X importtime の内訳（上位のモジュール）
+- 最初のイベント処理までの時間（インポート + 1件目のイベント）と、2回目（ウォーム）の処理時間
+- ピークRSS
+
+boto3 の通信はスタブに置き換える（botocore.client の読み込み時に _make_request を差し替えるため、
+boto3 自体のインポートとクライアント生成のコストは計測に含まれる）。外部HTTP（requests）も同様
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --json --output cold_start.json
+    python benchmarks/bench_cold_start.py --compare cold_start.json   # 前回の結果との差分
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# 子プロセスの環境変数（実際の AWS には接続しない）
+BENCH_ENV = {
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "AWS_SESSION_TOKEN": "bench",
+    "AWS_DEFAULT_REGION": "us-west-2",
+    "AWS_REGION": "us-west-2",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "DYNAMODB_TABLE_NAME": "bench-diary-entries",
+    "DYNAMODB_PROMPTS_TABLE_NAME": "bench-diary-prompts",
+    "PHOTO_BUCKET_NAME": "bench-photos",
+    "DIARY_DB_BACKEND": "dynamodb",
+}
+
+API_GATEWAY_CLAIMS = {"claims": {"cognito:username": "bench-user", "sub": "bench-user"}}
+
+
+def api_gateway_event(method: str, path: str) -> Dict:
+    """API Gateway（REST, Lambda Proxy）形式のイベント"""
+    return {
+        "httpMethod": method,
+        "path": path,
+        "resource": path,
+        "headers": {"Origin": "http://localhost:3000", "Accept-Encoding": "gzip"},
+        "queryStringParameters": None,
+        "body": None,
+        "isBase64Encoded": False,
+        "requestContext": {"authorizer": API_GATEWAY_CLAIMS, "httpMethod": method, "path": path},
+    }
+
+
+# 計測対象: モジュール名、ハンドラー名、順に処理するイベント（最初のイベントをウォーム計測にも使う）
+TARGETS = {
+    "api_handler": {
+        "module": "api_handler",
+        "handler": "lambda_handler",
+        "events": [
+            ["GET /my/calendar", api_gateway_event("GET", "/my/calendar/2026/2")],
+            ["GET /health", api_gateway_event("GET", "/health")],
+        ],
+    },
+    "lambda_handler": {
+        "module": "lambda_handler",
+        "handler": "handler",
+        "events": [
+            ["GET /health", api_gateway_event("GET", "/health")],
+        ],
+    },
+    "prompt_generator_lambda": {
+        "module": "prompt_generator_lambda",
+        "handler": "lambda_handler",
+        "events": [
+            ["scheduled", {"source": "aws.events", "detail-type": "Scheduled Event", "detail": {}}],
+        ],
+    },
+}
+
+# 子プロセスで実行するコード（設定は argv[1] の JSON で受け取り、結果は最終行に JSON で出力）
+CHILD_CODE = r'''
+import time
+_t0 = time.perf_counter()
+import importlib.abc, importlib.util, io, json, resource, sys, traceback
+
+config = json.loads(sys.argv[1])
+sys.path.insert(0, config["backend_dir"])
+
+# ===== boto3 スタブ =====
+CANNED = {
+    "GetItem": {},
+    "PutItem": {},
+    "UpdateItem": {"Attributes": {}},
+    "DeleteItem": {},
+    "Query": {"Items": [], "Count": 0, "ScannedCount": 0},
+    "Scan": {"Items": [], "Count": 0, "ScannedCount": 0},
+    "BatchGetItem": {"Responses": {}, "UnprocessedKeys": {}},
+    "BatchWriteItem": {"UnprocessedItems": {}},
+    "DescribeTable": {"Table": {"TableStatus": "ACTIVE"}},
+    "GetParameter": {"Parameter": {"Value": ""}},
+}
+stub_calls = []
+
+
+class _FakeHTTPResponse:
+    status_code = 200
+    headers = {}
+    content = b""
+
+
+def _fake_make_request(self, operation_model, request_dict, request_context):
+    name = operation_model.name
+    stub_calls.append(name)
+    if name == "InvokeModel":
+        body = {"content": [{"type": "text", "text": "今日いちばん嬉しかったことは？"}]}
+        return _FakeHTTPResponse(), {"body": io.BytesIO(json.dumps(body).encode("utf-8")), "ResponseMetadata": {}}
+    return _FakeHTTPResponse(), dict(CANNED.get(name, {}), ResponseMetadata={})
+
+
+class _PatchOnImport(importlib.abc.MetaPathFinder):
+    """指定モジュールの読み込み直後にパッチを適用する（インポート順・コストは変えない）"""
+
+    def __init__(self, name, patch):
+        self.name = name
+        self.patch = patch
+
+    def find_spec(self, name, path, target=None):
+        if name != self.name:
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        exec_module = spec.loader.exec_module
+
+        def patched_exec(module):
+            exec_module(module)
+            self.patch(module)
+
+        spec.loader.exec_module = patched_exec
+        return spec
+
+
+def _patch_botocore(module):
+    module.BaseClient._make_request = _fake_make_request
+
+
+def _patch_requests(module):
+    import requests
+
+    def fake_request(self, method, url, **kwargs):
+        stub_calls.append(f"HTTP {method}")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"<?xml version='1.0'?><rss><channel></channel></rss>"
+        response.url = url
+        return response
+
+    module.Session.request = fake_request
+
+
+sys.meta_path.insert(0, _PatchOnImport("botocore.client", _patch_botocore))
+sys.meta_path.insert(0, _PatchOnImport("requests.sessions", _patch_requests))
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS はバイト単位
+
+
+class _Context:
+    function_name = "bench"
+    memory_limit_in_mb = 512
+    aws_request_id = "bench-request"
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+result = {"ok": False, "error": None, "events": []}
+_started = time.perf_counter()
+try:
+    # importlib.import_module は -X importtime に記録されないため __import__ を使う
+    __import__(config["module"])
+    module = sys.modules[config["module"]]
+except BaseException as e:
+    result["error"] = f"{type(e).__name__}: {e}"
+    result["import_ms"] = (time.perf_counter() - _started) * 1000
+    result["peak_rss_kb"] = peak_rss_kb()
+else:
+    result["import_ms"] = (time.perf_counter() - _started) * 1000
+    result["rss_after_import_kb"] = peak_rss_kb()
+    handler = getattr(module, config["handler"])
+    try:
+        for name, event in config["events"]:
+            calls_before = len(stub_calls)
+            start = time.perf_counter()
+            response = handler(event, _Context())
+            status = response.get("statusCode") if isinstance(response, dict) else None
+            result["events"].append({
+                "name": name,
+                "ms": (time.perf_counter() - start) * 1000,
+                "status": status,
+                "stubbed_calls": stub_calls[calls_before:],
+            })
+        # 最初のイベントをもう一度（ウォーム状態）
+        name, event = config["events"][0]
+        start = time.perf_counter()
+        handler(event, _Context())
+        result["warm_ms"] = (time.perf_counter() - start) * 1000
+        result["ok"] = True
+    except BaseException as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc(limit=5)
+    result["peak_rss_kb"] = peak_rss_kb()
+
+if result["events"]:
+    result["first_event_ms"] = result["events"][0]["ms"]
+    result["time_to_first_event_ms"] = result["import_ms"] + result["first_event_ms"]
+result["child_startup_ms"] = (_started - _t0) * 1000
+sys.stdout.flush()
+print("\n__BENCH_RESULT__" + json.dumps(result, ensure_ascii=False))
+'''
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    -X importtime の出力をパース
+
+    name の先頭の空白（1 + 2 × 深さ）がネストの深さを表し、子モジュールの行は親の行より先に出力される
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, rest = line.split(":", 1)
+            self_us, cumulative_us, name = rest.split("|", 2)
+        except ValueError:
+            continue
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip(" ")) - 1) // 2,
+        })
+    return entries
+
+
+def direct_imports(entries: List[Dict], module: str) -> List[Dict]:
+    """エントリポイントのモジュールが直接インポートした（初回読み込みの）モジュール"""
+    pending: List[Dict] = []
+    for entry in entries:
+        if entry["depth"] == 1:
+            pending.append(entry)
+        elif entry["depth"] == 0:
+            if entry["module"] == module:
+                return pending
+            pending = []
+    return []
+
+
+def summarize_importtime(entries: List[Dict], module: str, top: int) -> Dict:
+    """インポート時間の内訳を要約（エントリポイント直下の累積時間、自身の時間の上位）"""
+    target = next((e for e in entries if e["depth"] == 0 and e["module"] == module), None)
+    children = sorted(direct_imports(entries, module), key=lambda x: x["cumulative_us"], reverse=True)[:top]
+    by_self = sorted(entries, key=lambda x: x["self_us"], reverse=True)[:top]
+    return {
+        "modules_imported": len(entries),
+        "entry_point_ms": round(target["cumulative_us"] / 1000, 2) if target else None,
+        "top_cumulative": [{"module": e["module"], "ms": round(e["cumulative_us"] / 1000, 2)} for e in children],
+        "top_self": [{"module": e["module"], "ms": round(e["self_us"] / 1000, 2)} for e in by_self],
+    }
+
+
+def run_child(target: Dict, importtime: bool, timeout: float) -> Dict:
+    """新しいインタープリタでエントリポイントを1回計測"""
+    config = {
+        "backend_dir": os.path.abspath(BACKEND_DIR),
+        "module": target["module"],
+        "handler": target["handler"],
+        "events": target["events"],
+    }
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", CHILD_CODE, json.dumps(config)]
+
+    env = {key: value for key, value in os.environ.items() if not key.startswith("AWS_")}
+    env.update(BENCH_ENV)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd=config["backend_dir"], timeout=timeout)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    marker = "__BENCH_RESULT__"
+    if marker not in proc.stdout:
+        return {"ok": False, "error": f"child exited with {proc.returncode}: {proc.stderr.strip()[-500:]}", "process_wall_ms": wall_ms}
+    result = json.loads(proc.stdout.rsplit(marker, 1)[1].strip())
+    result["process_wall_ms"] = wall_ms
+    if importtime:
+        result["importtime"] = parse_importtime(proc.stderr)
+    return result
+
+
+def median_of(runs: List[Dict], key: str) -> Optional[float]:
+    values = [run[key] for run in runs if run.get(key) is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def bench_target(target: Dict, repeat: int, top: int, timeout: float) -> Dict:
+    """1つのエントリポイントを計測（1回目は -X importtime 付きで内訳のみ取得）"""
+    profile = run_child(target, importtime=True, timeout=timeout)
+    runs = [run_child(target, importtime=False, timeout=timeout) for _ in range(repeat)]
+
+    first = runs[0] if runs else profile
+    report = {
+        "ok": all(run.get("ok") for run in runs) if runs else profile.get("ok", False),
+        "error": first.get("error"),
+        "runs": len(runs),
+        "process_wall_ms": median_of(runs, "process_wall_ms"),
+        "import_ms": median_of(runs, "import_ms"),
+        "first_event_ms": median_of(runs, "first_event_ms"),
+        "time_to_first_event_ms": median_of(runs, "time_to_first_event_ms"),
+        "warm_ms": median_of(runs, "warm_ms"),
+        "peak_rss_kb": median_of(runs, "peak_rss_kb"),
+        "events": [
+            {
+                "name": event["name"],
+                "status": event["status"],
+                "ms": median_of([{"ms": run["events"][i]["ms"]} for run in runs if len(run.get("events", [])) > i], "ms"),
+                "stubbed_calls": event["stubbed_calls"],
+            }
+            for i, event in enumerate(first.get("events", []))
+        ],
+        "importtime": summarize_importtime(profile.get("importtime", []), target["module"], top),
+    }
+    return report
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BACKEND_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def baseline_interpreter_ms(repeat: int) -> float:
+    """素のインタープリタ起動時間（比較用）"""
+    samples = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def run(targets: List[str], repeat: int, top: int, timeout: float) -> Dict:
+    try:
+        import boto3
+        boto3_version = boto3.__version__
+    except ImportError:
+        boto3_version = None
+
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "boto3": boto3_version,
+            "repeat": repeat,
+            "interpreter_startup_ms": baseline_interpreter_ms(repeat),
+        },
+        "targets": {name: bench_target(TARGETS[name], repeat, top, timeout) for name in targets},
+    }
+
+
+COMPARE_KEYS = ("import_ms", "time_to_first_event_ms", "warm_ms", "peak_rss_kb")
+
+
+def compare(base: Dict, current: Dict) -> List[str]:
+    """2つの結果の主要な指標の差分"""
+    lines = [f"base {base['meta'].get('git_revision')} -> current {current['meta'].get('git_revision')}"]
+    for name, result in current["targets"].items():
+        previous = base.get("targets", {}).get(name)
+        if not previous:
+            continue
+        for key in COMPARE_KEYS:
+            old, new = previous.get(key), result.get(key)
+            if old is None or new is None:
+                continue
+            change = f"{100 * (new - old) / old:+.1f}%" if old else "n/a"
+            lines.append(f"{name:<24} {key:<24} {old:>10} -> {new:>10} ({change})")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark cold start of backend Lambda entry points")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="entry point (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreter runs per entry point")
+    parser.add_argument("--top", type=int, default=15, help="number of modules in the importtime breakdown")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="previous JSON results to diff against")
+    args = parser.parse_args()
+
+    report = run(args.target or list(TARGETS), args.repeat, args.top, args.timeout)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        meta = report["meta"]
+        print(f"revision {meta['git_revision']}  python {meta['python']}  boto3 {meta['boto3']}  "
+              f"interpreter startup {meta['interpreter_startup_ms']} ms")
+        print(f"{'target':<24} {'import ms':>10} {'1st event':>10} {'to 1st':>10} {'warm ms':>9} {'peak RSS':>10}")
+        for name, r in report["targets"].items():
+            if r["error"]:
+                print(f"{name:<24} FAILED: {r['error']}")
+                continue
+            print(f"{name:<24} {r['import_ms']:>10} {r['first_event_ms']:>10} {r['time_to_first_event_ms']:>10} "
+                  f"{r['warm_ms']:>9} {int(r['peak_rss_kb']):>8}KB")
+        for name, r in report["targets"].items():
+            print(f"\n{name}: {r['importtime']['modules_imported']} modules, "
+                  f"{r['importtime']['entry_point_ms']} ms under -X importtime")
+            for entry in r["importtime"]["top_cumulative"][:8]:
+                print(f"  {entry['ms']:>8} ms  {entry['module']}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        print("\n".join(compare(base, report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+レスポンス圧縮のベンチマーク
+
+家族カレンダー1か月分を想定したペイロード（日本語本文 + 長い署名付きURL）を生成し、
+エンコーディングごとの圧縮後サイズ・Lambda レスポンス（base64）サイズ・CPU時間を計測する
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --users 6 --json > bench_compression.json
+"""
+import argparse
+import base64
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from compression import brotli  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    "今日は家族で公園に行って、お弁当を食べました。",
+    "雨が降っていたので、家で映画を見てのんびり過ごした。",
+    "学校で友達と新しい遊びを考えた。とても楽しかった！",
+    "晩ごはんはカレーライス。みんなでおかわりした。",
+    "仕事が忙しくて疲れたけど、帰りに見た夕焼けがきれいだった。",
+    "週末に向けて、旅行の計画を立てている。",
+    "久しぶりにおばあちゃんに電話をした。元気そうで安心した。",
+    "朝から雪が積もっていて、子どもたちは大はしゃぎ。",
+]
+
+
+def fake_presigned_url(rng: random.Random, user: str, date: str) -> str:
+    """S3 署名付きURL（一時認証情報のセキュリティトークン付き）を模した文字列"""
+    token = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789%") for _ in range(700))
+    signature = "".join(rng.choice("0123456789abcdef") for _ in range(64))
+    return (
+        f"https://family-diary-photos.s3.amazonaws.com/photos/{user}/{date}/{rng.random():.6f}.jpg"
+        f"?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Credential=ASIAEXAMPLE%2F20260214%2Fus-west-2%2Fs3%2Faws4_request"
+        f"&X-Amz-Date=20260214T000000Z&X-Amz-Expires=86400&X-Amz-SignedHeaders=host"
+        f"&X-Amz-Security-Token={token}&X-Amz-Signature={signature}"
+    )
+
+
+def build_month_payload(users: int, days: int, photo_ratio: float, seed: int) -> Dict:
+    """家族カレンダー1か月分のレスポンスを生成"""
+    rng = random.Random(seed)
+    entries: List[Dict] = []
+    for u in range(users):
+        user = f"user{u + 1}"
+        for day in range(1, days + 1):
+            date = f"2026-02-{day:02d}"
+            text = "".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(1, 6)))
+            entries.append({
+                "user_id": user,
+                "date": date,
+                "entry_text": text,
+                "is_public": True,
+                "mood": rng.choice(["happy", "normal", "sad", "excited", "tired"]),
+                "weather": rng.choice(["sunny", "cloudy", "rainy", "snowy"]),
+                "created_at": f"{date}T21:{rng.randint(0, 59):02d}:00+09:00",
+                "updated_at": f"{date}T22:{rng.randint(0, 59):02d}:00+09:00",
+                "photo_url": fake_presigned_url(rng, user, date) if rng.random() < photo_ratio else "",
+            })
+    return {"entries": entries, "next_cursor": None}
+
+
+def time_it(func, repeat: int) -> float:
+    """中央値（ミリ秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(users: int, days: int, photo_ratio: float, repeat: int, seed: int) -> Dict:
+    payload = build_month_payload(users, days, photo_ratio, seed)
+    serialize_ms = time_it(lambda: json.dumps(payload, ensure_ascii=False, default=str), repeat)
+    raw = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+    codecs = {f"gzip-{level}": (lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+              for level in (1, 6, 9)}
+    if brotli is not None:
+        for quality in (1, 5, 9):
+            codecs[f"br-{quality}"] = lambda data, quality=quality: brotli.compress(data, quality=quality)
+
+    results = []
+    for name, codec in codecs.items():
+        compressed = codec(raw)
+        encoded = base64.b64encode(compressed)
+        results.append({
+            "codec": name,
+            "compressed_bytes": len(compressed),
+            "lambda_payload_bytes": len(encoded),
+            "ratio": round(len(raw) / len(compressed), 2),
+            "saved_pct": round(100 * (1 - len(compressed) / len(raw)), 1),
+            "compress_ms": round(time_it(lambda: codec(raw), repeat), 3),
+            "compress_and_base64_ms": round(time_it(lambda: base64.b64encode(codec(raw)), repeat), 3),
+        })
+
+    return {
+        "payload": {
+            "users": users,
+            "days": days,
+            "entries": len(payload["entries"]),
+            "photo_ratio": photo_ratio,
+            "raw_bytes": len(raw),
+            "serialize_ms": round(serialize_ms, 3),
+        },
+        "brotli_available": brotli is not None,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark response compression on month calendar payloads")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--photo-ratio", type=float, default=0.6)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    report = run(args.users, args.days, args.photo_ratio, args.repeat, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    p = report["payload"]
+    print(f"payload: {p['entries']} entries, {p['raw_bytes']:,} bytes raw, json.dumps {p['serialize_ms']} ms")
+    print(f"{'codec':<8} {'compressed':>11} {'base64':>9} {'ratio':>6} {'saved':>7} {'cpu ms':>8} {'+b64 ms':>8}")
+    for r in report["results"]:
+        print(f"{r['codec']:<8} {r['compressed_bytes']:>11,} {r['lambda_payload_bytes']:>9,} {r['ratio']:>6} "
+              f"{r['saved_pct']:>6}% {r['compress_ms']:>8} {r['compress_and_base64_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
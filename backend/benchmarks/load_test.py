@@ -0,0 +1,556 @@
+"""
+api_handler.lambda_handler の負荷試験
+
+合成した家族のデータセット（N人 × M年分の日記）を投入し、全ルートの API Gateway プロキシイベントを
+指定した並列度で実行して、ルートごとの p50 / p95 / p99 レイテンシ、スループット、メモリ割り当てを出力する
+
+バックエンド:
+- memory: InMemoryDatabase
+- sqlite: SQLiteDatabase（--sqlite-path、既定は一時ファイル）
+- dynamodb: --endpoint-url 指定時は DynamoDB Local、省略時は moto（インストールされている場合）
+
+S3 は put_object のみ偽物に置き換える（署名付きURLの生成は boto3 がローカルで行うためそのまま計測される）
+
+使い方（backend ディレクトリで実行）:
+    python benchmarks/load_test.py --users 4 --years 2 --requests 5000 --concurrency 8
+    python benchmarks/load_test.py --backend sqlite --users 6 --years 10 --duration 30 --json > load.json
+    python benchmarks/load_test.py --backend dynamodb --endpoint-url http://localhost:8000
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_compression import SAMPLE_SENTENCES  # noqa: E402
+
+MOODS = ["happy", "normal", "sad", "excited", "tired"]
+WEATHERS = ["sunny", "cloudy", "rainy", "snowy"]
+
+# 子プロセスを使わないため、api_handler をインポートする前に環境変数を設定する
+LOAD_TEST_ENV = {
+    "AWS_ACCESS_KEY_ID": "loadtest",
+    "AWS_SECRET_ACCESS_KEY": "loadtest",
+    "AWS_DEFAULT_REGION": "us-west-2",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "PHOTO_BUCKET_NAME": "loadtest-photos",
+    "DYNAMODB_PROMPTS_TABLE_NAME": "loadtest-prompts",
+    "ALLOWED_ORIGINS": "http://localhost:3000",
+    "PHOTO_REF_SECRET": "loadtest",
+}
+DIARY_TABLE_NAME = "loadtest-diary-entries"
+
+
+# ===== 合成データセット =====
+def family_usernames(users: int) -> List[str]:
+    return [f"family{i + 1:02d}" for i in range(users)]
+
+
+def generate_family_dataset(
+    users: int,
+    years: int,
+    end: date,
+    write_ratio: float = 0.7,
+    public_ratio: float = 0.6,
+    photo_ratio: float = 0.3,
+    seed: int = 42,
+) -> Iterator[Dict]:
+    """
+    家族の日記データセットを生成（同じ引数なら同じデータ）
+
+    Args:
+        users: 家族の人数
+        years: 何年分か（end から遡る）
+        end: 最終日
+        write_ratio: 各ユーザーが日記を書く日の割合
+        public_ratio: 公開する日記の割合
+        photo_ratio: 写真付きの日記の割合
+
+    Yields:
+        save_diary_entry と同じ形式のアイテム
+    """
+    from database import build_diary_item
+    from models import DiaryEntry
+
+    rng = random.Random(seed)
+    start = end - timedelta(days=365 * years - 1)
+    day = start
+    while day <= end:
+        date_str = day.isoformat()
+        for username in family_usernames(users):
+            if rng.random() >= write_ratio:
+                continue
+            content = "".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(1, 8)))
+            photos = [f"photos/{username}/{date_str}/{rng.randint(0, 10**9)}.jpg"] if rng.random() < photo_ratio else []
+            timestamp = f"{date_str}T21:{rng.randint(0, 59):02d}:00+09:00"
+            entry = DiaryEntry(
+                username=username,
+                date=date_str,
+                content=content,
+                mood=rng.choice(MOODS),
+                weather=rng.choice(WEATHERS),
+                photos=photos,
+                is_public=rng.random() < public_ratio,
+                created_at=timestamp,
+                updated_at=timestamp,
+            )
+            yield build_diary_item(entry, updated_at=timestamp)
+        day += timedelta(days=1)
+
+
+# ===== イベント生成 =====
+def build_event(
+    method: str,
+    path: str,
+    username: str,
+    body: Optional[str] = None,
+    query: Optional[Dict[str, str]] = None,
+    accept_encoding: Optional[str] = None,
+) -> Dict:
+    """API Gateway（REST, Lambda Proxy, Cognito オーソライザー）形式のイベント"""
+    headers = {"Origin": "http://localhost:3000", "Content-Type": "application/json"}
+    if accept_encoding:
+        headers["Accept-Encoding"] = accept_encoding
+    return {
+        "httpMethod": method,
+        "path": path,
+        "resource": path,
+        "headers": headers,
+        "queryStringParameters": query,
+        "body": body,
+        "isBase64Encoded": False,
+        "requestContext": {
+            "authorizer": {"claims": {"cognito:username": username, "sub": username}},
+            "httpMethod": method,
+            "path": path,
+        },
+    }
+
+
+class Workload:
+    """ルートごとのイベント生成（データセットの期間内の日付・月をランダムに選ぶ）"""
+
+    def __init__(self, users: List[str], start: date, end: date, accept_encoding: Optional[str], photo_bytes: int):
+        self.users = users
+        self.start = start
+        self.days = (end - start).days + 1
+        self.accept_encoding = accept_encoding
+        self.photo_body = None
+        self.photo_bytes = photo_bytes
+        self.routes: Dict[str, Callable[[random.Random], Dict]] = {
+            "GET /": self.recent,
+            "GET /diary/{date}": self.get_diary,
+            "GET /diary": self.get_week,
+            "POST /diary/{date}": self.save_diary,
+            "DELETE /diary/{date}": self.delete_diary,
+            "POST /diary/{date}/photo": self.upload_photo,
+            "GET /family/calendar/{year}/{month}": self.family_calendar,
+            "GET /my/calendar/{year}/{month}": self.my_calendar,
+            "GET /photo/{ref}": self.get_photo,
+            "GET /prompt": self.prompt,
+        }
+
+    def _date(self, rng: random.Random) -> str:
+        return (self.start + timedelta(days=rng.randrange(self.days))).isoformat()
+
+    def _event(self, rng, method, path, body=None, query=None) -> Dict:
+        return build_event(method, path, rng.choice(self.users), body, query, self.accept_encoding)
+
+    def recent(self, rng):
+        return self._event(rng, "GET", "/")
+
+    def get_diary(self, rng):
+        return self._event(rng, "GET", f"/diary/{self._date(rng)}")
+
+    def get_week(self, rng):
+        end = date.fromisoformat(self._date(rng))
+        query = {"from": (end - timedelta(days=6)).isoformat(), "to": end.isoformat()}
+        return self._event(rng, "GET", "/diary", query=query)
+
+    def save_diary(self, rng):
+        body = {
+            "content": "".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(1, 8))),
+            "mood": rng.choice(MOODS),
+            "weather": rng.choice(WEATHERS),
+            "is_public": rng.random() < 0.6,
+        }
+        return self._event(rng, "POST", f"/diary/{self._date(rng)}", json.dumps(body, ensure_ascii=False))
+
+    def delete_diary(self, rng):
+        return self._event(rng, "DELETE", f"/diary/{self._date(rng)}")
+
+    def upload_photo(self, rng):
+        if self.photo_body is None:
+            image = random.Random(0).randbytes(self.photo_bytes)
+            self.photo_body = json.dumps({"image": base64.b64encode(image).decode("ascii")})
+        return self._event(rng, "POST", f"/diary/{self._date(rng)}/photo", self.photo_body)
+
+    def family_calendar(self, rng):
+        month = date.fromisoformat(self._date(rng))
+        return self._event(rng, "GET", f"/family/calendar/{month.year}/{month.month}")
+
+    def my_calendar(self, rng):
+        month = date.fromisoformat(self._date(rng))
+        return self._event(rng, "GET", f"/my/calendar/{month.year}/{month.month}")
+
+    def get_photo(self, rng):
+        from photo_ref import issue_photo_ref
+
+        username = rng.choice(self.users)
+        ref = issue_photo_ref(username, f"photos/{username}/{self._date(rng)}/0.jpg")
+        return build_event("GET", f"/photo/{ref}", username, accept_encoding=self.accept_encoding)
+
+    def prompt(self, rng):
+        return self._event(rng, "GET", "/prompt", query={"date": self._date(rng)})
+
+
+# 読み込み中心の既定の比率（家族の日常的な利用を想定）
+DEFAULT_MIX = {
+    "GET /": 10,
+    "GET /diary/{date}": 15,
+    "GET /diary": 5,
+    "POST /diary/{date}": 8,
+    "DELETE /diary/{date}": 1,
+    "POST /diary/{date}/photo": 1,
+    "GET /family/calendar/{year}/{month}": 25,
+    "GET /my/calendar/{year}/{month}": 20,
+    "GET /photo/{ref}": 5,
+    "GET /prompt": 10,
+}
+
+
+# ===== バックエンドの準備 =====
+class FakeS3Client:
+    """put_object のみ偽物にした S3 クライアント（署名付きURLは実際の boto3 でローカル生成）"""
+
+    def __init__(self):
+        import boto3
+
+        self._signer = boto3.client("s3")
+        self._lock = threading.Lock()
+        self.objects: Dict[str, int] = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self._lock:
+            self.objects[f"{Bucket}/{Key}"] = len(Body)
+        return {"ETag": '"loadtest"'}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        from botocore.exceptions import ClientError
+
+        with self._lock:
+            size = self.objects.get(f"{Bucket}/{Key}")
+        if size is None:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": size, "ContentType": "image/jpeg"}
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        return self._signer.generate_presigned_url(ClientMethod, Params=Params, ExpiresIn=ExpiresIn, **kwargs)
+
+
+def create_dynamodb_tables(endpoint_url: Optional[str]) -> None:
+    """日記テーブル（GSI 2つ）とお題テーブルを作成（既に存在する場合は何もしない）"""
+    import boto3
+
+    client = boto3.client("dynamodb", endpoint_url=endpoint_url)
+    existing = set(client.list_tables().get("TableNames", []))
+    if DIARY_TABLE_NAME not in existing:
+        client.create_table(
+            TableName=DIARY_TABLE_NAME,
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[
+                {"AttributeName": name, "AttributeType": "S"}
+                for name in ("user_id#date", "user_id", "is_public", "date")
+            ],
+            KeySchema=[{"AttributeName": "user_id#date", "KeyType": "HASH"}],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": f"{partition}-date-index",
+                    "KeySchema": [
+                        {"AttributeName": partition, "KeyType": "HASH"},
+                        {"AttributeName": "date", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+                for partition in ("user_id", "is_public")
+            ],
+        )
+    if LOAD_TEST_ENV["DYNAMODB_PROMPTS_TABLE_NAME"] not in existing:
+        client.create_table(
+            TableName=LOAD_TEST_ENV["DYNAMODB_PROMPTS_TABLE_NAME"],
+            BillingMode="PAY_PER_REQUEST",
+            AttributeDefinitions=[{"AttributeName": "date", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "date", "KeyType": "HASH"}],
+        )
+
+
+def load_dataset(db, items: Iterator[Dict]) -> int:
+    """データセットを投入（ローカルは bulk_load、DynamoDB は batch_writer）"""
+    if db.backend != "dynamodb":
+        return db.bulk_load(items)
+    loaded = 0
+    with db.table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+            loaded += 1
+    return loaded
+
+
+@contextlib.contextmanager
+def backend_context(args):
+    """バックエンドに応じて環境変数・モックを準備し、api_handler をインポートして返す"""
+    os.environ.update(LOAD_TEST_ENV)
+    stack = contextlib.ExitStack()
+    with stack:
+        if args.backend == "sqlite":
+            path = args.sqlite_path
+            if not path:
+                tmpdir = stack.enter_context(tempfile.TemporaryDirectory())
+                path = os.path.join(tmpdir, "load_test.sqlite3")
+            os.environ.update({"DIARY_DB_BACKEND": "sqlite", "SQLITE_DB_PATH": path})
+        elif args.backend == "dynamodb":
+            os.environ.update({"DIARY_DB_BACKEND": "dynamodb", "DYNAMODB_TABLE_NAME": DIARY_TABLE_NAME})
+            if args.endpoint_url:
+                os.environ["DYNAMODB_ENDPOINT_URL"] = args.endpoint_url
+            else:
+                try:
+                    from moto import mock_aws
+                except ImportError:
+                    raise SystemExit("--backend dynamodb needs --endpoint-url (DynamoDB Local) or moto installed")
+                stack.enter_context(mock_aws())
+            create_dynamodb_tables(args.endpoint_url)
+        else:
+            os.environ["DIARY_DB_BACKEND"] = "memory"
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            import api_handler
+        api_handler.db._s3_client = FakeS3Client()
+        # 縮小版の作成は本番では S3 イベントの別 Lambda で行うため、API の計測に含めない
+        api_handler.db.photo_upload_listeners.clear()
+        yield api_handler
+
+
+# ===== 計測 =====
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """最近接順位法によるパーセンタイル"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.response_bytes = 0
+        self.exceptions = 0
+        self.alloc_peak_bytes: List[int] = []
+
+    def record(self, elapsed_ms: float, response: Optional[Dict]) -> None:
+        self.latencies_ms.append(elapsed_ms)
+        if response is None:
+            self.exceptions += 1
+            return
+        status = response.get("statusCode", 0)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.response_bytes += len(response.get("body") or "")
+
+    def summary(self) -> Dict:
+        values = sorted(self.latencies_ms)
+        count = len(values)
+        errors = self.exceptions + sum(n for status, n in self.statuses.items() if status >= 500)
+        return {
+            "requests": count,
+            "errors": errors,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "p50_ms": round(percentile(values, 50), 3) if values else None,
+            "p95_ms": round(percentile(values, 95), 3) if values else None,
+            "p99_ms": round(percentile(values, 99), 3) if values else None,
+            "max_ms": round(values[-1], 3) if values else None,
+            "mean_ms": round(statistics.fmean(values), 3) if values else None,
+            "avg_response_bytes": round(self.response_bytes / count) if count else None,
+            "alloc_peak_bytes_p50": int(statistics.median(self.alloc_peak_bytes)) if self.alloc_peak_bytes else None,
+        }
+
+
+def pick_route(rng: random.Random, routes: List[str], weights: List[float]) -> str:
+    return rng.choices(routes, weights=weights)[0]
+
+
+def run_load(handler, workload: Workload, mix: Dict[str, float], concurrency: int,
+             requests: Optional[int], duration: Optional[float], seed: int) -> Tuple[Dict[str, RouteStats], float]:
+    """指定の並列度でリクエストを実行（requests 件、または duration 秒）"""
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    stats = {route: RouteStats() for route in routes}
+    stats_lock = threading.Lock()
+    counter = iter(range(requests)) if requests else None
+    counter_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_request() -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        with counter_lock:
+            return next(counter, None) is not None
+
+    def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        local = {route: [] for route in routes}
+        while next_request():
+            route = pick_route(rng, routes, weights)
+            event = workload.routes[route](rng)
+            start = time.perf_counter()
+            try:
+                response = handler(event, None)
+            except Exception:
+                response = None
+            local[route].append(((time.perf_counter() - start) * 1000, response))
+        with stats_lock:
+            for route, samples in local.items():
+                for elapsed_ms, response in samples:
+                    stats[route].record(elapsed_ms, response)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return stats, time.perf_counter() - started
+
+
+def measure_allocations(handler, workload: Workload, routes: List[str], samples: int, seed: int,
+                        stats: Dict[str, RouteStats]) -> None:
+    """ルートごとに1リクエストあたりのピーク割り当てを計測（tracemalloc、逐次実行）"""
+    rng = random.Random(seed)
+    tracemalloc.start()
+    try:
+        for route in routes:
+            for _ in range(samples):
+                event = workload.routes[route](rng)
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                try:
+                    handler(event, None)
+                except Exception:
+                    pass
+                _, peak = tracemalloc.get_traced_memory()
+                stats[route].alloc_peak_bytes.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    """--mix 'GET /=10,GET /prompt=5' 形式（省略時は既定の比率）"""
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.rpartition("=")
+        route = route.strip()
+        if route not in DEFAULT_MIX:
+            raise SystemExit(f"unknown route in --mix: {route} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[route] = float(weight)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test api_handler.lambda_handler with synthetic family data")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "dynamodb"], default="memory")
+    parser.add_argument("--sqlite-path", help="SQLite file (default: temporary file)")
+    parser.add_argument("--endpoint-url", help="DynamoDB Local endpoint (default for dynamodb backend: moto)")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--end-date", default="2026-02-28")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data already in --sqlite-path")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--duration", type=float, help="run for N seconds instead of --requests")
+    parser.add_argument("--mix", help="route weights, e.g. 'GET /=10,GET /prompt=5'")
+    parser.add_argument("--accept-encoding", default="gzip", help="Accept-Encoding header ('' to disable)")
+    parser.add_argument("--photo-bytes", type=int, default=200_000)
+    parser.add_argument("--alloc-samples", type=int, default=20, help="tracemalloc samples per route (0 to skip)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--show-logs", action="store_true", help="do not silence handler output")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    end = date.fromisoformat(args.end_date)
+    start = end - timedelta(days=365 * args.years - 1)
+    users = family_usernames(args.users)
+
+    with backend_context(args) as api_handler:
+        db = api_handler.db
+        load_started = time.perf_counter()
+        loaded = 0
+        if not args.skip_load:
+            loaded = load_dataset(db, generate_family_dataset(args.users, args.years, end, seed=args.seed))
+            day = end - timedelta(days=29)
+            while day <= end:
+                db.save_prompt(day.isoformat(), f"{day.month}月{day.day}日のお題", "daily")
+                day += timedelta(days=1)
+        load_seconds = time.perf_counter() - load_started
+
+        workload = Workload(users, start, end, args.accept_encoding or None, args.photo_bytes)
+        output = contextlib.nullcontext() if args.show_logs else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            stats, elapsed = run_load(
+                api_handler.lambda_handler, workload, mix, args.concurrency, None if args.duration else args.requests,
+                args.duration, args.seed,
+            )
+            if args.alloc_samples:
+                measure_allocations(api_handler.lambda_handler, workload, list(mix), args.alloc_samples, args.seed, stats)
+
+    total = sum(len(route.latencies_ms) for route in stats.values())
+    report = {
+        "config": {
+            "backend": args.backend,
+            "users": args.users,
+            "years": args.years,
+            "items_loaded": loaded,
+            "load_seconds": round(load_seconds, 2),
+            "concurrency": args.concurrency,
+            "accept_encoding": args.accept_encoding,
+            "seed": args.seed,
+        },
+        "total": {
+            "requests": total,
+            "seconds": round(elapsed, 3),
+            "throughput_rps": round(total / elapsed, 1) if elapsed else None,
+            "errors": sum(route.summary()["errors"] for route in stats.values()),
+        },
+        "routes": {route: route_stats.summary() for route, route_stats in stats.items()},
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    c, t = report["config"], report["total"]
+    print(f"backend={c['backend']} users={c['users']} years={c['years']} items={c['items_loaded']} "
+          f"(loaded in {c['load_seconds']}s) concurrency={c['concurrency']}")
+    print(f"{t['requests']} requests in {t['seconds']}s = {t['throughput_rps']} req/s, errors={t['errors']}")
+    print(f"{'route':<38} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'bytes':>8} {'alloc':>9}  statuses")
+    for route, r in report["routes"].items():
+        if not r["requests"]:
+            continue
+        alloc = f"{r['alloc_peak_bytes_p50'] // 1024}KB" if r["alloc_peak_bytes_p50"] is not None else "-"
+        print(f"{route:<38} {r['requests']:>6} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8} "
+              f"{r['avg_response_bytes']:>8} {alloc:>9}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+ウォームコンテナ内で共有するインプロセスキャッシュ
+Lambda のコンテナが再利用される間だけ有効（依存パッケージゼロ）
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# set() で ttl が省略されたことを示す番兵
+_DEFAULT_TTL = object()
+
+
+class TTLCache:
+    """有効期限付きの LRU キャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: Optional[float] = 3600):
+        """
+        Args:
+            max_entries: 保持する最大エントリ数（超えた分は古い順に破棄）
+            default_ttl: デフォルトの有効期間（秒）。None の場合は期限なし
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key: (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        キャッシュから値を取得（期限切れは削除してミス扱い）
+
+        Returns:
+            キャッシュされた値、見つからない場合は default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Any = _DEFAULT_TTL) -> None:
+        """
+        キャッシュに値を保存
+
+        Args:
+            key: キー
+            value: 値
+            ttl: 有効期間（秒）。省略時は default_ttl、None の場合は期限なし
+        """
+        if ttl is _DEFAULT_TTL:
+            ttl = self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """指定キーをキャッシュから削除"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """キャッシュを全削除（カウンタは維持）"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット/ミスなどの統計情報を返す"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
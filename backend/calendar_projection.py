@@ -0,0 +1,354 @@
+"""
+家族カレンダーの月次ドキュメント（マテリアライズドビュー）
+(家族, 年月) ごとに1アイテムの公開エントリ一覧を保持し、
+カレンダー取得を GetItem 1回で済ませる
+
+日記テーブルの DynamoDB Streams（NEW_AND_OLD_IMAGES）を stream_handler で処理して更新する
+ローカル開発では LocalChangeStream が同じ形式の変更レコードを同期的に再生する
+
+月次ドキュメントには本文を含めない（抜粋のみ）。DynamoDB のアイテムサイズ上限（400KB）を超えないよう、
+作成時にサイズを見積もり、上限に近い・更新で上限を超えた月は overflow として扱い、
+API はその月を従来どおり GSI の Query で返す
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pytz
+
+from structured_logging import get_logger
+
+logger = get_logger("calendar_projection")
+
+FAMILY_ID = os.environ.get("FAMILY_ID", "family")
+CALENDAR_TABLE_NAME = os.environ.get("DYNAMODB_CALENDAR_TABLE_NAME")
+
+# 月次ドキュメントに保持する属性（本文 content は含めない。view=full では日記テーブルから補う）
+CALENDAR_VIEW_ATTRIBUTES = (
+    "user_id", "date", "excerpt", "mood", "weather", "is_public", "created_at", "updated_at",
+)
+# 月次ドキュメントのサイズの上限の見積もり（DynamoDB のアイテム上限 400KB に余裕を持たせる）
+CALENDAR_DOCUMENT_MAX_BYTES = int(os.environ.get("CALENDAR_DOCUMENT_MAX_BYTES", str(300 * 1024)))
+
+
+def month_document_key(year: int, month: int, family_id: str = FAMILY_ID) -> str:
+    """月次ドキュメントのキー（例: family#2026-02）"""
+    return f"{family_id}#{year:04d}-{month:02d}"
+
+
+def month_key_for_date(date_str: str, family_id: str = FAMILY_ID) -> str:
+    """日付（YYYY-MM-DD）が属する月次ドキュメントのキー"""
+    return f"{family_id}#{date_str[:7]}"
+
+
+def build_calendar_view(item: Dict) -> Dict:
+    """日記アイテムをカレンダー表示用のコンパクトな形式に変換（写真は先頭1枚のみ）"""
+    view = {attr: item[attr] for attr in CALENDAR_VIEW_ATTRIBUTES if attr in item}
+    if "excerpt" not in view:
+        # excerpt 属性がない古いアイテム
+        from database import make_excerpt
+
+        view["excerpt"] = make_excerpt(item.get("content", ""))
+    photos = item.get("photos") or []
+    view["photos"] = list(photos[:1])
+    # 先頭の写真の縮小版が作成済みか（カレンダーはサムネイルを表示する）
+    if photos and photos[0] in (item.get("rendered_photos") or []):
+        view["rendered_photos"] = list(photos[:1])
+    return view
+
+
+def estimate_document_size(document: Dict) -> int:
+    """月次ドキュメントのおおよそのバイト数（DynamoDB のサイズ計算に近い JSON の UTF-8 長）"""
+    return len(json.dumps(document, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def is_usable_document(document: Optional[Dict]) -> bool:
+    """カレンダーの取得に使える月次ドキュメントか（overflow の月は使わない）"""
+    return bool(document) and not document.get("overflow")
+
+
+def sorted_month_entries(document: Optional[Dict]) -> List[Dict]:
+    """月次ドキュメントのエントリを日付・ユーザー順に並べて返す"""
+    if not document:
+        return []
+    entries = document.get("entries", {}).values()
+    return sorted(entries, key=lambda x: (x.get("date", ""), x.get("user_id", "")))
+
+
+class InMemoryCalendarMonthStore:
+    """開発モード用の月次ドキュメントストア"""
+
+    def __init__(self, month_loader: Optional[Callable[[str], List[Dict]]] = None):
+        """
+        Args:
+            month_loader: ドキュメント未作成の月を初期化する際に、その月の公開アイテムを返す関数
+        """
+        self.documents: Dict[str, Dict] = {}
+        self.month_loader = month_loader
+
+    def get_month(self, month_key: str) -> Optional[Dict]:
+        return self.documents.get(month_key)
+
+    def get_month_version(self, month_key: str) -> Optional[int]:
+        document = self.documents.get(month_key)
+        return document["version"] if document else None
+
+    def _ensure_month(self, month_key: str) -> Dict:
+        if month_key not in self.documents:
+            seed = self.month_loader(month_key) if self.month_loader else []
+            self.documents[month_key] = {
+                "family_month": month_key,
+                "entries": {item["user_id#date"]: build_calendar_view(item) for item in seed},
+                "version": 0,
+            }
+        return self.documents[month_key]
+
+    def upsert_entry(self, month_key: str, entry_key: str, view: Dict) -> None:
+        document = self._ensure_month(month_key)
+        current = document["entries"].get(entry_key)
+        if current and current.get("updated_at", "") > view.get("updated_at", ""):
+            return  # 古い変更レコードは無視
+        document["entries"][entry_key] = view
+        document["version"] += 1
+        document["updated_at"] = datetime.now(pytz.timezone("Asia/Tokyo")).isoformat()
+
+    def remove_entry(self, month_key: str, entry_key: str, updated_at: str = "") -> None:
+        document = self.documents.get(month_key)
+        if not document or entry_key not in document["entries"]:
+            return
+        if document["entries"][entry_key].get("updated_at", "") > updated_at:
+            return  # より新しい内容が既に反映済み
+        del document["entries"][entry_key]
+        document["version"] += 1
+        document["updated_at"] = datetime.now(pytz.timezone("Asia/Tokyo")).isoformat()
+
+
+class DynamoCalendarMonthStore:
+    """DynamoDB の月次ドキュメントテーブル（PK: family_month）"""
+
+    def __init__(self, table, month_loader: Optional[Callable[[str], List[Dict]]] = None):
+        self.table = table
+        self.month_loader = month_loader
+
+    def get_month(self, month_key: str) -> Optional[Dict]:
+        """月次ドキュメント（未作成・overflow の場合は None）"""
+        response = self.table.get_item(Key={"family_month": month_key})
+        item = response.get("Item")
+        return item if is_usable_document(item) else None
+
+    def get_month_version(self, month_key: str) -> Optional[int]:
+        """バージョン番号のみを取得（ETag 比較用の軽量な GetItem。未作成・overflow の場合は None）"""
+        response = self.table.get_item(
+            Key={"family_month": month_key},
+            ProjectionExpression="#v, overflow",
+            ExpressionAttributeNames={"#v": "version"},
+        )
+        item = response.get("Item")
+        return int(item["version"]) if is_usable_document(item) and "version" in item else None
+
+    def _mark_overflow(self, month_key: str, size: Optional[int] = None) -> None:
+        """
+        月次ドキュメントを overflow に置き換える
+
+        entries を持たないため以降の更新は条件で失敗し（何もしない）、API はその月を Query で返す
+        """
+        logger.warning("Calendar month document too large, falling back to Query", extra={"fields": {
+            "family_month": month_key, "estimated_bytes": size,
+        }})
+        self.table.put_item(Item={
+            "family_month": month_key,
+            "overflow": True,
+            "updated_at": datetime.now(pytz.timezone("Asia/Tokyo")).isoformat(),
+        })
+
+    def _create_month(self, month_key: str, entry_key: str, view: Dict) -> bool:
+        """ドキュメントを新規作成（既に存在する場合は False）"""
+        from botocore.exceptions import ClientError
+
+        seed = self.month_loader(month_key) if self.month_loader else []
+        entries = {item["user_id#date"]: build_calendar_view(item) for item in seed}
+        if entries.get(entry_key, {}).get("updated_at", "") <= view.get("updated_at", ""):
+            entries[entry_key] = view
+        document = {
+            "family_month": month_key,
+            "entries": entries,
+            "version": 1,
+            "updated_at": datetime.now(pytz.timezone("Asia/Tokyo")).isoformat(),
+        }
+        size = estimate_document_size(document)
+        if size > CALENDAR_DOCUMENT_MAX_BYTES:
+            self._mark_overflow(month_key, size)
+            return True
+        try:
+            self.table.put_item(Item=document, ConditionExpression="attribute_not_exists(family_month)")
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
+
+    def _update_entry(self, month_key: str, entry_key: str, view: Dict) -> bool:
+        """既存ドキュメントのエントリを更新（ドキュメントなし・古い変更の場合は False）"""
+        from botocore.exceptions import ClientError
+
+        try:
+            self.table.update_item(
+                Key={"family_month": month_key},
+                UpdateExpression="SET entries.#k = :view, updated_at = :now ADD version :one",
+                ConditionExpression=(
+                    "attribute_exists(entries) AND "
+                    "(attribute_not_exists(entries.#k) OR entries.#k.updated_at <= :updated_at)"
+                ),
+                ExpressionAttributeNames={"#k": entry_key},
+                ExpressionAttributeValues={
+                    ":view": view,
+                    ":updated_at": view.get("updated_at", ""),
+                    ":now": datetime.now(pytz.timezone("Asia/Tokyo")).isoformat(),
+                    ":one": 1,
+                },
+            )
+            return True
+        except ClientError as e:
+            if _is_item_too_large(e):
+                # 見積もりより大きくなった（上限を超える更新は反映されないため、古い内容を返し続けないようにする）
+                self._mark_overflow(month_key)
+                return True
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
+
+    def upsert_entry(self, month_key: str, entry_key: str, view: Dict) -> None:
+        if self._update_entry(month_key, entry_key, view):
+            return
+        if self._create_month(month_key, entry_key, view):
+            return
+        # 並行して作成された場合に備えて1度だけ再試行（失敗した場合は古い変更レコード）
+        self._update_entry(month_key, entry_key, view)
+
+    def remove_entry(self, month_key: str, entry_key: str, updated_at: str = "") -> None:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.table.update_item(
+                Key={"family_month": month_key},
+                UpdateExpression="REMOVE entries.#k SET updated_at = :now ADD version :one",
+                ConditionExpression="attribute_exists(entries.#k) AND entries.#k.updated_at <= :updated_at",
+                ExpressionAttributeNames={"#k": entry_key},
+                ExpressionAttributeValues={
+                    ":updated_at": updated_at,
+                    ":now": datetime.now(pytz.timezone("Asia/Tokyo")).isoformat(),
+                    ":one": 1,
+                },
+            )
+        except ClientError as e:
+            # 既に削除済み、またはより新しい内容が反映済み
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+def _is_item_too_large(error) -> bool:
+    """アイテムサイズの上限超過による ValidationException か"""
+    err = error.response.get("Error", {})
+    return err.get("Code") == "ValidationException" and "size" in err.get("Message", "").lower()
+
+
+def _deserialize_image(image: Optional[Dict]) -> Optional[Dict]:
+    """Streams の DynamoDB JSON 形式を Python の dict に変換"""
+    if not image:
+        return None
+    from boto3.dynamodb.types import TypeDeserializer
+
+    deserializer = TypeDeserializer()
+    return {key: deserializer.deserialize(value) for key, value in image.items()}
+
+
+def apply_change(store, old_image: Optional[Dict], new_image: Optional[Dict]) -> None:
+    """
+    1件の変更を月次ドキュメントに反映
+
+    - 変更後が公開エントリ → 追加・更新
+    - 変更後が非公開、または削除 → ドキュメントから除外
+    """
+    image = new_image or old_image
+    if not image or "user_id#date" not in image or "date" not in image:
+        return
+
+    entry_key = image["user_id#date"]
+    month_key = month_key_for_date(image["date"])
+    if new_image and new_image.get("is_public") == "true":
+        store.upsert_entry(month_key, entry_key, build_calendar_view(new_image))
+    elif old_image and old_image.get("is_public") == "true":
+        updated_at = (new_image or old_image).get("updated_at", "")
+        store.remove_entry(month_key, entry_key, updated_at)
+
+
+def apply_change_records(records: Iterable[Dict], store) -> int:
+    """
+    DynamoDB Streams の変更レコードを月次ドキュメントに反映
+
+    Returns:
+        処理したレコード数
+    """
+    processed = 0
+    for record in records:
+        if record.get("eventName") not in ("INSERT", "MODIFY", "REMOVE"):
+            continue
+        stream_record = record.get("dynamodb", {})
+        apply_change(
+            store,
+            _deserialize_image(stream_record.get("OldImage")),
+            _deserialize_image(stream_record.get("NewImage")),
+        )
+        processed += 1
+    return processed
+
+
+class LocalChangeStream:
+    """
+    DynamoDB Streams のローカル代替
+    InMemoryDatabase の変更を Streams と同じ形式のレコードにして即座に再生する
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __call__(self, event_name: str, old_image: Optional[Dict], new_image: Optional[Dict]) -> None:
+        from boto3.dynamodb.types import TypeSerializer
+
+        serializer = TypeSerializer()
+        stream_record: Dict[str, Any] = {}
+        if old_image:
+            stream_record["OldImage"] = {k: serializer.serialize(v) for k, v in old_image.items()}
+        if new_image:
+            stream_record["NewImage"] = {k: serializer.serialize(v) for k, v in new_image.items()}
+        apply_change_records([{"eventName": event_name, "dynamodb": stream_record}], self.store)
+
+
+_stream_store: Optional[DynamoCalendarMonthStore] = None
+
+
+def _get_stream_store() -> DynamoCalendarMonthStore:
+    """Streams Lambda 用のストア（ウォームコンテナ内で再利用）"""
+    global _stream_store
+    if _stream_store is None:
+        from database import DiaryDatabase, get_dynamodb_resource
+
+        if not CALENDAR_TABLE_NAME:
+            raise ValueError("DYNAMODB_CALENDAR_TABLE_NAME environment variable not set")
+
+        diary_db = DiaryDatabase(os.environ.get("DYNAMODB_TABLE_NAME"))
+        table = get_dynamodb_resource().Table(CALENDAR_TABLE_NAME)
+        _stream_store = DynamoCalendarMonthStore(table, month_loader=diary_db.load_public_month)
+    return _stream_store
+
+
+def stream_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    日記テーブルの DynamoDB Streams を処理する Lambda ハンドラー
+    """
+    store = _get_stream_store()
+    records = event.get("Records", [])
+    processed = apply_change_records(records, store)
+    logger.info("Calendar projection: processed %d/%d records", processed, len(records))
+    return {"processed": processed}
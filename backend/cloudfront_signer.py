@@ -0,0 +1,161 @@
+"""
+CloudFront 署名付き Cookie の生成
+ユーザーごとの写真プレフィックス（photos/{username}/）に対して1つのカスタムポリシーを署名し、
+自分の写真の S3 署名付きURL生成を不要にする。
+Cookie で読めるのは自分の写真のみで、他のユーザーの（公開日記の）写真は従来どおり署名付きURLで返す
+
+cryptography はこのモードでのみ必要なため遅延インポートする
+"""
+import base64
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from photo_upload import PHOTO_KEY_PREFIX
+
+
+def cloudfront_b64encode(data: bytes) -> str:
+    """CloudFront 用の URL セーフ base64（+ → -, = → _, / → ~）"""
+    encoded = base64.b64encode(data).decode("ascii")
+    return encoded.replace("+", "-").replace("=", "_").replace("/", "~")
+
+
+def build_custom_policy(resource: str, expires_at: int, starts_at: Optional[int] = None) -> str:
+    """
+    カスタムポリシーJSONを生成
+
+    Args:
+        resource: 対象リソース（ワイルドカード可、例: https://example.cloudfront.net/photos/*）
+        expires_at: 有効期限（UNIX秒）
+        starts_at: 有効開始（UNIX秒、省略可）
+
+    Returns:
+        空白なしのポリシーJSON文字列
+    """
+    condition = {"DateLessThan": {"AWS:EpochTime": int(expires_at)}}
+    if starts_at is not None:
+        condition["DateGreaterThan"] = {"AWS:EpochTime": int(starts_at)}
+
+    policy = {"Statement": [{"Resource": resource, "Condition": condition}]}
+    return json.dumps(policy, separators=(",", ":"))
+
+
+class CloudFrontCookieSigner:
+    """CloudFront 署名付き Cookie の署名クラス"""
+
+    def __init__(self, key_pair_id: str, private_key_pem: bytes):
+        """
+        Args:
+            key_pair_id: CloudFront 公開鍵ID（キーグループに登録済みのもの）
+            private_key_pem: 対応する RSA 秘密鍵（PEM）
+        """
+        from cryptography.hazmat.primitives import serialization
+
+        self.key_pair_id = key_pair_id
+        self._private_key = serialization.load_pem_private_key(private_key_pem, password=None)
+
+    def sign(self, message: bytes) -> bytes:
+        """RSA-SHA1 (PKCS#1 v1.5) で署名（CloudFront の仕様）"""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        return self._private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+
+    def generate_cookies(self, resource: str, expires_at: int) -> Dict[str, str]:
+        """
+        カスタムポリシーの署名付き Cookie を生成
+
+        Returns:
+            {"CloudFront-Policy": ..., "CloudFront-Signature": ..., "CloudFront-Key-Pair-Id": ...}
+        """
+        policy = build_custom_policy(resource, expires_at).encode("utf-8")
+        return {
+            "CloudFront-Policy": cloudfront_b64encode(policy),
+            "CloudFront-Signature": cloudfront_b64encode(self.sign(policy)),
+            "CloudFront-Key-Pair-Id": self.key_pair_id,
+        }
+
+
+# ===== 環境変数からの設定 =====
+CLOUDFRONT_PHOTO_DOMAIN = os.environ.get("CLOUDFRONT_PHOTO_DOMAIN", "")
+CLOUDFRONT_KEY_PAIR_ID = os.environ.get("CLOUDFRONT_KEY_PAIR_ID", "")
+CLOUDFRONT_COOKIE_DOMAIN = os.environ.get("CLOUDFRONT_COOKIE_DOMAIN", "")
+CLOUDFRONT_COOKIE_TTL_SECONDS = int(os.environ.get("CLOUDFRONT_COOKIE_TTL_SECONDS", "43200"))
+
+_signer: Optional[CloudFrontCookieSigner] = None
+_signer_lock = threading.Lock()
+
+
+def _load_private_key_pem() -> bytes:
+    """
+    秘密鍵を取得
+    - CLOUDFRONT_PRIVATE_KEY: PEM文字列（ローカル検証用）
+    - CLOUDFRONT_PRIVATE_KEY_PARAMETER: SSM SecureString パラメータ名（本番用）
+    """
+    pem = os.environ.get("CLOUDFRONT_PRIVATE_KEY")
+    if pem:
+        return pem.replace("\\n", "\n").encode("utf-8")
+
+    parameter_name = os.environ.get("CLOUDFRONT_PRIVATE_KEY_PARAMETER")
+    if parameter_name:
+        import boto3
+
+        response = boto3.client("ssm").get_parameter(Name=parameter_name, WithDecryption=True)
+        return response["Parameter"]["Value"].encode("utf-8")
+
+    raise ValueError("CLOUDFRONT_PRIVATE_KEY or CLOUDFRONT_PRIVATE_KEY_PARAMETER must be set")
+
+
+def get_signer() -> CloudFrontCookieSigner:
+    """環境変数から署名クラスを生成（ウォームコンテナ内で再利用）"""
+    global _signer
+    if _signer is None:
+        with _signer_lock:
+            if _signer is None:
+                if not CLOUDFRONT_KEY_PAIR_ID:
+                    raise ValueError("CLOUDFRONT_KEY_PAIR_ID environment variable not set")
+                _signer = CloudFrontCookieSigner(CLOUDFRONT_KEY_PAIR_ID, _load_private_key_pem())
+    return _signer
+
+
+def user_photo_prefix(username: str) -> str:
+    """ユーザーの写真プレフィックス（Cookie のポリシーとパスの対象。写真全体のルート photos/ 配下）"""
+    return f"{PHOTO_KEY_PREFIX}{username}/"
+
+
+def is_cdn_photo_key(photo_key: str, username: str) -> bool:
+    """username の Cookie で CloudFront 経由で配信できるキー（本人の写真プレフィックス配下）か判定"""
+    return bool(photo_key) and bool(username) and photo_key.startswith(user_photo_prefix(username))
+
+
+def get_cdn_photo_url(photo_key: str) -> str:
+    """S3キーを CloudFront 上のパスに変換（署名はCookie側で行うため URL は素のまま）"""
+    return f"https://{CLOUDFRONT_PHOTO_DOMAIN}/{photo_key}"
+
+
+def issue_photo_cookies(username: str, now: Optional[float] = None) -> Dict:
+    """
+    ユーザーの写真プレフィックスを対象とした署名付き Cookie を発行
+
+    API Gateway のドメインから CloudFront のドメインの Cookie は設定できないため、
+    フロントエンドが返された値を CloudFront のドメイン（サイトと同じ配信）に設定する
+
+    Returns:
+        {"cookies": {...}, "expires_at": UNIX秒, "domain": ..., "path": ...}
+    """
+    if not CLOUDFRONT_PHOTO_DOMAIN:
+        raise ValueError("CLOUDFRONT_PHOTO_DOMAIN environment variable not set")
+    if not username or "/" in username or "*" in username:
+        raise ValueError(f"Invalid username for photo cookies: {username!r}")
+
+    expires_at = int(now if now is not None else time.time()) + CLOUDFRONT_COOKIE_TTL_SECONDS
+    prefix = user_photo_prefix(username)
+    resource = f"https://{CLOUDFRONT_PHOTO_DOMAIN}/{prefix}*"
+    return {
+        "cookies": get_signer().generate_cookies(resource, expires_at),
+        "expires_at": expires_at,
+        "domain": CLOUDFRONT_COOKIE_DOMAIN or CLOUDFRONT_PHOTO_DOMAIN,
+        "path": f"/{prefix}",
+    }
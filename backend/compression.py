@@ -0,0 +1,110 @@
+"""
+Lambda Proxy レスポンスの圧縮（Accept-Encoding に基づく gzip / brotli）
+brotli は任意の依存パッケージ（インストールされている場合のみ使用。Lambda では依存パッケージレイヤーに含める）
+"""
+import base64
+import gzip
+import os
+from typing import Dict, Optional
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # Lambda 標準ランタイムには含まれない
+    brotli = None
+
+# これより小さいボディは圧縮しない（ヘッダーとbase64化のオーバーヘッドの方が大きいため）
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+
+
+def supported_encodings() -> list:
+    """サーバー側で利用可能なエンコーディング（優先順）"""
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Accept-Encoding からレスポンスのエンコーディングを決定
+
+    Returns:
+        "br" / "gzip"、圧縮しない場合は None
+    """
+    if not accept_encoding:
+        return None
+
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = qualities.get(coding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    """指定エンコーディングで圧縮"""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def _vary_accept_encoding(headers: Dict) -> Dict:
+    """Vary に Accept-Encoding を追加（既存の Vary は保持）"""
+    for key, value in headers.items():
+        if key.lower() == "vary":
+            if "accept-encoding" in value.lower():
+                return headers
+            return {**headers, key: f"{value}, Accept-Encoding"}
+    return {**headers, "Vary": "Accept-Encoding"}
+
+
+def compress_response(response: Dict, accept_encoding: Optional[str], min_bytes: int = COMPRESSION_MIN_BYTES) -> Dict:
+    """
+    Lambda Proxy レスポンスのボディを圧縮し、API Gateway 用に base64 化
+
+    対象外（そのまま返す）:
+    - ボディが空、既にバイナリ・エンコード済み
+    - Accept-Encoding が未対応、ボディが閾値未満（Vary: Accept-Encoding のみ付ける）
+
+    圧縮の有無が Accept-Encoding で変わるため、圧縮しなかったレスポンスにも Vary を付けて
+    キャッシュが gzip のレスポンスを未対応のクライアントに返さないようにする
+    """
+    body = response.get("body")
+    if not body or response.get("isBase64Encoded"):
+        return response
+
+    headers = response.get("headers") or {}
+    if any(key.lower() == "content-encoding" for key in headers):
+        return response
+
+    headers = _vary_accept_encoding(headers)
+    encoding = negotiate_encoding(accept_encoding)
+    raw = body.encode("utf-8")
+    if not encoding or len(raw) < min_bytes:
+        return {**response, "headers": headers}
+
+    compressed = compress_body(raw, encoding)
+    return {
+        **response,
+        "headers": {**headers, "Content-Encoding": encoding},
+        "body": base64.b64encode(compressed).decode("ascii"),
+        "isBase64Encoded": True,
+    }
@@ -3,20 +3,344 @@ DynamoDB データベース操作
 """
 import boto3
 from boto3.dynamodb.conditions import Key
-from datetime import datetime
-from typing import Optional, List
+from datetime import datetime, timedelta
+from typing import Optional, List, Iterable, Iterator, Sequence, Tuple
+import base64
+import bisect
+import collections
+import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import pytz
 from models import DiaryEntry
+from structured_logging import get_logger
+from cache import TTLCache
+from metrics import timed
+from prompt_store import batch_get_prompts, recent_prompt_dates
+from photo_upload import (
+    PHOTO_MULTIPART_PART_SIZE,
+    PHOTO_RENDITIONS,
+    original_photo_key,
+    parse_photo_key,
+    rendition_key,
+)
+from calendar_projection import (
+    CALENDAR_TABLE_NAME,
+    DynamoCalendarMonthStore,
+    InMemoryCalendarMonthStore,
+    LocalChangeStream,
+    month_document_key,
+)
+
+# 署名付きURLキャッシュ（ウォームコンテナ内の全ハンドラーで共有）
+# 署名の有効期限（24時間）より十分短いTTLで保持し、同じS3キーの再署名を避ける
+PHOTO_URL_CACHE_TTL_SECONDS = int(os.environ.get("PHOTO_URL_CACHE_TTL_SECONDS", "3600"))
+PHOTO_URL_CACHE_MAX_ENTRIES = int(os.environ.get("PHOTO_URL_CACHE_MAX_ENTRIES", "2048"))
+photo_url_cache = TTLCache(
+    max_entries=PHOTO_URL_CACHE_MAX_ENTRIES,
+    default_ttl=PHOTO_URL_CACHE_TTL_SECONDS,
+)
+
+# お題キャッシュ（ウォームコンテナ内で共有。/prompt はページを開くたびに呼ばれるが、お題は1日1回しか変わらない）
+# 過去の日付は期限なし、今日以降は次の JST 0時まで、未生成（見つからない）は短いTTLで保持する
+PROMPT_CACHE_MAX_ENTRIES = int(os.environ.get("PROMPT_CACHE_MAX_ENTRIES", "256"))
+PROMPT_NEGATIVE_CACHE_TTL_SECONDS = int(os.environ.get("PROMPT_NEGATIVE_CACHE_TTL_SECONDS", "60"))
+prompt_cache = TTLCache(max_entries=PROMPT_CACHE_MAX_ENTRIES, default_ttl=None)
+# お題が存在しないことをキャッシュする際の値（TTLCache.get の default と区別する）
+_PROMPT_NOT_FOUND = object()
+
+
+logger = get_logger("database")
+
+# ===== AWS クライアント（遅延初期化） =====
+# resource / client の生成はサービスモデルの読み込みで時間がかかるため、
+# 初回使用時に1度だけ生成してウォームコンテナ内で共有する（boto3 のデフォルトセッションはスレッドセーフでない）
+DYNAMODB_ENDPOINT_URL = os.environ.get("DYNAMODB_ENDPOINT_URL")  # DynamoDB Local 用（省略可）
+
+_aws_lock = threading.Lock()
+_aws_clients: dict = {}
+
+
+def _get_aws(kind: str, service: str):
+    key = (kind, service)
+    obj = _aws_clients.get(key)
+    if obj is None:
+        with _aws_lock:
+            obj = _aws_clients.get(key)
+            if obj is None:
+                kwargs = {}
+                if service == "dynamodb" and DYNAMODB_ENDPOINT_URL:
+                    kwargs["endpoint_url"] = DYNAMODB_ENDPOINT_URL
+                factory = boto3.resource if kind == "resource" else boto3.client
+                obj = factory(service, **kwargs)
+                _aws_clients[key] = obj
+    return obj
+
+
+def get_dynamodb_resource():
+    """共有の DynamoDB リソース"""
+    return _get_aws("resource", "dynamodb")
+
+
+def get_s3_client():
+    """共有の S3 クライアント"""
+    return _get_aws("client", "s3")
+
+
+def prompt_cache_ttl(date: str, found: bool, now: Optional[datetime] = None) -> Optional[float]:
+    """
+    お題キャッシュの有効期間（秒）
+
+    過去の日付のお題は変わらないため期限なし（None）。今日以降は次の JST 0時まで
+    （日付が変わると過去の日付になる）。見つからない場合は PROMPT_NEGATIVE_CACHE_TTL_SECONDS まで
+    """
+    jst = pytz.timezone('Asia/Tokyo')
+    now_jst = now.astimezone(jst) if now is not None else datetime.now(jst)
+    next_midnight = jst.localize(datetime.combine(now_jst.date() + timedelta(days=1), datetime.min.time()))
+    until_midnight = (next_midnight - now_jst).total_seconds()
+    if not found:
+        return min(PROMPT_NEGATIVE_CACHE_TTL_SECONDS, until_midnight)
+    if date < now_jst.strftime("%Y-%m-%d"):
+        return None
+    return until_midnight
+
+
+# データベースの実装: "dynamodb" / "memory" / "sqlite"（ローカル永続化、SQLITE_DB_PATH）
+DB_BACKENDS = ("dynamodb", "memory", "sqlite")
+
+
+def resolve_db_backend(table_name: Optional[str]) -> str:
+    """
+    使用するデータベース実装を決定
+    
+    環境変数 DIARY_DB_BACKEND で明示指定する。未指定の場合はテーブル名があれば dynamodb、なければ memory
+    （テーブルの存在確認は行わない）
+    """
+    backend = os.environ.get("DIARY_DB_BACKEND", "").strip().lower()
+    if not backend:
+        backend = "dynamodb" if table_name else "memory"
+    if backend not in DB_BACKENDS:
+        raise ValueError(f"Invalid DIARY_DB_BACKEND: {backend}")
+    if backend == "dynamodb" and not table_name:
+        raise ValueError("DYNAMODB_TABLE_NAME environment variable not set")
+    return backend
+
+
+# GSI名 → パーティションキー属性名（ソートキーはいずれも date）
+INDEX_PARTITION_KEYS = {
+    "user_id-date-index": "user_id",
+    "is_public-date-index": "is_public",
+}
+
+
+def encode_cursor(last_evaluated_key: Optional[dict]) -> Optional[str]:
+    """LastEvaluatedKey を API で返す不透明なカーソル文字列に変換"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(",", ":"), sort_keys=True, default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(
+    cursor: Optional[str],
+    index_name: str,
+    partition_value: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    カーソル文字列を ExclusiveStartKey に戻す
+
+    キーが GSI のキー（テーブルキー・パーティションキー・date）と一致し、パーティションの値と
+    日付が Query の条件内であることを確認する（DynamoDB の ValidationException を 400 にするため）
+
+    Raises:
+        ValueError: カーソルが不正な場合
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    partition_attr = INDEX_PARTITION_KEYS[index_name]
+    if (
+        not isinstance(key, dict)
+        or set(key) != {"user_id#date", partition_attr, "date"}
+        or not all(isinstance(v, str) for v in key.values())
+        or key[partition_attr] != partition_value
+        or not key["user_id#date"].endswith(f"#{key['date']}")
+        or (partition_attr == "user_id" and key["user_id#date"] != f"{partition_value}#{key['date']}")
+        or (start_date is not None and key["date"] < start_date)
+        or (end_date is not None and key["date"] > end_date)
+    ):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return key
+
+
+# カレンダーのサマリー表示用の抜粋の長さ（書き込み時に excerpt 属性として保存）
+EXCERPT_LENGTH = 80
+
+# view=summary のカレンダー取得で読み込む属性（本文 content は含めない）
+SUMMARY_ATTRIBUTES = (
+    "user_id#date", "user_id", "date", "mood", "weather", "excerpt", "photos", "is_public", "updated_at",
+)
+
+
+# BatchGetItem の1リクエストあたりの最大キー数と、未処理キーの再試行回数
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 5
+# BatchWriteItem の1リクエストあたりの最大件数と、未処理アイテムの再試行回数
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_RETRIES = 8
+# 写真のマルチパートアップロード（サーバー側）: 並列に送るパート数と、パートごとの再試行回数
+PHOTO_PART_CONCURRENCY = int(os.environ.get("PHOTO_PART_CONCURRENCY", "4"))
+PHOTO_PART_MAX_RETRIES = 3
+
+
+def make_excerpt(content: str, length: int = EXCERPT_LENGTH) -> str:
+    """本文から抜粋を作成（改行は空白にまとめる）"""
+    text = " ".join((content or "").split())
+    return text if len(text) <= length else text[:length - 1] + "…"
+
+
+def build_diary_item(entry: DiaryEntry, updated_at: Optional[str] = None) -> dict:
+    """DiaryEntry を日記テーブルのアイテムに変換（updated_at 省略時は現在時刻）"""
+    jst = pytz.timezone('Asia/Tokyo')
+    return {
+        "user_id#date": f"{entry.username}#{entry.date}",
+        "user_id": entry.username,
+        "date": entry.date,
+        "content": entry.content,
+        "excerpt": make_excerpt(entry.content),  # カレンダーのサマリー表示用
+        "mood": entry.mood,
+        "weather": entry.weather,
+        "photos": entry.photos,
+        "is_public": "true" if entry.is_public else "false",  # DynamoDBインデックスは文字列型を期待
+        "created_at": entry.created_at,
+        "updated_at": updated_at or datetime.now(jst).isoformat(),
+    }
+
+
+def build_set_expression(attrs: dict, if_not_exists: Sequence[str] = ()) -> Tuple[str, dict, dict]:
+    """
+    属性の更新を UpdateItem の SET 式に変換
+
+    date などの予約語を含むため、属性名はすべてプレースホルダーにする
+
+    Returns:
+        (UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+    """
+    names, values, assignments = {}, {}, []
+    for i, (attr, value) in enumerate(attrs.items()):
+        names[f"#a{i}"] = attr
+        values[f":a{i}"] = value
+        if attr in if_not_exists:
+            assignments.append(f"#a{i} = if_not_exists(#a{i}, :a{i})")
+        else:
+            assignments.append(f"#a{i} = :a{i}")
+    return "SET " + ", ".join(assignments), names, values
+
+
+def month_date_range(year: int, month: int) -> Tuple[str, str]:
+    """月の検索範囲（YYYY-MM-01 〜 YYYY-MM-31、文字列比較用）"""
+    return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-31"
 
 
 class InMemoryDatabase:
-    """開発モード用のメモリ内データベース"""
+    """
+    開発モード用のメモリ内データベース
+    
+    GSI と同じく (パーティション値) ごとに (date, user_id#date) でソートしたインデックスを保持し、
+    範囲検索は二分探索で行う。マルチスレッドのサーバーから使えるよう操作はロックで保護する
+    """
     
     def __init__(self, table_name: str):
         self.table_name = table_name
         self.data = {}  # key: "user_id#date", value: item
+        # インデックス名 → パーティション値 → [(date, user_id#date), ...]（昇順）
+        self.indexes = {index_name: {} for index_name in INDEX_PARTITION_KEYS}
+        self.prompts = {}  # key: date, value: item
+        # 変更通知先（DynamoDB Streams の代替）: listener(event_name, old_image, new_image)
+        self.change_listeners = []
+        # 変更通知もロック内で行う（書き込み順に通知するため。リスナーからの読み込みは同じスレッドなので RLock）
+        self._lock = threading.RLock()
+    
+    def _emit(self, event_name: str, old_image: Optional[dict], new_image: Optional[dict]) -> None:
+        """変更を Streams と同じ INSERT / MODIFY / REMOVE で通知"""
+        for listener in self.change_listeners:
+            listener(event_name, old_image, new_image)
+    
+    def _index_add(self, item: dict) -> None:
+        sort_key = (item["date"], item["user_id#date"])
+        for index_name, partition_attr in INDEX_PARTITION_KEYS.items():
+            if partition_attr in item:  # スパースインデックス（属性がないアイテムは含めない）
+                bisect.insort(self.indexes[index_name].setdefault(item[partition_attr], []), sort_key)
+    
+    def _index_remove(self, item: dict) -> None:
+        sort_key = (item["date"], item["user_id#date"])
+        for index_name, partition_attr in INDEX_PARTITION_KEYS.items():
+            entries = self.indexes[index_name].get(item.get(partition_attr))
+            if not entries:
+                continue
+            i = bisect.bisect_left(entries, sort_key)
+            if i < len(entries) and entries[i] == sort_key:
+                del entries[i]
+            if not entries:
+                del self.indexes[index_name][item[partition_attr]]
+    
+    def _store(self, key: str, item: Optional[dict]) -> Optional[dict]:
+        """アイテムを置き換え（None で削除）、インデックスを更新して変更前のアイテムを返す"""
+        old_image = self.data.pop(key, None)
+        if old_image is not None:
+            self._index_remove(old_image)
+        if item is not None:
+            self.data[key] = item
+            self._index_add(item)
+        return old_image
+    
+    def put_item(self, item: dict) -> dict:
+        """アイテムを丸ごと保存（DynamoDB の put_item 相当）"""
+        with self._lock:
+            old_image = self._store(item["user_id#date"], item)
+            self._emit("MODIFY" if old_image else "INSERT", old_image, dict(item))
+        return item
+    
+    def upsert_item(self, item: dict, if_not_exists: Sequence[str] = ("created_at",)) -> dict:
+        """
+        アイテムの属性を作成または上書き（DynamoDB の update_item による upsert 相当）
+        
+        item にない既存の属性は残し、if_not_exists の属性は既存の値を優先する
+        
+        Returns:
+            更新後のアイテム（ReturnValues=ALL_NEW 相当）
+        """
+        key = item["user_id#date"]
+        with self._lock:
+            old_image = self.data.get(key)
+            new_item = {**(old_image or {}), **item}
+            for attr in if_not_exists:
+                if old_image and attr in old_image:
+                    new_item[attr] = old_image[attr]
+            self._store(key, new_item)
+            self._emit("MODIFY" if old_image else "INSERT", old_image, dict(new_item))
+        return new_item
+    
+    def patch_item(self, key: str, attrs: dict) -> Optional[dict]:
+        """既存のアイテムの属性を上書き（アイテムがない場合は何もせず None）"""
+        with self._lock:
+            old_image = self.data.get(key)
+            if old_image is None:
+                return None
+            new_item = {**old_image, **attrs}
+            self._store(key, new_item)
+            self._emit("MODIFY", old_image, dict(new_item))
+        return new_item
     
     def put_entry(
         self,
@@ -41,12 +365,18 @@ class InMemoryDatabase:
         if photo_url:
             item["photo_url"] = photo_url
         
-        self.data[key] = item
-        return item
+        return self.put_item(item)
     
     def get_entry(self, user_id: str, date: str) -> Optional[dict]:
         key = f"{user_id}#{date}"
-        return self.data.get(key)
+        with self._lock:
+            return self.data.get(key)
+    
+    def get_entries(self, user_id: str, dates: Sequence[str]) -> List[dict]:
+        """指定日のアイテムをまとめて取得（存在しない日は含めない）"""
+        with self._lock:
+            items = (self.data.get(f"{user_id}#{date}") for date in dates)
+            return [item for item in items if item is not None]
     
     def update_entry(
         self,
@@ -57,48 +387,126 @@ class InMemoryDatabase:
         photo_url: Optional[str] = None,
     ) -> dict:
         key = f"{user_id}#{date}"
-        if key not in self.data:
-            raise KeyError(f"Entry not found: {key}")
-        
-        item = self.data[key]
-        jst = pytz.timezone('Asia/Tokyo')
-        item["updated_at"] = datetime.now(jst).isoformat()
-        
-        if entry_text is not None:
-            item["entry_text"] = entry_text
-        if is_public is not None:
-            item["is_public"] = "true" if is_public else "false"
-        if photo_url is not None:
-            item["photo_url"] = photo_url
-        
+        with self._lock:
+            if key not in self.data:
+                raise KeyError(f"Entry not found: {key}")
+            
+            # 読み込み中の他スレッドに途中の状態を見せないよう、コピーを更新して置き換える
+            item = dict(self.data[key])
+            jst = pytz.timezone('Asia/Tokyo')
+            item["updated_at"] = datetime.now(jst).isoformat()
+            
+            if entry_text is not None:
+                item["entry_text"] = entry_text
+            if is_public is not None:
+                item["is_public"] = "true" if is_public else "false"
+            if photo_url is not None:
+                item["photo_url"] = photo_url
+            
+            old_image = self._store(key, item)
+            self._emit("MODIFY", old_image, dict(item))
         return item
     
     def delete_entry(self, user_id: str, date: str) -> None:
         key = f"{user_id}#{date}"
-        if key in self.data:
-            del self.data[key]
+        with self._lock:
+            old_image = self._store(key, None)
+            if old_image is not None:
+                self._emit("REMOVE", old_image, None)
     
-    def query_month(self, user_id: str, year: int, month: int) -> list[dict]:
-        start_date = f"{year:04d}-{month:02d}-01"
-        end_date = f"{year:04d}-{month:02d}-31"
-        
-        results = []
-        for key, item in self.data.items():
-            if item["user_id"] == user_id and start_date <= item["date"] <= end_date:
-                results.append(item)
+    def query(
+        self,
+        index_name: str,
+        partition_value: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        scan_forward: bool = True,
+        limit: Optional[int] = None,
+        exclusive_start_key: Optional[dict] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """
+        GSI に対する Query を再現（DynamoDB と同じページング挙動）
+
+        - date 昇順（scan_forward=False で降順）、同日内はテーブルキー順
+        - limit 件に達した場合は LastEvaluatedKey を返す
+        - exclusive_start_key の次のアイテムから返す
+        - attributes 指定時はその属性のみ返す（ProjectionExpression 相当）
+
+        Returns:
+            {"Items": [...], "LastEvaluatedKey": {...}}（続きがない場合は LastEvaluatedKey なし）
+        """
+        partition_attr = INDEX_PARTITION_KEYS[index_name]
+        with self._lock:
+            entries = self.indexes[index_name].get(partition_value, [])
+            # 日付範囲を二分探索（(date,) は同じ date の (date, key) より小さい）
+            lo = bisect.bisect_left(entries, (start_date,)) if start_date is not None else 0
+            hi = bisect.bisect_left(entries, (end_date + "\x00",)) if end_date is not None else len(entries)
+            
+            if exclusive_start_key:
+                start = (exclusive_start_key["date"], exclusive_start_key["user_id#date"])
+                if scan_forward:
+                    lo = max(lo, bisect.bisect_right(entries, start))
+                else:
+                    hi = min(hi, bisect.bisect_left(entries, start))
+            
+            available = max(hi - lo, 0)
+            if limit and available > limit:
+                selected = entries[lo:lo + limit] if scan_forward else entries[hi - limit:hi]
+            else:
+                selected = entries[lo:hi]
+            if not scan_forward:
+                selected = selected[::-1]
+            items = [self.data[key] for _, key in selected]
         
-        return results
+        response = {"Items": items}
+        if limit and available >= limit:
+            last = response["Items"][-1]
+            response["LastEvaluatedKey"] = {
+                "user_id#date": last["user_id#date"],
+                partition_attr: last[partition_attr],
+                "date": last["date"],
+            }
+        if attributes:
+            response["Items"] = [
+                {attr: item[attr] for attr in attributes if attr in item} for item in response["Items"]
+            ]
+        return response
+    
+    def query_month(self, user_id: str, year: int, month: int) -> list[dict]:
+        start_date, end_date = month_date_range(year, month)
+        return self.query("user_id-date-index", user_id, start_date, end_date)["Items"]
     
     def query_public_entries_for_month(self, year: int, month: int) -> list[dict]:
-        start_date = f"{year:04d}-{month:02d}-01"
-        end_date = f"{year:04d}-{month:02d}-31"
-        
-        results = []
-        for key, item in self.data.items():
-            if item["is_public"] == "true" and start_date <= item["date"] <= end_date:
-                results.append(item)
-        
-        return results
+        start_date, end_date = month_date_range(year, month)
+        return self.query("is_public-date-index", "true", start_date, end_date)["Items"]
+    
+    def bulk_load(self, items, batch_size: int = 10000) -> int:
+        """アイテムを一括で保存（変更通知は行わない）"""
+        loaded = 0
+        with self._lock:
+            for item in items:
+                self._store(item["user_id#date"], item)
+                loaded += 1
+        return loaded
+    
+    def count(self) -> int:
+        return len(self.data)
+    
+    # ===== お題 =====
+    def put_prompt(self, item: dict) -> dict:
+        with self._lock:
+            self.prompts[item["date"]] = item
+        return item
+    
+    def get_prompt(self, date: str) -> Optional[dict]:
+        return self.prompts.get(date)
+    
+    def get_prompts(self, dates: Sequence[str]) -> List[dict]:
+        """指定日のお題（新しい順）"""
+        with self._lock:
+            items = [self.prompts[date] for date in set(dates) if date in self.prompts]
+        return sorted(items, key=lambda x: x["date"], reverse=True)
 
 
 class DiaryDatabase:
@@ -112,30 +520,82 @@ class DiaryDatabase:
             table_name: DynamoDB テーブル名
             photo_bucket: S3 バケット名（写真保存用）
         """
-        # 開発モード判定: AWS認証情報がない、またはテーブルが存在しない場合
-        use_in_memory = False
-        
-        try:
-            dynamodb = boto3.resource("dynamodb")
-            self.table = dynamodb.Table(table_name)
-            # テーブル存在確認
-            self.table.table_status
-            self.table_name = table_name
-        except Exception:
-            use_in_memory = True
+        # boto3 のリソース・クライアントとテーブルは初回アクセス時に生成する（コールドスタート短縮のため）
+        self.backend = resolve_db_backend(table_name)
+        self.table_name = table_name
+        self.photo_bucket = photo_bucket
+        self._lock = threading.Lock()
+        self._table = None
+        self._s3_client = None
+        self._dynamo_calendar_store = None
+        self._prompts_table = None
+        # 写真がアップロードされた時に呼び出す関数（本番では S3 イベントで photo_thumbnails が起動するため空）
+        self.photo_upload_listeners: List = []
         
-        if use_in_memory:
-            self._in_memory = InMemoryDatabase(table_name)
+        if self.backend == "memory":
+            logger.info("Using in-memory database (DIARY_DB_BACKEND=memory)")
+            self._local = InMemoryDatabase(table_name)
+        elif self.backend == "sqlite":
+            from sqlite_database import SQLiteDatabase, SQLITE_DB_PATH
+
+            logger.info("Using SQLite database: %s (DIARY_DB_BACKEND=sqlite)", SQLITE_DB_PATH)
+            self._local = SQLiteDatabase(SQLITE_DB_PATH)
         else:
-            self._in_memory = None
+            self._local = None
         
-        # S3クライアント
-        self.photo_bucket = photo_bucket
-        if photo_bucket:
-            self.s3_client = boto3.client("s3")
+        if self._local:
+            # 家族カレンダーの月次ドキュメント（ローカルでは変更をその場で再生）
+            self._local_calendar_store = InMemoryCalendarMonthStore(month_loader=self.load_public_month)
+            self._local.change_listeners.append(LocalChangeStream(self._local_calendar_store))
+            if photo_bucket:
+                # 縮小版の作成（ローカルでは S3 イベントの代わりにアップロード時に同期的に実行）
+                from photo_thumbnails import LocalS3Events
+
+                self.photo_upload_listeners.append(LocalS3Events(self))
         else:
-            self.s3_client = None
+            self._local_calendar_store = None
+
+    def _lazy(self, attr: str, factory):
+        """属性を初回アクセス時に1度だけ生成（スレッドセーフ）"""
+        value = getattr(self, attr)
+        if value is None:
+            with self._lock:
+                value = getattr(self, attr)
+                if value is None:
+                    value = factory()
+                    setattr(self, attr, value)
+        return value
+
+    @property
+    def table(self):
+        """日記テーブル（DynamoDB モードのみ）"""
+        if self._local:
+            raise RuntimeError(f"DynamoDB table is not available in {self.backend} mode")
+        return self._lazy("_table", lambda: get_dynamodb_resource().Table(self.table_name))
+
+    @property
+    def s3_client(self):
+        """S3クライアント（写真バケット未設定の場合は None）"""
+        if not self.photo_bucket:
+            return None
+        return self._lazy("_s3_client", get_s3_client)
 
+    @property
+    def _calendar_store(self):
+        """
+        家族カレンダーの月次ドキュメントストア
+        本番では Streams Lambda が更新したテーブルを読むだけ（テーブル未設定の場合は None）
+        """
+        if self._local_calendar_store:
+            return self._local_calendar_store
+        if not CALENDAR_TABLE_NAME:
+            return None
+        return self._lazy(
+            "_dynamo_calendar_store",
+            lambda: DynamoCalendarMonthStore(get_dynamodb_resource().Table(CALENDAR_TABLE_NAME)),
+        )
+
+    @timed("db")
     def put_entry(
         self,
         user_id: str,
@@ -157,8 +617,8 @@ class DiaryDatabase:
         Returns:
             保存されたアイテム
         """
-        if self._in_memory:
-            return self._in_memory.put_entry(user_id, date, entry_text, is_public, photo_url)
+        if self._local:
+            return self._local.put_entry(user_id, date, entry_text, is_public, photo_url)
         
         jst = pytz.timezone('Asia/Tokyo')
         now_jst = datetime.now(jst)
@@ -177,6 +637,7 @@ class DiaryDatabase:
         self.table.put_item(Item=item)
         return item
 
+    @timed("db")
     def get_entry(self, user_id: str, date: str) -> Optional[dict]:
         """
         日記エントリを取得
@@ -188,14 +649,15 @@ class DiaryDatabase:
         Returns:
             エントリアイテム、見つからない場合は None
         """
-        if self._in_memory:
-            return self._in_memory.get_entry(user_id, date)
+        if self._local:
+            return self._local.get_entry(user_id, date)
         
         response = self.table.get_item(
             Key={"user_id#date": f"{user_id}#{date}"}
         )
         return response.get("Item")
 
+    @timed("db")
     def update_entry(
         self,
         user_id: str,
@@ -217,8 +679,8 @@ class DiaryDatabase:
         Returns:
             更新されたアイテム
         """
-        if self._in_memory:
-            return self._in_memory.update_entry(user_id, date, entry_text, is_public, photo_url)
+        if self._local:
+            return self._local.update_entry(user_id, date, entry_text, is_public, photo_url)
         
         jst = pytz.timezone('Asia/Tokyo')
         update_expr = "SET updated_at = :updated_at"
@@ -244,6 +706,65 @@ class DiaryDatabase:
         )
         return response.get("Attributes", {})
 
+    def upsert_entry(
+        self,
+        user_id: str,
+        date: str,
+        entry_text: str,
+        is_public: bool = False,
+        photo_url: Optional[str] = None,
+    ) -> dict:
+        """
+        日記エントリを作成または更新（UpdateItem 1回、既存の created_at は保持）
+
+        Args:
+            user_id: ユーザーID
+            date: 日付 (YYYY-MM-DD)
+            entry_text: エントリテキスト
+            is_public: 公開フラグ
+            photo_url: 写真URL（None の場合は既存の値を変更しない）
+
+        Returns:
+            保存後のアイテム（新規作成の場合は created_at と updated_at が一致する）
+        """
+        jst = pytz.timezone('Asia/Tokyo')
+        now = datetime.now(jst).isoformat()
+        item = {
+            "user_id#date": f"{user_id}#{date}",
+            "user_id": user_id,
+            "date": date,
+            "entry_text": entry_text,
+            "is_public": "true" if is_public else "false",  # String for GSI
+            "created_at": now,
+            "updated_at": now,
+        }
+        if photo_url is not None:
+            item["photo_url"] = photo_url
+        return self._upsert_item(item)
+
+    @timed("db")
+    def _upsert_item(self, item: dict, if_not_exists: Sequence[str] = ("created_at",)) -> dict:
+        """
+        アイテムの属性を作成または上書き（UpdateItem の upsert、ReturnValues=ALL_NEW）
+
+        item にない既存の属性（rendered_photos など）は残し、if_not_exists の属性は既存の値を優先する。
+        GetItem + PutItem の2往復を1回にする
+        """
+        if self._local:
+            return self._local.upsert_item(item, if_not_exists)
+
+        attrs = {attr: value for attr, value in item.items() if attr != "user_id#date"}
+        expression, names, values = build_set_expression(attrs, if_not_exists)
+        response = self.table.update_item(
+            Key={"user_id#date": item["user_id#date"]},
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+        )
+        return response["Attributes"]
+
+    @timed("db")
     def delete_entry(self, user_id: str, date: str) -> None:
         """
         日記エントリを削除
@@ -252,14 +773,129 @@ class DiaryDatabase:
             user_id: ユーザーID
             date: 日付 (YYYY-MM-DD)
         """
-        if self._in_memory:
-            return self._in_memory.delete_entry(user_id, date)
+        if self._local:
+            return self._local.delete_entry(user_id, date)
         
         self.table.delete_item(Key={"user_id#date": f"{user_id}#{date}"})
 
+    @timed("db")
+    def _query_index(
+        self,
+        index_name: str,
+        partition_value: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        scan_forward: bool = True,
+        limit: Optional[int] = None,
+        exclusive_start_key: Optional[dict] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """
+        GSI に対して1ページ分の Query を実行
+
+        Args:
+            attributes: 取得する属性（ProjectionExpression）。None の場合は全属性
+
+        Returns:
+            DynamoDB の Query レスポンス形式（Items / LastEvaluatedKey）
+        """
+        if self._local:
+            return self._local.query(
+                index_name, partition_value, start_date, end_date,
+                scan_forward, limit, exclusive_start_key, attributes,
+            )
+        
+        key_condition = Key(INDEX_PARTITION_KEYS[index_name]).eq(partition_value)
+        if start_date and end_date:
+            key_condition = key_condition & Key("date").between(start_date, end_date)
+        
+        query_kwargs = {
+            "IndexName": index_name,
+            "KeyConditionExpression": key_condition,
+            "ScanIndexForward": scan_forward,
+        }
+        if limit:
+            query_kwargs["Limit"] = limit
+        if exclusive_start_key:
+            query_kwargs["ExclusiveStartKey"] = exclusive_start_key
+        if attributes:
+            # date などの予約語を避けるため、すべて属性名プレースホルダで指定
+            names = {f"#p{i}": attr for i, attr in enumerate(attributes)}
+            query_kwargs["ProjectionExpression"] = ", ".join(names)
+            query_kwargs["ExpressionAttributeNames"] = names
+        return self.table.query(**query_kwargs)
+
+    def _iter_query_pages(
+        self,
+        index_name: str,
+        partition_value: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        scan_forward: bool = True,
+        limit: Optional[int] = None,
+        exclusive_start_key: Optional[dict] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Iterator[Tuple[List[dict], Optional[dict]]]:
+        """
+        LastEvaluatedKey をたどって Query 結果をページ単位で返すジェネレータ
+
+        Args:
+            limit: 合計の最大取得件数（None の場合は最後まで）
+
+        Yields:
+            (そのページのアイテム, LastEvaluatedKey)
+        """
+        remaining = limit
+        start_key = exclusive_start_key
+        while True:
+            response = self._query_index(
+                index_name, partition_value, start_date, end_date,
+                scan_forward, remaining, start_key, attributes,
+            )
+            items = response.get("Items", [])
+            start_key = response.get("LastEvaluatedKey")
+            if remaining is not None:
+                remaining -= len(items)
+            
+            yield items, start_key
+            
+            if not start_key or (remaining is not None and remaining <= 0):
+                return
+
+    def _iter_query_items(self, *args, **kwargs) -> Iterator[dict]:
+        """_iter_query_pages のアイテムを1件ずつ返すジェネレータ"""
+        for items, _ in self._iter_query_pages(*args, **kwargs):
+            yield from items
+
+    def _query_page(
+        self,
+        index_name: str,
+        partition_value: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        scan_forward: bool = True,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        カーソルから最大 limit 件を取得
+
+        Returns:
+            (アイテムリスト, 次ページのカーソル。最後まで取得した場合は None)
+        """
+        items: List[dict] = []
+        last_key = None
+        for page, last_key in self._iter_query_pages(
+            index_name, partition_value, start_date, end_date,
+            scan_forward, limit, decode_cursor(cursor, index_name, partition_value, start_date, end_date), attributes,
+        ):
+            items.extend(page)
+        return items, encode_cursor(last_key)
+
     def query_month(self, user_id: str, year: int, month: int) -> list[dict]:
         """
-        月間エントリを取得
+        月間エントリを取得（全ページ）
 
         Args:
             user_id: ユーザーID
@@ -269,27 +905,39 @@ class DiaryDatabase:
         Returns:
             エントリリスト
         """
-        if self._in_memory:
-            return self._in_memory.query_month(user_id, year, month)
-        
-        # Query using GSI with user_id and date prefix
-        start_date = f"{year:04d}-{month:02d}-01"
-        # Last day of month calculation
-        if month == 12:
-            end_date = f"{year:04d}-{month:02d}-31"
-        else:
-            end_date = f"{year:04d}-{month:02d}-31"  # Simplified - handles all months
+        return list(self.iter_month_entries(user_id, year, month))
+
+    def iter_month_entries(self, user_id: str, year: int, month: int) -> Iterator[dict]:
+        """月間エントリをページをたどりながら1件ずつ返すジェネレータ"""
+        start_date, end_date = month_date_range(year, month)
+        return self._iter_query_items("user_id-date-index", user_id, start_date, end_date)
+
+    def query_month_page(
+        self,
+        user_id: str,
+        year: int,
+        month: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        月間エントリをカーソル付きで取得
+
+        Args:
+            attributes: 取得する属性（サマリー表示では SUMMARY_ATTRIBUTES）
 
-        response = self.table.query(
-            IndexName="user_id-date-index",
-            KeyConditionExpression=Key("user_id").eq(user_id)
-            & Key("date").between(start_date, end_date),
+        Returns:
+            (エントリリスト, 次ページのカーソル)
+        """
+        start_date, end_date = month_date_range(year, month)
+        return self._query_page(
+            "user_id-date-index", user_id, start_date, end_date, True, limit, cursor, attributes
         )
-        return response.get("Items", [])
 
     def query_public_entries_for_month(self, year: int, month: int) -> list[dict]:
         """
-        公開エントリを月間で取得（家族カレンダー用）
+        公開エントリを月間で取得（家族カレンダー用、全ページ）
 
         Args:
             year: 年
@@ -298,70 +946,307 @@ class DiaryDatabase:
         Returns:
             公開エントリリスト
         """
-        if self._in_memory:
-            return self._in_memory.query_public_entries_for_month(year, month)
-        
-        start_date = f"{year:04d}-{month:02d}-01"
-        end_date = f"{year:04d}-{month:02d}-31"
+        start_date, end_date = month_date_range(year, month)
+        return list(self._iter_query_items("is_public-date-index", "true", start_date, end_date))
+
+    def query_public_entries_page(
+        self,
+        year: int,
+        month: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        公開エントリをカーソル付きで月間取得
+
+        Args:
+            attributes: 取得する属性（サマリー表示では SUMMARY_ATTRIBUTES）
 
-        response = self.table.query(
-            IndexName="is_public-date-index",
-            KeyConditionExpression=Key("is_public").eq("true")
-            & Key("date").between(start_date, end_date),
+        Returns:
+            (公開エントリリスト, 次ページのカーソル)
+        """
+        start_date, end_date = month_date_range(year, month)
+        return self._query_page(
+            "is_public-date-index", "true", start_date, end_date, True, limit, cursor, attributes
         )
-        return response.get("Items", [])
     
     # 新しいメソッド（API Gateway統合用）
+    @timed("db")
     def save_diary_entry(self, entry: DiaryEntry) -> dict:
-        """日記エントリを保存"""
+        """
+        日記エントリを作成または更新（UpdateItem 1回）
+        
+        既存の日記の created_at と、縮小版の記録（rendered_photos）は保持する。
+        写真は S3 キーで保存する（表示用URLや縮小版のキーが渡された場合は元の写真のキーに戻す）
+        
+        Returns:
+            保存後のアイテム（entry の created_at も保存されている値に更新する）
+        """
+        entry.photos = self.normalize_photos(entry.photos)
+        item = self._upsert_item(build_diary_item(entry))
+        entry.created_at = item["created_at"]
+        self._sync_photo_renditions(item)
+        return item
+    
+    @timed("db")
+    def patch_diary_entry(self, username: str, date: str, changes: dict) -> Optional[dict]:
+        """
+        既存の日記の指定した属性のみを更新（UpdateItem、変更した属性と updated_at だけを書き込む）
+        
+        Args:
+            changes: 日記テーブルの属性名 → 値（content を変更する場合は excerpt も含める）
+        
+        Returns:
+            更新後のアイテム。日記がない場合は None
+        """
         jst = pytz.timezone('Asia/Tokyo')
-        item = {
-            "user_id#date": f"{entry.username}#{entry.date}",
-            "user_id": entry.username,
-            "date": entry.date,
-            "content": entry.content,
-            "mood": entry.mood,
-            "weather": entry.weather,
-            "photos": entry.photos,
-            "is_public": "true" if entry.is_public else "false",  # DynamoDBインデックスは文字列型を期待
-            "created_at": entry.created_at,
-            "updated_at": datetime.now(jst).isoformat(),
-        }
+        changes = dict(changes)
+        if "photos" in changes:
+            changes["photos"] = self.normalize_photos(changes["photos"])
+        changes["updated_at"] = datetime.now(jst).isoformat()
         
-        if self._in_memory:
-            self._in_memory.data[item["user_id#date"]] = item
+        if self._local:
+            item = self._local.patch_item(f"{username}#{date}", changes)
         else:
-            self.table.put_item(Item=item)
+            from botocore.exceptions import ClientError
+            
+            expression, names, values = build_set_expression(changes)
+            names["#pk"] = "user_id#date"
+            try:
+                item = self.table.update_item(
+                    Key={"user_id#date": f"{username}#{date}"},
+                    UpdateExpression=expression,
+                    ConditionExpression="attribute_exists(#pk)",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                    ReturnValues="ALL_NEW",
+                )["Attributes"]
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                item = None
+        
+        if item is not None and "photos" in changes:
+            self._sync_photo_renditions(item)
         return item
     
+    def normalize_photos(self, photos: List[str]) -> List[str]:
+        """写真を S3 キーで保存する（表示用URLや縮小版のキーは元の写真のキーに戻す）"""
+        return [original_photo_key(self.extract_photo_key_from_url_or_key(photo)) for photo in photos]
+    
+    def _sync_photo_renditions(self, item: dict) -> None:
+        """
+        保存した日記の先頭の写真の縮小版が作成済みなら rendered_photos に記録
+        
+        添付より先に縮小版の作成が終わっていた場合（作成側の記録は添付前のため反映されない）に備え、
+        写真ごとに最初の1回だけ S3 を確認し、確認したことを checked_photos に記録する。
+        確認時に未作成なら、添付済みのため作成側が記録する（作成できない写真は以降も確認しない）
+        """
+        photos = item.get("photos") or []
+        photo_key = photos[0] if photos else ""
+        if not photo_key or photo_key in (item.get("rendered_photos") or []) or photo_key in (item.get("checked_photos") or []):
+            return
+        if self.has_photo_renditions(photo_key):
+            if self.mark_photo_rendered(photo_key):
+                item["rendered_photos"] = (item.get("rendered_photos") or []) + [photo_key]
+        elif self._append_photo_mark(photo_key, "checked_photos"):
+            item["checked_photos"] = (item.get("checked_photos") or []) + [photo_key]
+    
+    @timed("db")
+    def batch_save_diary_items(self, items: List[dict]) -> List[dict]:
+        """
+        日記アイテムをまとめて保存（BatchWriteItem、最大 BATCH_WRITE_MAX_ITEMS 件）
+        
+        UnprocessedItems は指数バックオフ（ジッター付き）で再試行する。
+        同じキーのアイテムを含めることはできない（BatchWriteItem の制約）
+        
+        Returns:
+            再試行しても保存できなかったアイテム（すべて保存できた場合は空）
+        """
+        if len(items) > BATCH_WRITE_MAX_ITEMS:
+            raise ValueError(f"batch_save_diary_items accepts at most {BATCH_WRITE_MAX_ITEMS} items")
+        if self._local:
+            # ローカルでは1件ずつ保存して変更通知（月次ドキュメントの更新）を行う
+            for item in items:
+                self._local.put_item(item)
+            return []
+        
+        dynamodb = get_dynamodb_resource()
+        request = {self.table_name: [{"PutRequest": {"Item": item}} for item in items]}
+        for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+            response = dynamodb.batch_write_item(RequestItems=request)
+            request = response.get("UnprocessedItems") or {}
+            if not request:
+                return []
+            if attempt < BATCH_WRITE_MAX_RETRIES:
+                time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        return [entry["PutRequest"]["Item"] for entry in request.get(self.table_name, [])]
+    
+    @timed("db")
+    def attach_photo(self, username: str, date: str, photo_key: str) -> Optional[dict]:
+        """
+        日記の写真を photo_key に置き換える（UpdateItem、日記がない場合は作成しない）
+        
+        Returns:
+            更新後のアイテム。日記がない場合は None
+        """
+        jst = pytz.timezone('Asia/Tokyo')
+        updated_at = datetime.now(jst).isoformat()
+        
+        if self._local:
+            entry = self._local.get_entry(username, date)
+            if entry is None:
+                return None
+            return self._local.put_item({**entry, "photos": [photo_key], "updated_at": updated_at})
+        
+        from botocore.exceptions import ClientError
+        
+        try:
+            response = self.table.update_item(
+                Key={"user_id#date": f"{username}#{date}"},
+                UpdateExpression="SET photos = :photos, updated_at = :updated_at",
+                ConditionExpression="attribute_exists(#pk)",
+                ExpressionAttributeNames={"#pk": "user_id#date"},
+                ExpressionAttributeValues={":photos": [photo_key], ":updated_at": updated_at},
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return None
+        return response["Attributes"]
+    
+    def mark_photo_rendered(self, photo_key: str) -> bool:
+        """
+        縮小版を作成した写真を日記の rendered_photos に追加（写真が添付されている場合のみ）
+        
+        updated_at は変更しない（利用者による更新ではないため）
+        
+        Returns:
+            追加した場合 True（日記がない・写真が添付されていない・追加済みの場合は False）
+        """
+        return self._append_photo_mark(photo_key, "rendered_photos")
+    
+    @timed("db")
+    def _append_photo_mark(self, photo_key: str, attribute: str) -> bool:
+        """写真のキーを日記のリスト属性（rendered_photos / checked_photos）に追加（写真が添付されている場合のみ）"""
+        parsed = parse_photo_key(photo_key)
+        if parsed is None:
+            return False
+        username, date = parsed
+        
+        if self._local:
+            entry = self._local.get_entry(username, date)
+            marked = (entry or {}).get(attribute) or []
+            if entry is None or photo_key not in (entry.get("photos") or []) or photo_key in marked:
+                return False
+            self._local.put_item({**entry, attribute: marked + [photo_key]})
+            return True
+        
+        from botocore.exceptions import ClientError
+        
+        try:
+            self.table.update_item(
+                Key={"user_id#date": f"{username}#{date}"},
+                UpdateExpression="SET #a = list_append(if_not_exists(#a, :empty), :keys)",
+                ConditionExpression="contains(photos, :key) AND (attribute_not_exists(#a) OR NOT contains(#a, :key))",
+                ExpressionAttributeNames={"#a": attribute},
+                ExpressionAttributeValues={":key": photo_key, ":keys": [photo_key], ":empty": []},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            return False
+        return True
+    
+    @timed("db")
     def get_diary_entry(self, username: str, date: str) -> Optional[dict]:
         """特定日の日記を取得"""
-        if self._in_memory:
-            return self._in_memory.get_entry(username, date)
+        if self._local:
+            return self._local.get_entry(username, date)
         
         response = self.table.get_item(
             Key={"user_id#date": f"{username}#{date}"}
         )
         return response.get("Item")
     
+    @timed("db")
+    def get_diary_entries(self, username: str, dates: Sequence[str]) -> List[dict]:
+        """
+        指定日の日記をまとめて取得（BatchGetItem、100件ごと）
+
+        Returns:
+            日付順のエントリリスト（日記がない日は含めない）
+        """
+        dates = sorted(set(dates))
+        if self._local:
+            return sorted(self._local.get_entries(username, dates), key=lambda item: item["date"])
+        
+        items: List[dict] = []
+        for start in range(0, len(dates), BATCH_GET_MAX_KEYS):
+            keys = [{"user_id#date": f"{username}#{date}"} for date in dates[start:start + BATCH_GET_MAX_KEYS]]
+            items.extend(self._batch_get_items(keys))
+        return sorted(items, key=lambda item: item["date"])
+    
+    def _batch_get_items(self, keys: List[dict], attributes: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        BatchGetItem を実行し、UnprocessedKeys が残る間は指数バックオフ（ジッター付き）で再試行
+        
+        Args:
+            attributes: 取得する属性（省略時は全属性）
+        
+        Raises:
+            RuntimeError: 再試行しても未処理のキーが残った場合
+        """
+        dynamodb = get_dynamodb_resource()
+        request = {self.table_name: {"Keys": keys}}
+        if attributes:
+            names = {f"#p{i}": attr for i, attr in enumerate(attributes)}
+            request[self.table_name]["ProjectionExpression"] = ", ".join(names)
+            request[self.table_name]["ExpressionAttributeNames"] = names
+        items: List[dict] = []
+        for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response.get("Responses", {}).get(self.table_name, []))
+            request = response.get("UnprocessedKeys") or {}
+            if not request:
+                return items
+            if attempt < BATCH_GET_MAX_RETRIES:
+                # スロットリング時は 50ms, 100ms, 200ms ... を上限としてランダムに待つ
+                time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        remaining = len(request.get(self.table_name, {}).get("Keys", []))
+        raise RuntimeError(f"BatchGetItem left {remaining} unprocessed keys after {BATCH_GET_MAX_RETRIES} retries")
+    
+    def get_diary_entries_range(self, username: str, start_date: str, end_date: str) -> List[dict]:
+        """期間内（両端を含む）の日記を日付順に取得（user_id-date-index の Query、全ページ）"""
+        return list(self._iter_query_items("user_id-date-index", username, start_date, end_date))
+    
     def get_user_diaries(self, username: str, limit: int = 30) -> List[dict]:
-        """ユーザーの日記一覧を取得"""
-        if self._in_memory:
-            results = [item for key, item in self._in_memory.data.items() if item.get("user_id") == username]
-            return sorted(results, key=lambda x: x["date"], reverse=True)[:limit]
-        
-        response = self.table.query(
-            IndexName="user_id-date-index",
-            KeyConditionExpression=Key("user_id").eq(username),
-            ScanIndexForward=False,
-            Limit=limit
-        )
-        return response.get("Items", [])
+        """ユーザーの日記一覧を取得（新しい順）"""
+        items, _ = self.get_user_diaries_page(username, limit)
+        return items
+    
+    def get_user_diaries_page(
+        self, username: str, limit: int = 30, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        ユーザーの日記一覧をカーソル付きで取得（新しい順）
+
+        Returns:
+            (エントリリスト, 次ページのカーソル)
+        """
+        return self._query_page("user_id-date-index", username, scan_forward=False, limit=limit, cursor=cursor)
+    
+    def iter_user_diaries(self, username: str, newest_first: bool = True) -> Iterator[dict]:
+        """ユーザーの全日記をページをたどりながら1件ずつ返すジェネレータ"""
+        return self._iter_query_items("user_id-date-index", username, scan_forward=not newest_first)
     
     def delete_diary_entry(self, username: str, date: str) -> None:
         """日記を削除"""
         return self.delete_entry(username, date)
     
+    @timed("s3")
     def upload_photo(self, username: str, date: str, image_bytes: bytes, photo_key: str = None) -> str:
         """写真をS3にアップロード"""
         if not self.s3_client:
@@ -372,16 +1257,312 @@ class DiaryDatabase:
             photo_id = str(uuid.uuid4())
             photo_key = f"photos/{username}/{date}/{photo_id}.jpg"
         
+        if len(image_bytes) > PHOTO_MULTIPART_PART_SIZE:
+            self._upload_parts_parallel(photo_key, image_bytes, "image/jpeg")
+        else:
+            self.s3_client.put_object(
+                Bucket=self.photo_bucket,
+                Key=photo_key,
+                Body=image_bytes,
+                ContentType="image/jpeg"
+            )
+        self.notify_photo_uploaded(photo_key)
+        
+        # S3キーを返す（URLではなく）
+        return photo_key
+    
+    def _upload_parts_parallel(self, key: str, body: bytes, content_type: str) -> None:
+        """
+        バイト列をマルチパートアップロードで送る（PHOTO_PART_CONCURRENCY 並列）
+        
+        失敗したパートはそのパートだけを再試行し、再試行しても失敗した場合はアップロードを中止する
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+        
+        upload_id = self.create_photo_multipart_upload(key, content_type)
+        view = memoryview(body)
+        
+        def upload_part(number: int) -> dict:
+            offset = (number - 1) * PHOTO_MULTIPART_PART_SIZE
+            chunk = view[offset:offset + PHOTO_MULTIPART_PART_SIZE].tobytes()
+            for attempt in range(PHOTO_PART_MAX_RETRIES + 1):
+                try:
+                    response = self.s3_client.upload_part(
+                        Bucket=self.photo_bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=chunk
+                    )
+                    return {"part_number": number, "etag": response["ETag"]}
+                except (BotoCoreError, ClientError):
+                    if attempt == PHOTO_PART_MAX_RETRIES:
+                        raise
+                    logger.warning("Retrying part %d of %s (attempt %d)", number, key, attempt + 1)
+                    time.sleep(random.uniform(0, 0.1 * (2 ** attempt)))
+        
+        part_count = -(-len(body) // PHOTO_MULTIPART_PART_SIZE)
+        try:
+            with ThreadPoolExecutor(max_workers=min(PHOTO_PART_CONCURRENCY, part_count)) as pool:
+                parts = list(pool.map(upload_part, range(1, part_count + 1)))
+            if not self.complete_photo_multipart_upload(key, upload_id, parts):
+                raise RuntimeError(f"Failed to complete multipart upload of {key}")
+        except Exception:
+            self.abort_photo_multipart_upload(key, upload_id)
+            raise
+    
+    @timed("s3")
+    def create_photo_multipart_upload(self, photo_key: str, content_type: str) -> str:
+        """マルチパートアップロードを開始（UploadId を返す）"""
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        return self.s3_client.create_multipart_upload(
+            Bucket=self.photo_bucket, Key=photo_key, ContentType=content_type
+        )["UploadId"]
+    
+    @timed("presign")
+    def generate_upload_part_url(self, photo_key: str, upload_id: str, part_number: int, expiration: int = 900) -> str:
+        """マルチパートアップロードの1パートを PUT する署名付きURLを生成"""
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        return self.s3_client.generate_presigned_url(
+            'upload_part',
+            Params={
+                'Bucket': self.photo_bucket,
+                'Key': photo_key,
+                'UploadId': upload_id,
+                'PartNumber': part_number,
+            },
+            ExpiresIn=expiration,
+        )
+    
+    @timed("s3")
+    def list_photo_upload_parts(self, photo_key: str, upload_id: str) -> Optional[List[dict]]:
+        """
+        マルチパートアップロードのアップロード済みパート（ListParts）
+        
+        Returns:
+            [{"part_number", "etag", "size"}]（パート番号順）。アップロードが存在しない場合は None
+        """
+        from botocore.exceptions import ClientError
+        
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        parts = []
+        kwargs = {"Bucket": self.photo_bucket, "Key": photo_key, "UploadId": upload_id}
+        try:
+            while True:
+                response = self.s3_client.list_parts(**kwargs)
+                parts.extend(
+                    {"part_number": part["PartNumber"], "etag": part["ETag"], "size": part["Size"]}
+                    for part in response.get("Parts", [])
+                )
+                if not response.get("IsTruncated"):
+                    return parts
+                kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchUpload", "404"):
+                return None
+            raise
+    
+    @timed("s3")
+    def complete_photo_multipart_upload(self, photo_key: str, upload_id: str, parts: List[dict]) -> bool:
+        """
+        マルチパートアップロードを完了（パートを結合）
+        
+        Args:
+            parts: [{"part_number", "etag"}]（パート番号順）
+        
+        Returns:
+            完了した場合 True。アップロードが存在しない・パートが不足・ETag が一致しない場合は False
+        """
+        from botocore.exceptions import ClientError
+        
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.photo_bucket,
+                Key=photo_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": p["part_number"], "ETag": p["etag"]} for p in parts]},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchUpload", "InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+                logger.warning("Cannot complete multipart upload of %s: %s", photo_key, e.response["Error"]["Code"])
+                return False
+            raise
+        return True
+    
+    @timed("s3")
+    def abort_photo_multipart_upload(self, photo_key: str, upload_id: str) -> None:
+        """マルチパートアップロードを中止（既に完了・中止済みの場合は何もしない）"""
+        from botocore.exceptions import ClientError
+        
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.photo_bucket, Key=photo_key, UploadId=upload_id)
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("NoSuchUpload", "404"):
+                raise
+    
+    def notify_photo_uploaded(self, photo_key: str) -> None:
+        """写真のアップロードを通知（ローカルでの S3 イベントの代替）"""
+        for listener in self.photo_upload_listeners:
+            listener(self.photo_bucket, photo_key)
+    
+    @timed("s3")
+    def get_photo_bytes(self, photo_key: str) -> bytes:
+        """S3 の写真を読み込む"""
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        return self.s3_client.get_object(Bucket=self.photo_bucket, Key=photo_key)["Body"].read()
+    
+    @timed("s3")
+    def put_photo_rendition(self, key: str, image_bytes: bytes) -> None:
+        """写真の縮小版（JPEG）を保存（キーは元の写真ごとに一意のため、長期間キャッシュ可能）"""
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
         self.s3_client.put_object(
             Bucket=self.photo_bucket,
-            Key=photo_key,
+            Key=key,
             Body=image_bytes,
-            ContentType="image/jpeg"
+            ContentType="image/jpeg",
+            CacheControl="private, max-age=31536000, immutable",
+        )
+    
+    @timed("s3")
+    def delete_photo(self, photo_key: str) -> None:
+        """S3 の写真を削除（存在しない場合も成功する）"""
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        self.s3_client.delete_object(Bucket=self.photo_bucket, Key=photo_key)
+    
+    def has_photo_renditions(self, photo_key: str) -> bool:
+        """写真の縮小版が作成済みか（最後に作成する縮小版の有無で判定）"""
+        if not self.s3_client:
+            return False
+        return self.get_photo_metadata(rendition_key(photo_key, PHOTO_RENDITIONS[-1])) is not None
+    
+    @timed("presign")
+    def generate_photo_upload_post(
+        self, photo_key: str, content_type: str, max_bytes: int, expiration: int = 900
+    ) -> dict:
+        """
+        写真を S3 に直接アップロードするための署名付き POST を生成
+        
+        ポリシーでキー・Content-Type・サイズ（1 〜 max_bytes バイト）を固定する
+        
+        Returns:
+            {"url": ..., "fields": {...}}（fields はフォームにそのまま含める）
+        """
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        return self.s3_client.generate_presigned_post(
+            Bucket=self.photo_bucket,
+            Key=photo_key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expiration,
         )
+    
+    @timed("s3")
+    def get_photo_metadata(self, photo_key: str) -> Optional[dict]:
+        """
+        S3 の写真のサイズと Content-Type を取得（HeadObject）
         
-        # S3キーを返す（URLではなく）
-        return photo_key
+        Returns:
+            {"size": バイト数, "content_type": ...}。存在しない場合は None
+        """
+        from botocore.exceptions import ClientError
+        
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        try:
+            response = self.s3_client.head_object(Bucket=self.photo_bucket, Key=photo_key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": response["ContentLength"], "content_type": response.get("ContentType", "")}
     
+    @timed("s3")
+    def upload_stream(self, key: str, parts: Iterable[bytes], content_type: str) -> int:
+        """
+        バイト列のパートを順に S3 へアップロード（メモリに保持するのは最大2パート分）
+        
+        パートが1つだけの場合は PutObject 1回、2つ以上の場合はマルチパートアップロードで送る
+        （最後以外のパートは 5MiB 以上であること）。失敗した場合はマルチパートアップロードを中止する
+        
+        Returns:
+            アップロードしたバイト数
+        """
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        parts = iter(parts)
+        first = next(parts, b"")
+        second = next(parts, None)
+        if second is None:
+            self.s3_client.put_object(Bucket=self.photo_bucket, Key=key, Body=first, ContentType=content_type)
+            return len(first)
+        
+        upload_id = self.s3_client.create_multipart_upload(
+            Bucket=self.photo_bucket, Key=key, ContentType=content_type
+        )["UploadId"]
+        # 先読みした2パートもアップロード後に解放されるよう、キューから取り出して送る
+        head = collections.deque([first, second])
+        first = second = None
+        
+        def all_parts():
+            while head:
+                yield head.popleft()
+            yield from parts
+        
+        completed = []
+        size = 0
+        try:
+            for number, part in enumerate(all_parts(), start=1):
+                response = self.s3_client.upload_part(
+                    Bucket=self.photo_bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=part
+                )
+                completed.append({"PartNumber": number, "ETag": response["ETag"]})
+                size += len(part)
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.photo_bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": completed}
+            )
+        except Exception:
+            self.s3_client.abort_multipart_upload(Bucket=self.photo_bucket, Key=key, UploadId=upload_id)
+            raise
+        return size
+    
+    @timed("presign")
+    def get_download_url(self, key: str, filename: str, expiration: int = 3600) -> str:
+        """S3 のファイルを添付ファイルとしてダウンロードする署名付きURLを生成"""
+        if not self.s3_client:
+            raise Exception("S3 client not configured")
+        
+        return self.s3_client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.photo_bucket,
+                'Key': key,
+                'ResponseContentDisposition': f'attachment; filename="{filename}"',
+            },
+            ExpiresIn=expiration,
+        )
+    
+    @timed("presign")
     def generate_presigned_url(self, photo_key: str, expiration: int = 3600) -> str:
         """S3アップロード用のプリサインURLを生成"""
         if not self.s3_client:
@@ -417,20 +1598,31 @@ class DiaryDatabase:
                 key = unquote(parsed.path).lstrip('/')
                 return key
             except Exception as e:
-                print(f"Error extracting key from URL {photo_data}: {e}")
+                logger.warning("Error extracting key from URL %s: %s", photo_data, e)
                 return ""
         
         # すでにS3キーの場合
         return photo_data
     
+    @timed("presign")
     def get_photo_url(self, photo_key: str, expiration: int = 86400) -> str:
-        """S3キーから署名付き読み取りURLを生成（24時間有効）"""
+        """
+        S3キーから署名付き読み取りURLを生成（24時間有効）
+
+        同じキーの URL はウォームコンテナ内でキャッシュし、
+        署名の有効期限よりも十分前（最大で有効期限の半分）に破棄する
+        """
         if not self.s3_client:
             raise Exception("S3 client not configured")
         
         if not photo_key:
             return ""
         
+        cache_key = (self.photo_bucket, photo_key, expiration)
+        cached_url = photo_url_cache.get(cache_key)
+        if cached_url:
+            return cached_url
+        
         # URLか S3キーかを判定して、S3キーを抽出
         photo_key = self.extract_photo_key_from_url_or_key(photo_key)
         
@@ -446,11 +1638,20 @@ class DiaryDatabase:
                 },
                 ExpiresIn=expiration  # 24時間有効
             )
+            photo_url_cache.set(
+                cache_key,
+                presigned_url,
+                ttl=min(PHOTO_URL_CACHE_TTL_SECONDS, expiration // 2),
+            )
             return presigned_url
         except Exception as e:
-            print(f"Error generating presigned URL for key {photo_key}: {e}")
+            logger.warning("Error generating presigned URL for key %s: %s", photo_key, e)
             return ""
     
+    def get_photo_url_cache_stats(self) -> dict:
+        """署名付きURLキャッシュの統計情報（ヒット/ミス数など）を返す"""
+        return photo_url_cache.stats()
+    
     def get_calendar_entries(self, username: str, year: int, month: int) -> List[dict]:
         """
         カレンダー用の月間公開エントリを取得（全ユーザー）
@@ -460,25 +1661,94 @@ class DiaryDatabase:
         """
         return self.query_public_entries_for_month(year, month)
     
+    @timed("db")
+    def get_calendar_month_document(self, year: int, month: int) -> Optional[dict]:
+        """
+        家族カレンダーの月次ドキュメントを取得（GetItem 1回）
+        
+        Returns:
+            月次ドキュメント。未作成・無効の場合は None（呼び出し側で Query にフォールバック）
+        """
+        if not self._calendar_store:
+            return None
+        return self._calendar_store.get_month(month_document_key(year, month))
+    
+    @timed("db")
+    def get_calendar_month_version(self, year: int, month: int) -> Optional[int]:
+        """月次ドキュメントのバージョン番号のみを取得（ETag 用、未作成・無効の場合は None）"""
+        if not self._calendar_store:
+            return None
+        return self._calendar_store.get_month_version(month_document_key(year, month))
+    
+    @timed("db")
+    def load_entry_contents(self, entries: Sequence[dict]) -> List[dict]:
+        """
+        月次ドキュメントのエントリ（本文を含まない）に日記テーブルの本文を補う（BatchGetItem、100件ごと）
+        
+        Returns:
+            content を追加したエントリのリスト（entries と同じ順）
+        """
+        keys = [f"{entry['user_id']}#{entry['date']}" for entry in entries]
+        contents = {}
+        if self._local:
+            by_user: dict = collections.defaultdict(list)
+            for entry in entries:
+                by_user[entry["user_id"]].append(entry["date"])
+            for user_id, dates in by_user.items():
+                for item in self._local.get_entries(user_id, dates):
+                    contents[item["user_id#date"]] = item.get("content", "")
+        else:
+            for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+                batch = [{"user_id#date": key} for key in keys[start:start + BATCH_GET_MAX_KEYS]]
+                for item in self._batch_get_items(batch, attributes=("user_id#date", "content")):
+                    contents[item["user_id#date"]] = item.get("content", "")
+        return [{**entry, "content": contents.get(key, "")} for entry, key in zip(entries, keys)]
+    
+    def load_public_month(self, month_key: str) -> List[dict]:
+        """月次ドキュメントキー（family#YYYY-MM）の月の公開エントリを全件取得（ドキュメント初期化用）"""
+        year, month = month_key.rsplit("#", 1)[1].split("-")
+        return self.query_public_entries_for_month(int(year), int(month))
+    
+    def get_calendar_entries_page(
+        self,
+        username: str,
+        year: int,
+        month: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """カレンダー用の月間公開エントリをカーソル付きで取得"""
+        return self.query_public_entries_page(year, month, limit, cursor, attributes)
+    
+    def bulk_load(self, items, batch_size: int = 10000) -> int:
+        """
+        ローカルのデータベースにアイテムを一括投入（ベンチマーク・負荷試験用）
+        
+        Args:
+            items: DynamoDB と同じ形式のアイテム（save_diary_entry で保存されるもの）
+            batch_size: 1トランザクションあたりの件数（SQLite）
+        
+        Returns:
+            保存した件数
+        """
+        if not self._local:
+            raise RuntimeError("bulk_load is only available in memory / sqlite mode")
+        loaded = self._local.bulk_load(items, batch_size=batch_size)
+        # 変更通知を行わないため、月次ドキュメントは次回アクセス時に作り直す
+        self._local_calendar_store.documents.clear()
+        return loaded
+    
     # ===== Prompts Table Methods =====
     def __init_prompts_table(self):
-        """Prompts テーブルを初期化（遅延初期化）"""
-        if not hasattr(self, '_prompts_table'):
+        """Prompts テーブルを初期化（遅延初期化、存在確認は行わない）"""
+        if self._prompts_table is None:
             prompts_table_name = os.environ.get("DYNAMODB_PROMPTS_TABLE_NAME")
-            print(f"[DEBUG] DYNAMODB_PROMPTS_TABLE_NAME from env: {prompts_table_name}")
             if not prompts_table_name:
                 raise ValueError("DYNAMODB_PROMPTS_TABLE_NAME environment variable not set")
-            
-            try:
-                dynamodb = boto3.resource("dynamodb")
-                self._prompts_table = dynamodb.Table(prompts_table_name)
-                # テーブル存在確認
-                self._prompts_table.table_status
-                print(f"[DEBUG] Successfully initialized prompts table: {prompts_table_name}")
-            except Exception as e:
-                print(f"Warning: Could not initialize prompts table: {e}")
-                self._prompts_table = None
+            self._lazy("_prompts_table", lambda: get_dynamodb_resource().Table(prompts_table_name))
     
+    @timed("db")
     def save_prompt(self, date: str, prompt: str, category: Optional[str] = None) -> dict:
         """
         毎日のお題を保存
@@ -491,10 +1761,6 @@ class DiaryDatabase:
         Returns:
             保存されたアイテム
         """
-        self.__init_prompts_table()
-        if not self._prompts_table:
-            raise Exception("Prompts table not available")
-        
         from datetime import timedelta
         jst = pytz.timezone('Asia/Tokyo')
         now_jst = datetime.now(jst)
@@ -508,9 +1774,18 @@ class DiaryDatabase:
             "expireAt": int(expire_date.timestamp()),
         }
         
+        # 未生成のキャッシュを残さない（他のコンテナは PROMPT_NEGATIVE_CACHE_TTL_SECONDS 以内に反映される）
+        prompt_cache.invalidate(date)
+        if self._local:
+            return self._local.put_prompt(item)
+        
+        self.__init_prompts_table()
+        if not self._prompts_table:
+            raise Exception("Prompts table not available")
         self._prompts_table.put_item(Item=item)
         return item
     
+    @timed("db")
     def get_prompt(self, date: str) -> Optional[dict]:
         """
         指定日のお題を取得
@@ -521,54 +1796,56 @@ class DiaryDatabase:
         Returns:
             お題アイテム、見つからない場合は None
         """
-        self.__init_prompts_table()
-        if not self._prompts_table:
-            print(f"[DEBUG] Prompts table not initialized")
-            return None
-        
-        try:
-            print(f"[DEBUG] Querying prompts table for date: {date}")
-            response = self._prompts_table.get_item(Key={"date": date})
+        cached = prompt_cache.get(date)
+        if cached is not None:
+            return None if cached is _PROMPT_NOT_FOUND else cached
+
+        if self._local:
+            item = self._local.get_prompt(date)
+        else:
+            self.__init_prompts_table()
+            if not self._prompts_table:
+                logger.debug("Prompts table not initialized")
+                return None
+            
+            try:
+                response = self._prompts_table.get_item(Key={"date": date})
+            except Exception:
+                # 取得できなかった場合はキャッシュしない
+                logger.exception("Error getting prompt for %s", date)
+                return None
             item = response.get("Item")
-            print(f"[DEBUG] DynamoDB response: {response}")
-            print(f"[DEBUG] Item found: {item}")
-            return item
-        except Exception as e:
-            print(f"Error getting prompt for {date}: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            logger.debug("Prompt for %s found: %s", date, item is not None)
+
+        prompt_cache.set(date, item if item is not None else _PROMPT_NOT_FOUND, ttl=prompt_cache_ttl(date, item is not None))
+        return item
+
+    def get_prompt_cache_stats(self) -> dict:
+        """お題キャッシュの統計情報"""
+        return prompt_cache.stats()
     
+    @timed("db")
     def get_recent_prompts(self, days: int = 14) -> List[dict]:
         """
-        過去 N 日間のお題を取得（重複チェック用）
+        過去 N 日間（今日を含む）のお題を取得（重複チェック用）
         
         Args:
             days: 何日前までを取得するか
         
         Returns:
-            お題リスト
+            お題リスト（新しい順）
         """
+        dates = recent_prompt_dates(days)
+        if self._local:
+            return self._local.get_prompts(dates)
+        
         self.__init_prompts_table()
         if not self._prompts_table:
             return []
         
         try:
-            from datetime import timedelta, datetime
-            jst = pytz.timezone('Asia/Tokyo')
-            start_date = (datetime.now(jst) - timedelta(days=days)).strftime("%Y-%m-%d")
-            
-            # テーブルスキャン（開発環境用。本番ではGSIやQuery使用を推奨）
-            response = self._prompts_table.scan(
-                FilterExpression=f"#d >= :start_date",
-                ExpressionAttributeNames={"#d": "date"},
-                ExpressionAttributeValues={":start_date": start_date}
-            )
-            
-            # 日付でソート（新しい順）
-            items = response.get("Items", [])
-            items.sort(key=lambda x: x.get("date", ""), reverse=True)
-            return items
+            # 日付キーの BatchGetItem（お題テーブルの件数に依存しない）
+            return batch_get_prompts(get_dynamodb_resource(), self._prompts_table.name, dates)
         except Exception as e:
-            print(f"Error getting recent prompts: {e}")
+            logger.warning("Error getting recent prompts: %s", e)
             return []
@@ -0,0 +1,104 @@
+"""
+日記の全件エクスポート（GET /diary/export）
+
+user_id-date-index をジェネレータで1ページずつたどり、1行1エントリの NDJSON に変換する。
+S3 が設定されている場合はパート単位でアップロードし（マルチパートアップロード）、署名付きのダウンロードURLを返す。
+メモリに保持するのは Query の1ページとアップロード中のパートのみで、日記の件数に依存しない
+
+出力の各行は POST /diary/import と同じ形式のため、そのままインポートし直せる
+（写真はS3キーのみを含み、画像そのものは含まない）
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+import pytz
+
+from structured_logging import get_logger
+
+logger = get_logger("export")
+
+# マルチパートアップロードのパートサイズ（S3 の最小は 5MiB）
+EXPORT_PART_SIZE = int(os.environ.get("EXPORT_PART_SIZE", str(8 * 1024 * 1024)))
+# ダウンロードURLの有効期限（秒）
+EXPORT_URL_EXPIRATION = int(os.environ.get("EXPORT_URL_EXPIRATION", "3600"))
+EXPORT_PREFIX = "exports/"
+
+EXPORT_FIELDS = ("date", "content", "mood", "weather", "photos", "created_at", "updated_at")
+
+
+def to_export_record(item: Dict) -> Dict:
+    """日記テーブルのアイテムをエクスポート（インポート）形式に変換"""
+    record = {field: item[field] for field in EXPORT_FIELDS if item.get(field) is not None}
+    record["is_public"] = item.get("is_public", "false") == "true"
+    return record
+
+
+class ExportStats:
+    """エクスポートした件数とバイト数"""
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+
+
+def iter_ndjson_lines(items: Iterable[Dict], stats: ExportStats) -> Iterator[bytes]:
+    """アイテムを NDJSON の1行（UTF-8）ずつ返すジェネレータ"""
+    for item in items:
+        line = (json.dumps(to_export_record(item), ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        stats.count += 1
+        stats.bytes += len(line)
+        yield line
+
+
+def iter_parts(lines: Iterable[bytes], part_size: int = EXPORT_PART_SIZE) -> Iterator[bytes]:
+    """行をまとめて part_size 以上のパートにする（最後のパートのみ part_size 未満になり得る）"""
+    chunk: List[bytes] = []
+    size = 0
+    yielded = False
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= part_size:
+            # 結合前の行はアップロード中に保持しない
+            part, chunk, size = b"".join(chunk), [], 0
+            yielded = True
+            yield part
+    # 日記が0件の場合も空のファイルを作るため、1パートは必ず返す
+    if chunk or not yielded:
+        yield b"".join(chunk)
+
+
+def export_filename(username: str) -> str:
+    jst = pytz.timezone('Asia/Tokyo')
+    return f"diary-{username}-{datetime.now(jst).strftime('%Y%m%d-%H%M%S')}.ndjson"
+
+
+def export_to_s3(db, username: str) -> Dict:
+    """
+    ユーザーの全日記を S3 に NDJSON でアップロードし、ダウンロード用の署名付きURLを返す
+
+    Returns:
+        {"url", "filename", "expires_in", "count", "bytes"}
+    """
+    filename = export_filename(username)
+    key = f"{EXPORT_PREFIX}{username}/{uuid.uuid4().hex}/{filename}"
+    stats = ExportStats()
+    lines = iter_ndjson_lines(db.iter_user_diaries(username, newest_first=False), stats)
+    db.upload_stream(key, iter_parts(lines), "application/x-ndjson")
+    logger.info("Exported %d entries (%d bytes)", stats.count, stats.bytes, extra={"fields": {"key": key}})
+    return {
+        "url": db.get_download_url(key, filename, EXPORT_URL_EXPIRATION),
+        "filename": filename,
+        "expires_in": EXPORT_URL_EXPIRATION,
+        "count": stats.count,
+        "bytes": stats.bytes,
+    }
+
+
+def export_inline(db, username: str) -> str:
+    """ユーザーの全日記を NDJSON 文字列で返す（S3 が未設定のローカル開発用）"""
+    stats = ExportStats()
+    return b"".join(iter_ndjson_lines(db.iter_user_diaries(username, newest_first=False), stats)).decode("utf-8")
@@ -0,0 +1,254 @@
+"""
+日記の一括インポート（POST /diary/import）
+
+紙の日記や他のアプリからの移行用。JSON 配列または NDJSON（1行1エントリ）のボディを先頭から順に読み、
+DiaryEntry に検証しながら BatchWriteItem の上限（25件）ごとに書き込む。
+ボディ全体をエントリのリストに変換してから処理することはしない
+
+エントリの形式（/diary/{date} の保存と同じフィールド名）:
+    {"date": "2024-05-01", "content": "...", "mood": "happy", "weather": "sunny",
+     "is_public": false, "photos": [], "created_at": "...", "updated_at": "..."}
+    （content の代わりに entry_text も可。created_at / updated_at は省略時は現在時刻）
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from database import BATCH_WRITE_MAX_ITEMS, build_diary_item
+from models import DiaryEntry
+from structured_logging import get_logger
+
+logger = get_logger("import")
+
+# 1リクエストでインポートできる最大件数（API Gateway のタイムアウト内に収めるため）
+IMPORT_MAX_ENTRIES = 5000
+# レポートに含めるエラーの最大件数（件数の集計はすべて行う）
+IMPORT_MAX_ERRORS = 1000
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+_WHITESPACE = " \t\n\r"
+
+
+class ImportRecordError(ValueError):
+    """1エントリの検証エラー"""
+
+
+def is_ndjson(body: str, content_type: Optional[str]) -> bool:
+    """ボディが NDJSON か（Content-Type、なければ先頭の文字で判定）"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        return True
+    return not body.lstrip(_WHITESPACE).startswith("[")
+
+
+def iter_ndjson(body: str) -> Iterator[Tuple[int, Any]]:
+    """
+    NDJSON を1行ずつ解析するジェネレータ（空行は無視）
+
+    Yields:
+        (行番号, 解析結果。解析できない行は ImportRecordError)
+    """
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ImportRecordError(f"JSON の解析に失敗しました: {e.msg}")
+
+
+def iter_json_array(body: str) -> Iterator[Tuple[int, Any]]:
+    """
+    JSON 配列の要素を先頭から1つずつ解析するジェネレータ
+
+    構文エラーの位置以降は読み進められないため、エラーを返して終了する
+
+    Yields:
+        (要素の番号（1始まり）, 解析結果または ImportRecordError)
+    """
+    decoder = json.JSONDecoder()
+
+    def skip(pos: int) -> int:
+        while pos < len(body) and body[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    pos = skip(body.index("[") + 1)
+    if body[pos:pos + 1] == "]":
+        return
+    index = 0
+    while True:
+        index += 1
+        try:
+            value, pos = decoder.raw_decode(body, pos)
+        except json.JSONDecodeError as e:
+            yield index, ImportRecordError(f"JSON の解析に失敗しました: {e.msg}（以降の要素は読み込みません）")
+            return
+        yield index, value
+        pos = skip(pos)
+        separator = body[pos:pos + 1]
+        if separator == ",":
+            pos = skip(pos + 1)
+        elif separator == "]":
+            return
+        else:
+            yield index + 1, ImportRecordError("JSON 配列の区切りが不正です（以降の要素は読み込みません）")
+            return
+
+
+def _optional_str(record: Dict, field: str) -> Optional[str]:
+    value = record.get(field)
+    if value is not None and not isinstance(value, str):
+        raise ImportRecordError(f"{field} は文字列で指定してください")
+    return value
+
+
+def validate_record(username: str, record: Any) -> Tuple[DiaryEntry, Optional[str]]:
+    """
+    インポートの1エントリを DiaryEntry に変換
+
+    Returns:
+        (DiaryEntry, updated_at。省略時は None)
+
+    Raises:
+        ImportRecordError: 必須項目の欠落や型の誤り
+    """
+    if not isinstance(record, dict):
+        raise ImportRecordError("エントリはオブジェクトで指定してください")
+
+    date = _optional_str(record, "date")
+    if not date:
+        raise ImportRecordError("date が必要です")
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        raise ImportRecordError(f"無効な日付です: {date}")
+
+    content = record.get("entry_text") or record.get("content")
+    if not content or not isinstance(content, str):
+        raise ImportRecordError("日記内容（content）が必要です")
+
+    is_public = record.get("is_public", False)
+    if not isinstance(is_public, bool):
+        raise ImportRecordError("is_public は true / false で指定してください")
+
+    photos = record.get("photos") or []
+    if not isinstance(photos, list) or not all(isinstance(photo, str) for photo in photos):
+        raise ImportRecordError("photos は文字列の配列で指定してください")
+
+    for field in ("created_at", "updated_at"):
+        value = _optional_str(record, field)
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise ImportRecordError(f"{field} は ISO 8601 形式で指定してください")
+
+    entry = DiaryEntry(
+        username=username,
+        date=date,
+        content=content,
+        mood=_optional_str(record, "mood") or "normal",
+        weather=_optional_str(record, "weather") or "sunny",
+        photos=photos,
+        is_public=is_public,
+        created_at=record.get("created_at") or None,
+    )
+    return entry, record.get("updated_at") or None
+
+
+class ImportReport:
+    """インポート結果の集計（行ごとのエラーを含む）"""
+
+    def __init__(self):
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.truncated = False
+        self.errors: List[Dict] = []
+
+    def add_error(self, line: int, message: str, date: Optional[str] = None) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            error = {"line": line, "error": message}
+            if date:
+                error["date"] = date
+            self.errors.append(error)
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "truncated": self.truncated,
+            "errors": self.errors,
+        }
+
+
+def import_diaries(db, username: str, body: str, content_type: Optional[str] = None) -> ImportReport:
+    """
+    ボディのエントリを検証しながら BATCH_WRITE_MAX_ITEMS 件ごとに保存
+
+    同じ日付が複数回現れた場合は後の行で上書きする（BatchWriteItem は同じキーを1リクエストに含められないため、
+    書き込み前のチャンク内で置き換える）。既存の日記も上書きする
+    """
+    report = ImportReport()
+    records = iter_ndjson(body) if is_ndjson(body, content_type) else iter_json_array(body)
+    # 書き込み待ちのアイテム: 日付 → (行番号, アイテム)
+    pending: Dict[str, Tuple[int, dict]] = {}
+    # 読み込んだ日付 → 行番号と、保存できた日付（同じ日付の上書きをレポートするため）
+    seen: Dict[str, int] = {}
+    written = set()
+
+    def flush() -> None:
+        lines = {item["date"]: line for line, item in pending.values()}
+        try:
+            unprocessed = db.batch_save_diary_items([item for _, item in pending.values()])
+        except Exception as e:
+            logger.exception("Batch write failed")
+            for line, item in pending.values():
+                report.add_error(line, f"保存に失敗しました: {e}", item["date"])
+        else:
+            failed_dates = {item["date"] for item in unprocessed}
+            for date in failed_dates:
+                report.add_error(lines[date], "保存に失敗しました（再試行の上限）", date)
+            written.update(date for date in pending if date not in failed_dates)
+            report.imported += len(pending) - len(failed_dates)
+        pending.clear()
+        logger.debug("Import progress: %d imported, %d failed", report.imported, report.failed)
+
+    for line, record in records:
+        if report.total >= IMPORT_MAX_ENTRIES:
+            report.truncated = True
+            message = f"1回のインポートは最大{IMPORT_MAX_ENTRIES}件です（以降は読み込みません）"
+            report.errors.append({"line": line, "error": message})
+            break
+        report.total += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            entry, updated_at = validate_record(username, record)
+        except ImportRecordError as e:
+            report.add_error(line, str(e), record.get("date") if isinstance(record, dict) else None)
+            continue
+
+        if entry.date in pending or entry.date in written:
+            report.add_error(seen[entry.date], f"{line}行目の同じ日付のエントリで上書きされました", entry.date)
+            if entry.date in written:
+                # 保存済みの行は上書きされるため成功件数から除く
+                written.discard(entry.date)
+                report.imported -= 1
+        seen[entry.date] = line
+        pending[entry.date] = (line, build_diary_item(entry, updated_at=updated_at))
+        if len(pending) >= BATCH_WRITE_MAX_ITEMS:
+            flush()
+
+    if pending:
+        flush()
+
+    logger.info(
+        "Import finished: %d imported, %d failed", report.imported, report.failed,
+        extra={"fields": {"total": report.total, "truncated": report.truncated}},
+    )
+    return report
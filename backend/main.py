@@ -6,7 +6,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import os
-import boto3
 from datetime import datetime
 from typing import Optional
 from pathlib import Path
@@ -23,10 +22,10 @@ from .models import (
     DiaryEntryCreate,
     DiaryEntryUpdate,
     DiaryEntryResponse,
-    PhotoPresignedUrlResponse,
     FamilyCalendarResponse,
     FamilyCalendarEntry,
 )
+from .photo_upload import PhotoUploadError, confirm_upload, create_upload
 
 app = FastAPI(title="Family Diary API", version="1.0.0")
 
@@ -86,14 +85,13 @@ async def cors_middleware(request: Request, call_next):
 # (既に削除されていることを確認)
 
 # DynamoDB テーブル名を環境変数から取得
-TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "diary_entries")
+# 未設定の場合は None を渡し、インメモリDBで起動する（AWS 認証情報なしのローカル開発用。
+# DynamoDB を使う場合は DYNAMODB_TABLE_NAME または DIARY_DB_BACKEND=dynamodb を指定）
+TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME") or None
 PHOTO_BUCKET_NAME = os.environ.get("PHOTO_BUCKET_NAME", "")
 
-# Database インスタンス
-db = DiaryDatabase(TABLE_NAME)
-
-# S3 クライアント
-s3_client = boto3.client("s3")
+# Database インスタンス（写真の署名付き POST の発行にも使用）
+db = DiaryDatabase(TABLE_NAME, PHOTO_BUCKET_NAME or None)
 
 
 @app.get("/health")
@@ -148,36 +146,21 @@ async def create_or_update_diary_entry(
 
     - 認証必須
     - 本人のエントリのみ作成・更新可能
+    - UpdateItem 1回で保存する（既存エントリの created_at は保持）
     """
-    # 既存エントリがあるかチェック
-    existing_entry = db.get_entry(user_id, date)
-
-    if existing_entry:
-        # 更新
-        updated = db.update_entry(
-            user_id=user_id,
-            date=date,
-            entry_text=entry_data.entry_text,
-            is_public=entry_data.is_public,
-            photo_url=entry_data.photo_url,
-        )
-        return {
-            "message": "Entry updated",
-            "entry": updated,
-        }
-    else:
-        # 新規作成
-        entry = db.put_entry(
-            user_id=user_id,
-            date=date,
-            entry_text=entry_data.entry_text,
-            is_public=entry_data.is_public,
-            photo_url=entry_data.photo_url,
-        )
-        return {
-            "message": "Entry created",
-            "entry": entry,
-        }
+    entry = db.upsert_entry(
+        user_id=user_id,
+        date=date,
+        entry_text=entry_data.entry_text,
+        is_public=entry_data.is_public,
+        photo_url=entry_data.photo_url,
+    )
+    # 新規作成の場合は created_at と updated_at が同じ時刻になる
+    created = entry.get("created_at") == entry.get("updated_at")
+    return {
+        "message": "Entry created" if created else "Entry updated",
+        "entry": entry,
+    }
 
 
 @app.delete("/diary/{date}")
@@ -201,35 +184,42 @@ async def delete_diary_entry(
 
 
 @app.post("/diary/{date}/photo")
-async def get_photo_presigned_url(
+async def get_photo_upload_post(
     date: str,
+    request: Request,
     user_id: str = Depends(get_current_user),
 ):
     """
-    写真アップロード用のプリサイン URL を取得
+    写真アップロード用の署名付き POST を取得（Lambda の POST /diary/{date}/photo と同じ）
 
     - 認証必須
-    - クライアントはこの URL を使用して直接 S3 にアップロード
+    - ボディ（省略可）: {"content_type": "image/jpeg", "size": バイト数}
+    - クライアントは fields と file を multipart/form-data で url に直接 POST し、
+      POST /diary/{date}/photo/confirm で日記に添付する
     """
-    # S3 キーを生成（user#haru → haru に変換して # を URL から除外）
+    # S3 キーのユーザー名（user#haru → haru に変換して # を URL から除外）
     username = user_id.replace("user#", "")
-    photo_key = f"photos/{username}/{date}/{datetime.now().timestamp()}.jpg"
-
-    # プリサイン URL を生成（15分有効）
-    presigned_url = s3_client.generate_presigned_url(
-        "put_object",
-        Params={
-            "Bucket": PHOTO_BUCKET_NAME,
-            "Key": photo_key,
-            "ContentType": "image/jpeg",
-        },
-        ExpiresIn=900,  # 15 minutes
-    )
+    data = await request.json() if await request.body() else {}
+    try:
+        return create_upload(db, username, date, data.get("content_type"), data.get("size"))
+    except PhotoUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return PhotoPresignedUrlResponse(
-        presigned_url=presigned_url,
-        photo_key=photo_key,
-    )
+
+@app.post("/diary/{date}/photo/confirm")
+async def confirm_photo_upload(
+    date: str,
+    request: Request,
+    user_id: str = Depends(get_current_user),
+):
+    """アップロードされた写真を確認し、日記に添付"""
+    username = user_id.replace("user#", "")
+    data = await request.json()
+    try:
+        result = confirm_upload(db, username, date, data.get("photo_key"))
+    except PhotoUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "photo_url": db.get_photo_url(result["photo_key"])}
 
 
 @app.get("/family/calendar/{year}/{month}")
@@ -0,0 +1,172 @@
+"""
+リクエスト単位の処理時間の内訳（CloudWatch Embedded Metric Format / Server-Timing）
+
+- api_handler がリクエストごとに RequestTimer を開始し、DiaryDatabase などが phase() / @timed() で区間を計測する
+- 区間は入れ子にでき、各区間には自身の時間（内側の区間を除いた時間）を計上する
+  （例: transform 中の署名付きURL生成は presign に計上され、transform には含まれない）
+- リクエストの終了時に EMF 形式の JSON 1行を標準出力に書き出す
+  （Lambda では CloudWatch Logs 経由でメトリクスになり、ローカルではそのまま表示される）
+- レスポンスには Server-Timing ヘッダーを付与する（ブラウザの開発者ツールで確認可能）
+- コンテナの最初のリクエストには ColdStart=true を付ける
+
+環境変数:
+- METRICS_ENABLED: EMF を出力するか（デフォルト: true）
+- METRICS_NAMESPACE: CloudWatch のメトリクス名前空間（デフォルト: FamilyDiary）
+- SERVER_TIMING_ENABLED: Server-Timing ヘッダーを付与するか（デフォルト: true）
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "FamilyDiary")
+SERVER_TIMING_ENABLED = os.environ.get("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+# 計測する区間（EMF では計測されなかった区間も 0 として出力し、ルートごとの平均を比較できるようにする）
+PHASES = (
+    "db",         # DynamoDB（ローカルのデータベースを含む）の読み書き
+    "presign",    # 署名付きURLの生成
+    "s3",         # S3 へのアップロード
+    "transform",  # フロントエンド向けのフィールド変換
+    "serialize",  # json.dumps
+    "compress",   # レスポンスの圧縮
+)
+
+_current_timer: contextvars.ContextVar[Optional["RequestTimer"]] = contextvars.ContextVar(
+    "request_timer", default=None
+)
+# コンテナで最初のリクエストかどうか（モジュールの読み込み＝コンテナの初期化）
+_cold_start = True
+
+
+class RequestTimer:
+    """1リクエストの区間ごとの処理時間（ミリ秒）"""
+
+    def __init__(self, cold_start: bool = False):
+        self.cold_start = cold_start
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # 実行中の区間: [区間名, 開始時刻, 内側の区間の合計時間]
+        self._stack: List[list] = []
+
+    def enter(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self) -> None:
+        name, started, inner = self._stack.pop()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - inner
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def finish(self) -> None:
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダーの値（計測された区間と合計）"""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.phases.items()]
+        if self.cold_start:
+            parts.append('cold;desc="cold start"')
+        parts.append(f"total;dur={self.total_ms:.1f}")
+        return ", ".join(parts)
+
+    def emf(self, route: str, status: Optional[int] = None, request_id: Optional[str] = None) -> dict:
+        """EMF 形式のログレコード（Route / ColdStart をディメンションとする）"""
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Route"], ["Route", "ColdStart"]],
+                    "Metrics": [{"Name": "total", "Unit": "Milliseconds"}]
+                    + [{"Name": name, "Unit": "Milliseconds"} for name in PHASES],
+                }],
+            },
+            "Route": route,
+            "ColdStart": "true" if self.cold_start else "false",
+            "total": round(self.total_ms, 3),
+        }
+        for name in PHASES:
+            record[name] = round(self.phases.get(name, 0.0), 3)
+        # ディメンション以外のプロパティ（ログの検索用、メトリクスにはならない）
+        record["StatusCode"] = status
+        if request_id:
+            record["request_id"] = request_id
+        record["phase_counts"] = self.counts
+        return record
+
+
+def start_request() -> RequestTimer:
+    """リクエストの計測を開始（コンテナの最初のリクエストはコールドスタート）"""
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    return RequestTimer(cold_start)
+
+
+@contextlib.contextmanager
+def request_timer() -> Iterator[RequestTimer]:
+    """リクエストの処理中、phase() / @timed() の計測先となる RequestTimer を保持"""
+    timer = start_request()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        timer.finish()
+        _current_timer.reset(token)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """区間の処理時間を計測（リクエスト外では何もしない）"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.exit()
+
+
+def timed(name: str):
+    """関数の実行時間を区間 name として計測するデコレーター"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = _current_timer.get()
+            if timer is None:
+                return func(*args, **kwargs)
+            timer.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.exit()
+        return wrapper
+    return decorator
+
+
+def emit(timer: RequestTimer, route: str, status: Optional[int] = None, request_id: Optional[str] = None) -> None:
+    """EMF のレコードを標準出力に1行で書き出す"""
+    if not METRICS_ENABLED:
+        return
+    line = json.dumps(timer.emf(route, status, request_id), ensure_ascii=False, separators=(",", ":"))
+    sys.stdout.write(line + "\n")
@@ -0,0 +1,119 @@
+"""
+写真参照トークン（PHOTO_URL_MODE=redirect）の生成と検証
+
+カレンダーは写真ごとに GET /photo/{ref} の URL を返し、ブラウザは <img src> で直接読み込む。
+<img> は Authorization ヘッダーを送れないため、このルートは Cognito の認可を通さず、
+ref 自体を閲覧者・写真キー・有効期限を含む HMAC 署名付きトークンにする。
+
+有効期限は PHOTO_REF_ROTATION_SECONDS ごとの区切りに揃えるため、同じ期間内は同じ写真に同じ ref を返し、
+ブラウザがリダイレクトを写真ごとにキャッシュできる（有効期間は ROTATION 以上 2倍未満）
+
+環境変数:
+- PHOTO_REF_SECRET: 署名鍵（ローカル検証用）
+- PHOTO_REF_SECRET_PARAMETER: 署名鍵の SSM SecureString パラメータ名（本番用）
+- PHOTO_REF_ROTATION_SECONDS: ref を入れ替える周期（デフォルト: 3600）
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+PHOTO_REF_ROTATION_SECONDS = int(os.environ.get("PHOTO_REF_ROTATION_SECONDS", "3600"))
+
+_secret: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode((value + "=" * (-len(value) % 4)).encode("ascii"))
+
+
+def _load_secret() -> bytes:
+    """
+    署名鍵を取得
+    - PHOTO_REF_SECRET: 文字列（ローカル検証用）
+    - PHOTO_REF_SECRET_PARAMETER: SSM SecureString パラメータ名（本番用）
+    """
+    secret = os.environ.get("PHOTO_REF_SECRET")
+    if secret:
+        return secret.encode("utf-8")
+
+    parameter_name = os.environ.get("PHOTO_REF_SECRET_PARAMETER")
+    if parameter_name:
+        import boto3
+
+        response = boto3.client("ssm").get_parameter(Name=parameter_name, WithDecryption=True)
+        return response["Parameter"]["Value"].encode("utf-8")
+
+    raise ValueError("PHOTO_REF_SECRET or PHOTO_REF_SECRET_PARAMETER must be set")
+
+
+def get_secret() -> bytes:
+    """署名鍵（ウォームコンテナ内で再利用）"""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                _secret = _load_secret()
+    return _secret
+
+
+def rotation_period(now: Optional[float] = None) -> int:
+    """現在の ref の期間番号（カレンダーの ETag に含める）"""
+    return int((now if now is not None else time.time()) // PHOTO_REF_ROTATION_SECONDS)
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(get_secret(), payload, hashlib.sha256).digest()
+
+
+def issue_photo_ref(viewer: str, photo_key: str, now: Optional[float] = None) -> str:
+    """
+    閲覧者が写真を読み込むための ref を発行
+
+    Returns:
+        "{payload}.{signature}"（どちらも base64url、パディングなし）
+    """
+    expires_at = (rotation_period(now) + 2) * PHOTO_REF_ROTATION_SECONDS
+    payload = json.dumps([viewer, photo_key, expires_at], separators=(",", ":")).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def verify_photo_ref(photo_ref: str, now: Optional[float] = None) -> Tuple[str, str, int]:
+    """
+    ref の署名と有効期限を検証
+
+    Returns:
+        (閲覧者, 写真キー, 有効期限の UNIX 秒)
+
+    Raises:
+        ValueError: 形式不正・署名不一致・期限切れの場合
+    """
+    encoded_payload, _, encoded_signature = (photo_ref or "").partition(".")
+    try:
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid photo reference") from e
+    if not payload or not hmac.compare_digest(signature, _sign(payload)):
+        raise ValueError("Invalid photo reference signature")
+
+    try:
+        viewer, photo_key, expires_at = json.loads(payload)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid photo reference payload") from e
+    if not isinstance(viewer, str) or not isinstance(photo_key, str) or not isinstance(expires_at, int):
+        raise ValueError("Invalid photo reference payload")
+    if not viewer or not photo_key:
+        raise ValueError("Invalid photo reference payload")
+    if expires_at <= (now if now is not None else time.time()):
+        raise ValueError("Expired photo reference")
+    return viewer, photo_key, expires_at
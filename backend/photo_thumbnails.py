@@ -0,0 +1,186 @@
+"""
+写真の縮小版（サムネイル・中サイズ）の作成
+
+写真バケットの photos/ 配下に写真がアップロードされると（S3 の ObjectCreated イベント）、
+EXIF の向きを反映して回転し、EXIF を含まない JPEG の縮小版を作成する:
+- thumb: THUMB_SIZE 四方の正方形（中央を切り抜き）。カレンダーの一覧表示用
+- medium: 長辺 MEDIUM_SIZE 以内。GET /diary/{date} の表示用
+
+縮小版のキーは元の写真のキー + ".thumb.jpeg" / ".medium.jpeg"（photo_upload.rendition_key）。
+作成後、写真が日記に添付されていれば rendered_photos に記録し、API は記録済みの写真のみ縮小版を参照する
+（作成前・作成できなかった写真は元の写真を表示する）。
+縮小版も photos/ 配下に保存するが、S3 イベントは元の写真の拡張子で絞り込むため縮小版では発生しない
+（フィルターの設定漏れに備え、縮小版のキーは処理しない）。
+写真全体を読み込むため、HeadObject でサイズを確認し PHOTO_UPLOAD_MAX_BYTES を超える写真も処理しない
+（confirm_upload で削除される）
+
+ローカル開発では DiaryDatabase がアップロード時に LocalS3Events で同じ処理を同期的に呼び出す。
+Pillow が必要（requirements-lambda.txt）。インストールされていない場合は縮小版を作成しない
+
+環境変数:
+- PHOTO_THUMB_SIZE: サムネイルの一辺（デフォルト: 320）
+- PHOTO_MEDIUM_SIZE: 中サイズの長辺（デフォルト: 1280）
+- PHOTO_RENDITION_QUALITY: JPEG の品質（デフォルト: 82）
+"""
+import io
+import os
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import unquote_plus
+
+try:
+    from PIL import Image, ImageOps  # type: ignore
+except ImportError:  # Lambda 標準ランタイムには含まれない（依存パッケージレイヤーで追加）
+    Image = ImageOps = None
+
+from photo_upload import PHOTO_KEY_PREFIX, PHOTO_UPLOAD_MAX_BYTES, is_rendition_key, rendition_key
+from structured_logging import get_logger
+
+logger = get_logger("photo_thumbnails")
+
+THUMB_SIZE = int(os.environ.get("PHOTO_THUMB_SIZE", "320"))
+MEDIUM_SIZE = int(os.environ.get("PHOTO_MEDIUM_SIZE", "1280"))
+RENDITION_QUALITY = int(os.environ.get("PHOTO_RENDITION_QUALITY", "82"))
+
+
+def _to_rgb(image):
+    """JPEG で保存できる RGB に変換（透過部分は白で塗る）"""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _encode_jpeg(image) -> bytes:
+    # exif を渡さないため、位置情報などのメタデータは含まれない
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=RENDITION_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def render(image_bytes: bytes) -> Dict[str, bytes]:
+    """
+    写真から縮小版を作成
+
+    Returns:
+        {"thumb": JPEG, "medium": JPEG}（photo_upload.PHOTO_RENDITIONS の順）
+
+    Raises:
+        OSError: 画像として読み込めない（Pillow が対応していない形式を含む）
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEG は必要な大きさまで縮小しながらデコードする（1/2〜1/8。向きの補正前のため正方形で指定）
+    image.draft("RGB", (MEDIUM_SIZE, MEDIUM_SIZE))
+    image = _to_rgb(ImageOps.exif_transpose(image))
+
+    medium = image.copy()
+    medium.thumbnail((MEDIUM_SIZE, MEDIUM_SIZE), Image.LANCZOS)
+    # サムネイルは中サイズから作成する（元の画像からより速い）
+    thumb = ImageOps.fit(medium, (THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    return {"thumb": _encode_jpeg(thumb), "medium": _encode_jpeg(medium)}
+
+
+def process_photo(db, photo_key: str) -> Optional[Dict[str, str]]:
+    """
+    写真の縮小版を作成して保存し、日記に記録
+
+    Returns:
+        {"thumb": キー, "medium": キー}。対象外・作成できない場合は None
+    """
+    if not photo_key.startswith(PHOTO_KEY_PREFIX) or is_rendition_key(photo_key):
+        return None
+    if Image is None:
+        logger.warning("Pillow is not installed; skipping renditions for %s", photo_key)
+        return None
+    metadata = db.get_photo_metadata(photo_key)
+    if metadata is None or metadata["size"] > PHOTO_UPLOAD_MAX_BYTES:
+        # 削除済み、または上限を超える写真（Lambda のメモリに読み込まない）
+        logger.warning("Skipping renditions for %s: %s", photo_key,
+                       "not found" if metadata is None else f"{metadata['size']} bytes")
+        return None
+
+    try:
+        renditions = render(db.get_photo_bytes(photo_key))
+    except (OSError, Image.DecompressionBombError) as e:
+        # HEIC など Pillow が読み込めない画像は元の写真を表示する
+        logger.warning("Cannot create renditions for %s: %s", photo_key, e)
+        return None
+
+    keys = {}
+    for name, body in renditions.items():
+        keys[name] = rendition_key(photo_key, name)
+        db.put_photo_rendition(keys[name], body)
+    rendered = db.mark_photo_rendered(photo_key)
+    logger.info("Created photo renditions", extra={"fields": {
+        "photo_key": photo_key,
+        "bytes": {name: len(body) for name, body in renditions.items()},
+        "marked": rendered,
+    }})
+    return keys
+
+
+def apply_s3_records(records: Iterable[Dict], db) -> int:
+    """
+    S3 イベントのレコード（ObjectCreated）ごとに縮小版を作成
+
+    Returns:
+        縮小版を作成した写真の数
+    """
+    processed = 0
+    for record in records:
+        if not record.get("eventName", "").startswith("ObjectCreated:"):
+            continue
+        s3 = record.get("s3", {})
+        if s3.get("bucket", {}).get("name") != db.photo_bucket:
+            continue
+        # イベントのキーは URL エンコードされている
+        photo_key = unquote_plus(s3.get("object", {}).get("key", ""))
+        if process_photo(db, photo_key) is not None:
+            processed += 1
+    return processed
+
+
+class LocalS3Events:
+    """
+    S3 イベント通知のローカル代替
+    DiaryDatabase へのアップロードを S3 イベントと同じ形式のレコードにして即座に処理する
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __call__(self, bucket: str, photo_key: str) -> None:
+        record = {
+            "eventName": "ObjectCreated:Put",
+            "s3": {"bucket": {"name": bucket}, "object": {"key": photo_key}},
+        }
+        apply_s3_records([record], self.db)
+
+
+_event_db = None
+
+
+def _get_event_db():
+    """S3 イベント Lambda 用の DiaryDatabase（ウォームコンテナ内で再利用）"""
+    global _event_db
+    if _event_db is None:
+        from database import DiaryDatabase
+
+        bucket = os.environ.get("PHOTO_BUCKET_NAME")
+        if not bucket:
+            raise ValueError("PHOTO_BUCKET_NAME environment variable not set")
+        _event_db = DiaryDatabase(os.environ.get("DYNAMODB_TABLE_NAME"), bucket)
+    return _event_db
+
+
+def s3_event_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    写真バケットの S3 イベント（ObjectCreated）を処理する Lambda ハンドラー
+    """
+    records = event.get("Records", [])
+    processed = apply_s3_records(records, _get_event_db())
+    logger.info("Photo renditions: processed %d/%d records", processed, len(records))
+    return {"processed": processed}
@@ -0,0 +1,290 @@
+"""
+写真のアップロード（署名付き POST で S3 に直接アップロード）
+
+1. POST /diary/{date}/photo に {"content_type": "image/jpeg", "size": バイト数} を送ると、
+   S3 への署名付き POST（url と fields）を返す。ポリシーでキー・Content-Type・サイズの上限を固定する
+2. クライアントは fields と file を multipart/form-data で url に直接 POST する
+3. POST /diary/{date}/photo/confirm に {"photo_key": ...} を送ると、アップロード済みであることを確認して日記に添付する
+
+画像は Lambda を経由しないため、base64 のオーバーヘッドや API Gateway のペイロード上限の影響を受けない。
+
+大きな写真はマルチパートアップロードも利用できる（パートを並列に送れ、失敗したパートだけを再送できる）:
+1. POST /diary/{date}/photo/multipart に {"content_type", "size"} を送ると、パートごとの署名付き PUT URL を返す
+   （{"photo_key", "upload_id", "size"} を送ると、アップロード済みのパートと残りのパートの URL を返す＝再開）
+2. クライアントは各パートを URL に PUT し、レスポンスの ETag を控える
+3. POST /diary/{date}/photo/multipart/complete に {"photo_key", "upload_id", "parts": [{"part_number", "etag"}]} を送ると、
+   S3 でパートを結合し、confirm と同じ確認をして日記に添付する
+   （中止する場合は POST /diary/{date}/photo/multipart/abort に {"photo_key", "upload_id"}）
+アップロード後の縮小版（サムネイル・中サイズ）の作成は photo_thumbnails を参照。
+api_handler（Lambda）と main.py（FastAPI）の両方から使用する
+"""
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from structured_logging import get_logger
+
+logger = get_logger("photo_upload")
+
+# アップロードできる画像の最大サイズ（バイト）
+PHOTO_UPLOAD_MAX_BYTES = int(os.environ.get("PHOTO_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# 署名付き POST の有効期限（秒）
+PHOTO_UPLOAD_EXPIRATION = int(os.environ.get("PHOTO_UPLOAD_EXPIRATION", "900"))
+# マルチパートアップロードのパートサイズ（S3 の最小は 5MiB。最後のパートのみ小さくてよい）
+PHOTO_MULTIPART_PART_SIZE = max(5 * 1024 * 1024, int(os.environ.get("PHOTO_MULTIPART_PART_SIZE", str(5 * 1024 * 1024))))
+# 家族の写真プレフィックス（CloudFront からも配信できるよう photos/ 配下に保存する）
+PHOTO_KEY_PREFIX = "photos/"
+
+# 受け付ける Content-Type と拡張子
+PHOTO_CONTENT_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/heic": "heic",
+    "image/gif": "gif",
+}
+
+# photo_thumbnails が作成する縮小版（キーは元の写真のキー + ".{名前}.jpeg"）
+# - thumb: カレンダーの一覧表示用  - medium: GET /diary/{date} の表示用
+PHOTO_RENDITIONS = ("thumb", "medium")
+# 縮小版の拡張子。元の写真の拡張子（PHOTO_CONTENT_TYPES）と重ならないものにする:
+# 縮小版作成 Lambda の S3 イベントは元の写真の拡張子で絞り込むため（infrastructure/lib/main-stack.ts）、
+# 縮小版の保存でイベントが発生しない
+PHOTO_RENDITION_EXTENSION = "jpeg"
+
+
+class PhotoUploadError(ValueError):
+    """アップロード要求・確認の不正（クライアントのエラー）"""
+
+
+def photo_key_prefix(username: str, date_str: str) -> str:
+    """ユーザー・日付ごとの写真キーのプレフィックス"""
+    return f"{PHOTO_KEY_PREFIX}{username}/{date_str}/"
+
+
+def parse_photo_key(photo_key: str) -> Optional[Tuple[str, str]]:
+    """
+    写真のS3キーから (ユーザー名, 日付) を取得
+
+    S3キーは "photos/{username}/{date}/..." または旧形式の "{username}/{date}/..."。形式が違う場合は None
+    """
+    parts = photo_key.split("/")
+    if parts and parts[0] == PHOTO_KEY_PREFIX.rstrip("/"):
+        parts = parts[1:]
+    if len(parts) < 3:
+        return None
+    return parts[0], parts[1]
+
+
+def rendition_key(photo_key: str, rendition: str) -> str:
+    """縮小版のS3キー（例: photos/u/2024-05-01/abc.png → photos/u/2024-05-01/abc.png.thumb.jpeg）"""
+    return f"{photo_key}.{rendition}.{PHOTO_RENDITION_EXTENSION}"
+
+
+def original_photo_key(photo_key: str) -> str:
+    """縮小版のキーを元の写真のキーに戻す（縮小版でなければそのまま）"""
+    for rendition in PHOTO_RENDITIONS:
+        suffix = f".{rendition}.{PHOTO_RENDITION_EXTENSION}"
+        if photo_key.endswith(suffix):
+            return photo_key[:-len(suffix)]
+    return photo_key
+
+
+def is_rendition_key(photo_key: str) -> bool:
+    return original_photo_key(photo_key) != photo_key
+
+
+def _validate_content_type(content_type: Optional[str]) -> str:
+    content_type = (content_type or "image/jpeg").lower()
+    if content_type not in PHOTO_CONTENT_TYPES:
+        raise PhotoUploadError(f"対応していない画像形式です: {content_type}")
+    return content_type
+
+
+def _validate_size(size) -> None:
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise PhotoUploadError("size が不正です")
+    if size > PHOTO_UPLOAD_MAX_BYTES:
+        raise PhotoUploadError(f"画像サイズが上限（{PHOTO_UPLOAD_MAX_BYTES}バイト）を超えています")
+
+
+def _validate_photo_key(username: str, date_str: str, photo_key: Optional[str]) -> None:
+    if not photo_key or not photo_key.startswith(photo_key_prefix(username, date_str)) or is_rendition_key(photo_key):
+        raise PhotoUploadError("photo_key が不正です")
+
+
+def _validate_upload_id(upload_id) -> None:
+    if not upload_id or not isinstance(upload_id, str):
+        raise PhotoUploadError("upload_id が必要です")
+
+
+def _new_photo_key(username: str, date_str: str, content_type: str) -> str:
+    return f"{photo_key_prefix(username, date_str)}{uuid.uuid4().hex}.{PHOTO_CONTENT_TYPES[content_type]}"
+
+
+def create_upload(db, username: str, date_str: str, content_type: Optional[str], size: Optional[int] = None) -> Dict:
+    """
+    S3 への署名付き POST を発行
+
+    Returns:
+        {"url", "fields", "photo_key", "expires_in", "max_bytes"}
+    """
+    content_type = _validate_content_type(content_type)
+    if size is not None:
+        _validate_size(size)
+
+    photo_key = _new_photo_key(username, date_str, content_type)
+    post = db.generate_photo_upload_post(photo_key, content_type, PHOTO_UPLOAD_MAX_BYTES, PHOTO_UPLOAD_EXPIRATION)
+    return {
+        "url": post["url"],
+        "fields": post["fields"],
+        "photo_key": photo_key,
+        "expires_in": PHOTO_UPLOAD_EXPIRATION,
+        "max_bytes": PHOTO_UPLOAD_MAX_BYTES,
+    }
+
+
+def confirm_upload(db, username: str, date_str: str, photo_key: Optional[str]) -> Dict:
+    """
+    アップロードされた写真を確認し、日記があれば添付する
+
+    日記がまだない場合は添付せずに返す（日記の保存時に photo_key を photos に含める）
+
+    Returns:
+        {"photo_key", "attached"}
+    """
+    _validate_photo_key(username, date_str, photo_key)
+
+    metadata = db.get_photo_metadata(photo_key)
+    if metadata is None:
+        raise PhotoUploadError("写真がアップロードされていません")
+    # ポリシーで制限しているが、念のため保存されたオブジェクトも確認する
+    if metadata["content_type"] not in PHOTO_CONTENT_TYPES or metadata["size"] > PHOTO_UPLOAD_MAX_BYTES:
+        # 添付しない写真を photos/ に残さない
+        db.delete_photo(photo_key)
+        logger.warning("Deleted rejected photo upload", extra={"fields": {
+            "photo_key": photo_key, "bytes": metadata["size"], "content_type": metadata["content_type"],
+        }})
+        raise PhotoUploadError("対応していない画像です")
+
+    # ローカル開発では S3 イベントの代わりにここで縮小版を作成する（本番では何もしない）
+    db.notify_photo_uploaded(photo_key)
+    attached = db.attach_photo(username, date_str, photo_key) is not None
+    if attached and db.has_photo_renditions(photo_key):
+        # 縮小版の作成が添付より先に終わった場合（作成側の記録は添付前のため反映されていない）
+        db.mark_photo_rendered(photo_key)
+    logger.info("Photo upload confirmed", extra={"fields": {
+        "photo_key": photo_key, "bytes": metadata["size"], "attached": attached,
+    }})
+    return {"photo_key": photo_key, "attached": attached}
+
+
+def _multipart_response(db, photo_key: str, upload_id: str, size: int, uploaded: List[Dict]) -> Dict:
+    """マルチパートアップロードの残りのパートと、その署名付き PUT URL"""
+    part_count = -(-size // PHOTO_MULTIPART_PART_SIZE)
+    if any(part["part_number"] > part_count for part in uploaded):
+        raise PhotoUploadError("size がアップロード済みのパートと一致しません")
+    done = {part["part_number"] for part in uploaded}
+    parts = [
+        {
+            "part_number": number,
+            "url": db.generate_upload_part_url(photo_key, upload_id, number, PHOTO_UPLOAD_EXPIRATION),
+        }
+        for number in range(1, part_count + 1)
+        if number not in done
+    ]
+    return {
+        "photo_key": photo_key,
+        "upload_id": upload_id,
+        "part_size": PHOTO_MULTIPART_PART_SIZE,
+        "part_count": part_count,
+        "parts": parts,
+        "uploaded": uploaded,
+        "expires_in": PHOTO_UPLOAD_EXPIRATION,
+        "max_bytes": PHOTO_UPLOAD_MAX_BYTES,
+    }
+
+
+def create_multipart_upload(db, username: str, date_str: str, content_type: Optional[str], size) -> Dict:
+    """
+    マルチパートアップロードを開始し、全パートの署名付き PUT URL を発行
+
+    Returns:
+        {"photo_key", "upload_id", "part_size", "part_count", "parts": [{"part_number", "url"}],
+         "uploaded": [], "expires_in", "max_bytes"}
+    """
+    content_type = _validate_content_type(content_type)
+    _validate_size(size)
+
+    photo_key = _new_photo_key(username, date_str, content_type)
+    upload_id = db.create_photo_multipart_upload(photo_key, content_type)
+    return _multipart_response(db, photo_key, upload_id, size, [])
+
+
+def resume_multipart_upload(db, username: str, date_str: str, photo_key: Optional[str], upload_id, size) -> Dict:
+    """
+    中断したマルチパートアップロードを再開（アップロード済みのパートと、残りのパートの新しい URL を返す）
+
+    Returns:
+        create_multipart_upload と同じ形式（uploaded は [{"part_number", "etag", "size"}]）
+    """
+    _validate_photo_key(username, date_str, photo_key)
+    _validate_upload_id(upload_id)
+    _validate_size(size)
+
+    uploaded = db.list_photo_upload_parts(photo_key, upload_id)
+    if uploaded is None:
+        raise PhotoUploadError("アップロードが見つかりません（完了または中止済み）")
+    return _multipart_response(db, photo_key, upload_id, size, uploaded)
+
+
+def complete_multipart_upload(db, username: str, date_str: str, photo_key: Optional[str], upload_id, parts) -> Dict:
+    """
+    マルチパートアップロードを完了し、confirm_upload と同じ確認をして日記に添付
+
+    パートの署名付き PUT URL ではサイズを制限できないため、結合する前に ListParts で
+    パートの合計サイズを確認し、上限を超える場合はアップロードを中止する
+
+    Returns:
+        {"photo_key", "attached"}
+    """
+    _validate_photo_key(username, date_str, photo_key)
+    _validate_upload_id(upload_id)
+    if not isinstance(parts, list) or not parts:
+        raise PhotoUploadError("parts が必要です")
+    completed = []
+    for part in parts:
+        number = part.get("part_number") if isinstance(part, dict) else None
+        etag = part.get("etag") if isinstance(part, dict) else None
+        if not isinstance(number, int) or not isinstance(etag, str) or not etag:
+            raise PhotoUploadError("parts は {part_number, etag} の配列で指定してください")
+        completed.append({"part_number": number, "etag": etag})
+    completed.sort(key=lambda part: part["part_number"])
+    if len({part["part_number"] for part in completed}) != len(completed):
+        raise PhotoUploadError("part_number が重複しています")
+
+    uploaded = db.list_photo_upload_parts(photo_key, upload_id)
+    if uploaded is None:
+        raise PhotoUploadError("アップロードが見つかりません（完了または中止済み）")
+    sizes = {part["part_number"]: part["size"] for part in uploaded}
+    if any(part["part_number"] not in sizes for part in completed):
+        raise PhotoUploadError("パートを結合できません（未アップロードのパート、または ETag の不一致）")
+    total = sum(sizes[part["part_number"]] for part in completed)
+    if total > PHOTO_UPLOAD_MAX_BYTES:
+        db.abort_photo_multipart_upload(photo_key, upload_id)
+        logger.warning("Aborted oversized multipart upload", extra={"fields": {
+            "photo_key": photo_key, "bytes": total,
+        }})
+        raise PhotoUploadError(f"画像サイズが上限（{PHOTO_UPLOAD_MAX_BYTES}バイト）を超えています")
+
+    if not db.complete_photo_multipart_upload(photo_key, upload_id, completed):
+        raise PhotoUploadError("パートを結合できません（未アップロードのパート、または ETag の不一致）")
+    return confirm_upload(db, username, date_str, photo_key)
+
+
+def abort_multipart_upload(db, username: str, date_str: str, photo_key: Optional[str], upload_id) -> Dict:
+    """マルチパートアップロードを中止（アップロード済みのパートも削除される）"""
+    _validate_photo_key(username, date_str, photo_key)
+    _validate_upload_id(upload_id)
+    db.abort_photo_multipart_upload(photo_key, upload_id)
+    return {"photo_key": photo_key, "aborted": True}
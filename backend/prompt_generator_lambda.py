@@ -16,6 +16,8 @@ import pytz
 import feedparser
 import requests
 
+import prompt_store
+
 # DynamoDB と Bedrock クライアント
 dynamodb = boto3.resource("dynamodb")
 bedrock = boto3.client("bedrock-runtime")
@@ -37,22 +39,11 @@ def get_recent_prompts(days: int = 14) -> List[Dict[str, Any]]:
         days: 何日前までを取得するか
     
     Returns:
-        お題リスト
+        お題リスト（新しい順）
     """
     try:
-        jst = pytz.timezone('Asia/Tokyo')
-        start_date = (datetime.now(jst) - timedelta(days=days)).strftime("%Y-%m-%d")
-        
-        # テーブルスキャン
-        response = prompts_table.scan(
-            FilterExpression="attribute_exists(#d) AND #d >= :start_date",
-            ExpressionAttributeNames={"#d": "date"},
-            ExpressionAttributeValues={":start_date": start_date}
-        )
-        
-        items = response.get("Items", [])
-        items.sort(key=lambda x: x.get("date", ""), reverse=True)
-        return items
+        # 日付キーの BatchGetItem（API と同じ prompt_store を使用）
+        return prompt_store.get_recent_prompts(dynamodb, PROMPTS_TABLE_NAME, days)
     except Exception as e:
         print(f"Error getting recent prompts: {e}")
         return []
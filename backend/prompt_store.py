@@ -0,0 +1,67 @@
+"""
+お題テーブル（diary_prompts）の読み取り
+
+お題テーブルのパーティションキーは日付（YYYY-MM-DD）で、1日1アイテムのため、
+過去 N 日間のお題は N+1 個の日付キーの BatchGetItem で取得できる。
+Scan と違い、読み取るアイテム数はテーブルに蓄積されたお題の件数に依存しない
+
+DiaryDatabase（api_handler / main.py）と prompt_generator_lambda の両方から使用する
+（prompt_generator Lambda にも含まれるため、boto3 と pytz 以外に依存しない）
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+import pytz
+
+# BatchGetItem の1リクエストの最大キー数
+PROMPT_BATCH_GET_MAX_KEYS = 100
+PROMPT_BATCH_GET_MAX_RETRIES = 5
+
+
+def recent_prompt_dates(days: int, now: Optional[datetime] = None) -> List[str]:
+    """
+    今日（JST）から days 日前までの日付（新しい順、今日を含めて days+1 個）
+    """
+    jst = pytz.timezone('Asia/Tokyo')
+    today = (now.astimezone(jst) if now is not None else datetime.now(jst)).date()
+    return [(today - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(max(days, 0) + 1)]
+
+
+def batch_get_prompts(dynamodb, table_name: str, dates: Sequence[str]) -> List[dict]:
+    """
+    指定日のお題をまとめて取得（BatchGetItem、100件ごと。UnprocessedKeys は指数バックオフで再試行）
+
+    Args:
+        dynamodb: boto3 の DynamoDB リソース
+
+    Returns:
+        日付の新しい順のお題リスト（お題がない日は含めない）
+
+    Raises:
+        RuntimeError: 再試行しても未処理のキーが残った場合
+    """
+    dates = sorted(set(dates))
+    items: List[dict] = []
+    for start in range(0, len(dates), PROMPT_BATCH_GET_MAX_KEYS):
+        request = {table_name: {"Keys": [{"date": date} for date in dates[start:start + PROMPT_BATCH_GET_MAX_KEYS]]}}
+        for attempt in range(PROMPT_BATCH_GET_MAX_RETRIES + 1):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response.get("Responses", {}).get(table_name, []))
+            request = response.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            if attempt < PROMPT_BATCH_GET_MAX_RETRIES:
+                time.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        else:
+            remaining = len(request.get(table_name, {}).get("Keys", []))
+            raise RuntimeError(f"BatchGetItem left {remaining} unprocessed prompt keys")
+    return sorted(items, key=lambda item: item["date"], reverse=True)
+
+
+def get_recent_prompts(dynamodb, table_name: str, days: int = 14) -> List[dict]:
+    """
+    過去 N 日間（今日を含む）のお題を新しい順に取得（重複チェック用）
+    """
+    return batch_get_prompts(dynamodb, table_name, recent_prompt_dates(days))
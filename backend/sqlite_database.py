@@ -0,0 +1,357 @@
+"""
+SQLite によるローカル永続化データベース（開発・ベンチマーク用）
+InMemoryDatabase と同じメソッドを持ち、DiaryDatabase から DIARY_DB_BACKEND=sqlite で使用する
+
+- WAL モード（読み込みは書き込みをブロックしない）
+- (user_id, date) / (is_public, date) のインデックスで GSI の Query を再現
+- 接続はスレッドごと（マルチスレッドのサーバーから使用可能）
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pytz
+
+from database import INDEX_PARTITION_KEYS, month_date_range
+
+SQLITE_DB_PATH = os.environ.get("SQLITE_DB_PATH", "family_diary.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diary_entries (
+    pk TEXT PRIMARY KEY,
+    user_id TEXT,
+    date TEXT NOT NULL,
+    is_public TEXT,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_diary_user_date ON diary_entries (user_id, date, pk);
+CREATE INDEX IF NOT EXISTS idx_diary_public_date ON diary_entries (is_public, date, pk);
+CREATE TABLE IF NOT EXISTS prompts (
+    date TEXT PRIMARY KEY,
+    item TEXT NOT NULL
+);
+"""
+
+
+def _dumps(item: Dict) -> str:
+    return json.dumps(item, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+class SQLiteDatabase:
+    """SQLite の日記テーブル（アイテムは JSON で保存し、キーとインデックス列のみ列として持つ）"""
+
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        if path == ":memory:":
+            # スレッドごとの接続では別々のデータベースになるため
+            raise ValueError("SQLiteDatabase requires a file path (use DIARY_DB_BACKEND=memory instead)")
+        self.path = path
+        self._local = threading.local()
+        # 書き込みと変更通知の順序を揃えるためのロック（読み込みは WAL により並行）
+        self._write_lock = threading.RLock()
+        # 変更通知先（DynamoDB Streams の代替）: listener(event_name, old_image, new_image)
+        self.change_listeners = []
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """スレッドごとの接続（autocommit、トランザクションは明示的に開始する）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """現在のスレッドの接続を閉じる"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _emit(self, event_name: str, old_image: Optional[dict], new_image: Optional[dict]) -> None:
+        """変更を Streams と同じ INSERT / MODIFY / REMOVE で通知"""
+        for listener in self.change_listeners:
+            listener(event_name, old_image, new_image)
+
+    def _get(self, conn: sqlite3.Connection, key: str) -> Optional[dict]:
+        row = conn.execute("SELECT item FROM diary_entries WHERE pk = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, item: Dict) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO diary_entries (pk, user_id, date, is_public, item) VALUES (?, ?, ?, ?, ?)",
+            (item["user_id#date"], item.get("user_id"), item["date"], item.get("is_public"), _dumps(item)),
+        )
+
+    def put_item(self, item: dict) -> dict:
+        """アイテムを丸ごと保存（DynamoDB の put_item 相当）"""
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_image = self._get(conn, item["user_id#date"])
+                self._write(conn, item)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._emit("MODIFY" if old_image else "INSERT", old_image, dict(item))
+        return item
+
+    def upsert_item(self, item: dict, if_not_exists: Sequence[str] = ("created_at",)) -> dict:
+        """
+        アイテムの属性を作成または上書き（DynamoDB の update_item による upsert 相当）
+
+        item にない既存の属性は残し、if_not_exists の属性は既存の値を優先する
+        """
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_image = self._get(conn, item["user_id#date"])
+                new_item = {**(old_image or {}), **item}
+                for attr in if_not_exists:
+                    if old_image and attr in old_image:
+                        new_item[attr] = old_image[attr]
+                self._write(conn, new_item)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._emit("MODIFY" if old_image else "INSERT", old_image, dict(new_item))
+        return new_item
+
+    def patch_item(self, key: str, attrs: dict) -> Optional[dict]:
+        """既存のアイテムの属性を上書き（アイテムがない場合は何もせず None）"""
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_image = self._get(conn, key)
+                if old_image is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                new_item = {**old_image, **attrs}
+                self._write(conn, new_item)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._emit("MODIFY", old_image, dict(new_item))
+        return new_item
+
+    def put_entry(
+        self,
+        user_id: str,
+        date: str,
+        entry_text: str,
+        is_public: bool = False,
+        photo_url: Optional[str] = None,
+    ) -> dict:
+        jst = pytz.timezone('Asia/Tokyo')
+        now_jst = datetime.now(jst)
+        item = {
+            "user_id#date": f"{user_id}#{date}",
+            "user_id": user_id,
+            "date": date,
+            "entry_text": entry_text,
+            "is_public": "true" if is_public else "false",
+            "created_at": now_jst.isoformat(),
+            "updated_at": now_jst.isoformat(),
+        }
+        if photo_url:
+            item["photo_url"] = photo_url
+
+        return self.put_item(item)
+
+    def get_entry(self, user_id: str, date: str) -> Optional[dict]:
+        return self._get(self._conn(), f"{user_id}#{date}")
+
+    def get_entries(self, user_id: str, dates: Sequence[str]) -> List[dict]:
+        """指定日のアイテムをまとめて取得（存在しない日は含めない）"""
+        keys = [f"{user_id}#{date}" for date in dates]
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn().execute(f"SELECT item FROM diary_entries WHERE pk IN ({placeholders})", keys)
+        return [json.loads(row[0]) for row in rows]
+
+    def update_entry(
+        self,
+        user_id: str,
+        date: str,
+        entry_text: Optional[str] = None,
+        is_public: Optional[bool] = None,
+        photo_url: Optional[str] = None,
+    ) -> dict:
+        key = f"{user_id}#{date}"
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_image = self._get(conn, key)
+                if old_image is None:
+                    raise KeyError(f"Entry not found: {key}")
+
+                item = dict(old_image)
+                jst = pytz.timezone('Asia/Tokyo')
+                item["updated_at"] = datetime.now(jst).isoformat()
+                if entry_text is not None:
+                    item["entry_text"] = entry_text
+                if is_public is not None:
+                    item["is_public"] = "true" if is_public else "false"
+                if photo_url is not None:
+                    item["photo_url"] = photo_url
+
+                self._write(conn, item)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._emit("MODIFY", old_image, dict(item))
+        return item
+
+    def delete_entry(self, user_id: str, date: str) -> None:
+        key = f"{user_id}#{date}"
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old_image = self._get(conn, key)
+                if old_image is not None:
+                    conn.execute("DELETE FROM diary_entries WHERE pk = ?", (key,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if old_image is not None:
+                self._emit("REMOVE", old_image, None)
+
+    def bulk_load(self, items: Iterable[Dict], batch_size: int = 10000) -> int:
+        """
+        アイテムを一括で保存（大量データの投入用）
+
+        batch_size 件ごとに1トランザクションで書き込む。変更通知は行わない
+
+        Returns:
+            保存した件数
+        """
+        loaded = 0
+        batch: List[tuple] = []
+        with self._write_lock:
+            conn = self._conn()
+
+            def flush():
+                conn.execute("BEGIN")
+                try:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO diary_entries (pk, user_id, date, is_public, item) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+            for item in items:
+                batch.append(
+                    (item["user_id#date"], item.get("user_id"), item["date"], item.get("is_public"), _dumps(item))
+                )
+                if len(batch) >= batch_size:
+                    flush()
+                    loaded += len(batch)
+                    batch = []
+            if batch:
+                flush()
+                loaded += len(batch)
+            conn.execute("ANALYZE")
+        return loaded
+
+    def count(self) -> int:
+        """保存されている日記の件数"""
+        return self._conn().execute("SELECT COUNT(*) FROM diary_entries").fetchone()[0]
+
+    def query(
+        self,
+        index_name: str,
+        partition_value: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        scan_forward: bool = True,
+        limit: Optional[int] = None,
+        exclusive_start_key: Optional[dict] = None,
+        attributes: Optional[Sequence[str]] = None,
+    ) -> dict:
+        """
+        GSI に対する Query を再現（InMemoryDatabase.query と同じ挙動）
+
+        Returns:
+            {"Items": [...], "LastEvaluatedKey": {...}}（続きがない場合は LastEvaluatedKey なし）
+        """
+        column = INDEX_PARTITION_KEYS[index_name]
+        sql = [f"SELECT item FROM diary_entries WHERE {column} = ?"]
+        params: list = [partition_value]
+        if start_date is not None:
+            sql.append("AND date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            sql.append("AND date <= ?")
+            params.append(end_date)
+        if exclusive_start_key:
+            sql.append("AND (date, pk) > (?, ?)" if scan_forward else "AND (date, pk) < (?, ?)")
+            params += [exclusive_start_key["date"], exclusive_start_key["user_id#date"]]
+        direction = "ASC" if scan_forward else "DESC"
+        sql.append(f"ORDER BY date {direction}, pk {direction}")
+        if limit:
+            sql.append("LIMIT ?")
+            params.append(limit)
+
+        items = [json.loads(row[0]) for row in self._conn().execute(" ".join(sql), params)]
+
+        response = {"Items": items}
+        if limit and len(items) >= limit:
+            last = items[-1]
+            response["LastEvaluatedKey"] = {
+                "user_id#date": last["user_id#date"],
+                column: last[column],
+                "date": last["date"],
+            }
+        if attributes:
+            response["Items"] = [
+                {attr: item[attr] for attr in attributes if attr in item} for item in response["Items"]
+            ]
+        return response
+
+    def query_month(self, user_id: str, year: int, month: int) -> list[dict]:
+        start_date, end_date = month_date_range(year, month)
+        return self.query("user_id-date-index", user_id, start_date, end_date)["Items"]
+
+    def query_public_entries_for_month(self, year: int, month: int) -> list[dict]:
+        start_date, end_date = month_date_range(year, month)
+        return self.query("is_public-date-index", "true", start_date, end_date)["Items"]
+
+    # ===== お題 =====
+    def put_prompt(self, item: dict) -> dict:
+        with self._write_lock:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO prompts (date, item) VALUES (?, ?)", (item["date"], _dumps(item))
+            )
+        return item
+
+    def get_prompt(self, date: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT item FROM prompts WHERE date = ?", (date,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_prompts(self, dates: Sequence[str]) -> List[dict]:
+        """指定日のお題（新しい順）"""
+        dates = sorted(set(dates))
+        if not dates:
+            return []
+        placeholders = ",".join("?" * len(dates))
+        rows = self._conn().execute(f"SELECT item FROM prompts WHERE date IN ({placeholders}) ORDER BY date DESC", dates)
+        return [json.loads(row[0]) for row in rows]
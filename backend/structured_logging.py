@@ -0,0 +1,192 @@
+"""
+構造化ログ（JSON 1行 / レコード）
+
+- 標準の logging を使い、メッセージは logger.debug("... %s", value) の形で遅延フォーマットする
+  （出力されないレコードは文字列化しない）
+- request_id はリクエストごとに contextvars で保持し、全レコードに付与する
+- DEBUG / INFO はリクエスト単位でサンプリングする（WARNING 以上は常に出力）
+  デバッグヘッダーの値が LOG_DEBUG_TOKEN と一致するリクエストは全レベルを出力する
+- 出力しないレベルは isEnabledFor の段階で除外するため、LogRecord も生成しない
+
+環境変数:
+- LOG_LEVEL: 通常出力する最小レベル（デフォルト: INFO）
+- LOG_DEBUG_SAMPLE_RATE: LOG_LEVEL に関わらず DEBUG も出力するリクエストの割合（デフォルト: 0）
+- LOG_INFO_SAMPLE_RATE: INFO を出力するリクエストの割合（デフォルト: 1）
+- LOG_DEBUG_HEADER: デバッグ出力を有効にするリクエストヘッダー（デフォルト: X-Debug-Log）
+- LOG_DEBUG_TOKEN: デバッグヘッダーの値がこれと一致する時のみ有効（未設定の場合はデバッグヘッダーを無視する）
+"""
+import contextlib
+import contextvars
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Dict, FrozenSet, Iterator, Optional
+
+LOG_LEVEL = logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO").upper())
+if not isinstance(LOG_LEVEL, int):
+    LOG_LEVEL = logging.INFO
+LOG_DEBUG_HEADER = os.environ.get("LOG_DEBUG_HEADER", "X-Debug-Log")
+LOG_DEBUG_TOKEN = os.environ.get("LOG_DEBUG_TOKEN", "")
+
+# レベルごとのサンプリング率（リクエスト単位で判定）
+SAMPLE_RATES = {
+    logging.DEBUG: float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0")),
+    logging.INFO: float(os.environ.get("LOG_INFO_SAMPLE_RATE", "1")),
+}
+
+ALL_LEVELS: FrozenSet[int] = frozenset({logging.DEBUG, logging.INFO})
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+# このリクエストで出力するサンプリング対象レベル（リクエスト外では LOG_LEVEL のみで判定）
+_sampled_levels: contextvars.ContextVar[Optional[FrozenSet[int]]] = contextvars.ContextVar(
+    "sampled_levels", default=None
+)
+
+# ログに含めないフィールド（誤って渡された場合もマスクする）
+REDACTED_FIELDS = frozenset({"authorization", "cookie", "set-cookie", "x-amz-security-token"})
+
+
+def redact_headers(headers: Optional[Dict]) -> Dict:
+    """認証情報を含むヘッダーの値をマスク"""
+    return {
+        key: "[REDACTED]" if key.lower() in REDACTED_FIELDS else value
+        for key, value in (headers or {}).items()
+    }
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def level_enabled(levelno: int) -> bool:
+    """現在のリクエスト（リクエスト外では LOG_LEVEL）でそのレベルが出力されるか"""
+    if levelno >= logging.WARNING:
+        return levelno >= LOG_LEVEL
+    levels = _sampled_levels.get()
+    if levels is None:
+        return levelno >= LOG_LEVEL
+    return levelno in levels
+
+
+def is_debug_enabled() -> bool:
+    """現在のリクエストで DEBUG が出力されるか（重いデバッグ情報の組み立てを省くため）"""
+    return level_enabled(logging.DEBUG)
+
+
+def _debug_header_requested(headers: Optional[Dict]) -> bool:
+    # トークンなしでは誰でもリクエストの詳細を DEBUG 出力させられるため、未設定時は無効
+    if not headers or not LOG_DEBUG_TOKEN:
+        return False
+    name = LOG_DEBUG_HEADER.lower()
+    value = next((v for k, v in headers.items() if k.lower() == name), None)
+    if not value:
+        return False
+    return hmac.compare_digest(value.encode("utf-8"), LOG_DEBUG_TOKEN.encode("utf-8"))
+
+
+def sample_levels(headers: Optional[Dict] = None, rng: random.Random = None) -> FrozenSet[int]:
+    """リクエストで出力するサンプリング対象レベルを決定"""
+    if _debug_header_requested(headers):
+        return ALL_LEVELS
+    draw = (rng or random).random
+
+    def sampled(rate: float) -> bool:
+        return rate >= 1 or (rate > 0 and draw() < rate)
+
+    levels = set()
+    if LOG_LEVEL <= logging.INFO and sampled(SAMPLE_RATES[logging.INFO]):
+        levels.add(logging.INFO)
+    if LOG_LEVEL <= logging.DEBUG or sampled(SAMPLE_RATES[logging.DEBUG]):
+        levels.add(logging.DEBUG)
+    return frozenset(levels)
+
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str], headers: Optional[Dict] = None) -> Iterator[None]:
+    """リクエストの処理中、request_id とサンプリング結果を保持"""
+    id_token = _request_id.set(request_id)
+    levels_token = _sampled_levels.set(sample_levels(headers))
+    try:
+        yield
+    finally:
+        _sampled_levels.reset(levels_token)
+        _request_id.reset(id_token)
+
+
+class SampledLogger(logging.Logger):
+    """リクエスト単位のサンプリング結果でレベルを判定するロガー"""
+
+    def isEnabledFor(self, level: int) -> bool:
+        return level_enabled(level)
+
+
+class JsonFormatter(logging.Formatter):
+    """1レコードを JSON 1行に変換"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = _request_id.get()
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            for key, value in fields.items():
+                entry[key] = "[REDACTED]" if key.lower() in REDACTED_FIELDS else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """常に現在の sys.stdout に出力（負荷試験などでの差し替えに追従）"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+_configured = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    アプリケーションのロガーを取得（初回に JSON ハンドラーを設定）
+
+    追加のフィールドは logger.info("...", extra={"fields": {...}}) で渡す
+    """
+    global _configured
+    root = logging.getLogger("family_diary")
+    if not _configured:
+        handler = _StdoutHandler()
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        # レベルの判定は SampledLogger が行う
+        root.setLevel(logging.DEBUG)
+        # Lambda ランタイムのルートロガーに重複出力しない
+        root.propagate = False
+        _configured = True
+
+    full_name = f"family_diary.{name}"
+    previous = logging.getLoggerClass()
+    logging.setLoggerClass(SampledLogger)
+    try:
+        logger = logging.getLogger(full_name)
+    finally:
+        logging.setLoggerClass(previous)
+    return logger
@@ -0,0 +1,17 @@
+"""
+バックエンドのテスト共通設定
+
+api_handler / database はインポート時に環境変数を読むため、インポートより先に設定する
+（AWS には接続せず、インメモリのデータベースを使う）
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
+os.environ["DIARY_DB_BACKEND"] = "memory"
+os.environ.setdefault("METRICS_ENABLED", "false")
@@ -0,0 +1,61 @@
+"""
+CloudFront 署名付き Cookie のテスト（生成した RSA 鍵でオフラインに検証）
+"""
+import base64
+import json
+
+import pytest
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+import cloudfront_signer
+
+DOMAIN = "d111111abcdef8.cloudfront.net"
+NOW = 1_700_000_000
+
+
+def cloudfront_b64decode(value: str) -> bytes:
+    """cloudfront_b64encode の逆変換（- → +, _ → =, ~ → /）"""
+    return base64.b64decode(value.replace("-", "+").replace("_", "=").replace("~", "/"))
+
+
+@pytest.fixture
+def private_key(monkeypatch):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode("ascii")
+    monkeypatch.setenv("CLOUDFRONT_PRIVATE_KEY", pem)
+    monkeypatch.setattr(cloudfront_signer, "CLOUDFRONT_PHOTO_DOMAIN", DOMAIN)
+    monkeypatch.setattr(cloudfront_signer, "CLOUDFRONT_KEY_PAIR_ID", "K2JCJMDEHXQW5F")
+    monkeypatch.setattr(cloudfront_signer, "_signer", None)
+    return key
+
+
+def test_cookies_are_scoped_to_the_user_prefix(private_key):
+    issued = cloudfront_signer.issue_photo_cookies("alice", now=NOW)
+
+    policy = json.loads(cloudfront_b64decode(issued["cookies"]["CloudFront-Policy"]))
+    statement = policy["Statement"][0]
+    assert statement["Resource"] == f"https://{DOMAIN}/photos/alice/*"
+    assert statement["Condition"]["DateLessThan"]["AWS:EpochTime"] == issued["expires_at"]
+    assert issued["expires_at"] == NOW + cloudfront_signer.CLOUDFRONT_COOKIE_TTL_SECONDS
+    assert issued["path"] == "/photos/alice/"
+    assert issued["cookies"]["CloudFront-Key-Pair-Id"] == "K2JCJMDEHXQW5F"
+
+
+def test_signature_verifies_against_the_public_key(private_key):
+    cookies = cloudfront_signer.issue_photo_cookies("alice", now=NOW)["cookies"]
+
+    policy = cloudfront_b64decode(cookies["CloudFront-Policy"])
+    signature = cloudfront_b64decode(cookies["CloudFront-Signature"])
+    # 署名が一致しない場合は InvalidSignature
+    private_key.public_key().verify(signature, policy, padding.PKCS1v15(), hashes.SHA1())
+    # ポリシーは空白なしの JSON（CloudFront はこのバイト列に対する署名を検証する）
+    assert b" " not in policy
+
+
+@pytest.mark.parametrize("username", ["alice/bob", "*", "al*ce", ""])
+def test_rejects_usernames_that_widen_the_resource(private_key, username):
+    with pytest.raises(ValueError):
+        cloudfront_signer.issue_photo_cookies(username, now=NOW)
@@ -0,0 +1,90 @@
+"""
+カレンダーのカーソルページング（encode_cursor / decode_cursor / _query_page）のテスト
+"""
+import json
+
+import pytest
+
+import api_handler
+from database import DiaryDatabase, decode_cursor, encode_cursor
+from models import DiaryEntry
+
+
+@pytest.fixture
+def db():
+    database = DiaryDatabase(None, None)
+    for day in range(1, 6):
+        database.save_diary_entry(DiaryEntry(
+            username="alice", date=f"2024-03-{day:02d}", content=f"day {day}", is_public=day % 2 == 1,
+        ))
+    database.save_diary_entry(DiaryEntry(username="bob", date="2024-03-02", content="bob", is_public=True))
+    return database
+
+
+def calendar_event(username, path, query=None):
+    return {
+        "httpMethod": "GET",
+        "path": path,
+        "headers": {},
+        "queryStringParameters": query,
+        "requestContext": {"authorizer": {"claims": {"cognito:username": username}}},
+    }
+
+
+def test_cursor_round_trips_through_query_month_page(db):
+    dates = []
+    cursor = None
+    for _ in range(10):
+        items, cursor = db.query_month_page("alice", 2024, 3, limit=2, cursor=cursor)
+        assert len(items) <= 2
+        dates.extend(item["date"] for item in items)
+        if cursor is None:
+            break
+        # 不透明な文字列（base64url、パディングなし）
+        assert isinstance(cursor, str) and "=" not in cursor
+    assert dates == [f"2024-03-{day:02d}" for day in range(1, 6)]
+
+
+def test_cursor_is_bound_to_the_index_it_was_issued_for(db):
+    _, public_cursor = db.query_public_entries_page(2024, 3, limit=1)
+    assert public_cursor is not None
+
+    with pytest.raises(ValueError):
+        db.query_month_page("alice", 2024, 3, limit=1, cursor=public_cursor)
+
+
+def test_cursor_is_bound_to_the_partition_and_month(db):
+    _, cursor = db.query_month_page("alice", 2024, 3, limit=1)
+
+    with pytest.raises(ValueError):
+        db.query_month_page("bob", 2024, 3, limit=1, cursor=cursor)
+    with pytest.raises(ValueError):
+        db.query_month_page("alice", 2024, 4, limit=1, cursor=cursor)
+
+
+@pytest.mark.parametrize("key", [
+    {"user_id#date": "alice#2024-03-01", "user_id": "alice"},
+    {"user_id#date": "alice#2024-03-01", "user_id": "alice", "date": "2024-03-01", "extra": "x"},
+    {"user_id#date": "bob#2024-03-01", "user_id": "alice", "date": "2024-03-01"},
+    {"user_id#date": "alice#2024-03-01", "user_id": "alice", "date": 20240301},
+])
+def test_decode_cursor_rejects_keys_that_do_not_match_the_index(key):
+    cursor = encode_cursor(key)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "user_id-date-index", "alice", "2024-03-01", "2024-03-31")
+
+
+def test_lambda_handler_returns_400_for_a_tampered_cursor(monkeypatch, db):
+    monkeypatch.setattr(api_handler, "db", db)
+    first = api_handler.lambda_handler(
+        calendar_event("alice", "/my/calendar/2024/3", {"limit": "2"}), None
+    )
+    assert first["statusCode"] == 200
+    cursor = json.loads(first["body"])["next_cursor"]
+    assert cursor
+
+    for tampered in (cursor[:-3] + "xyz", "not-base64!", encode_cursor({"user_id#date": "bob#2024-03-02"})):
+        response = api_handler.lambda_handler(
+            calendar_event("alice", "/my/calendar/2024/3", {"limit": "2", "cursor": tampered}), None
+        )
+        assert response["statusCode"] == 400
@@ -0,0 +1,142 @@
+"""
+日記の一括インポート（diary_import）のテスト
+"""
+import json
+
+import pytest
+
+import diary_import
+from database import BATCH_WRITE_MAX_ITEMS, DiaryDatabase
+
+
+@pytest.fixture
+def db():
+    database = DiaryDatabase(None, None)
+    database.batch_sizes = []
+    save = database.batch_save_diary_items
+
+    def recording_save(items):
+        database.batch_sizes.append(len(items))
+        return save(items)
+
+    database.batch_save_diary_items = recording_save
+    return database
+
+
+def ndjson(records):
+    return "\n".join(record if isinstance(record, str) else json.dumps(record) for record in records)
+
+
+def entry(day, **fields):
+    return {"date": f"2024-01-{day:02d}", "content": f"day {day}", **fields}
+
+
+def test_malformed_line_is_reported_without_aborting_the_rest(db):
+    body = ndjson([entry(1), '{"date": "2024-01-02", "content": ', entry(3)])
+
+    report = diary_import.import_diaries(db, "alice", body).to_dict()
+
+    assert report["total"] == 3
+    assert report["imported"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] == 2
+    assert db.get_diary_entry("alice", "2024-01-01")["content"] == "day 1"
+    assert db.get_diary_entry("alice", "2024-01-03")["content"] == "day 3"
+
+
+def test_invalid_record_reports_its_date(db):
+    body = ndjson([entry(1, is_public="yes"), entry(2)])
+
+    report = diary_import.import_diaries(db, "alice", body).to_dict()
+
+    assert report["imported"] == 1
+    assert report["errors"] == [
+        {"line": 1, "error": "is_public は true / false で指定してください", "date": "2024-01-01"}
+    ]
+
+
+def test_duplicate_date_keeps_the_later_line(db):
+    body = ndjson([entry(1, content="first"), entry(2), entry(1, content="second")])
+
+    report = diary_import.import_diaries(db, "alice", body).to_dict()
+
+    assert report["total"] == 3
+    assert report["imported"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] == 1
+    assert report["errors"][0]["date"] == "2024-01-01"
+    assert db.get_diary_entry("alice", "2024-01-01")["content"] == "second"
+
+
+def test_duplicate_date_across_flushed_batches(db):
+    records = [entry(1, content="first")] + [
+        {"date": f"2024-02-{day:02d}", "content": "x"} for day in range(1, BATCH_WRITE_MAX_ITEMS + 1)
+    ] + [entry(1, content="second")]
+
+    report = diary_import.import_diaries(db, "alice", ndjson(records)).to_dict()
+
+    # 1行目は25件目までのバッチで保存済みだが、最後の行で上書きされる
+    assert report["imported"] == BATCH_WRITE_MAX_ITEMS + 1
+    assert report["failed"] == 1
+    assert db.get_diary_entry("alice", "2024-01-01")["content"] == "second"
+
+
+def test_entries_over_the_cap_are_not_read(db, monkeypatch):
+    monkeypatch.setattr(diary_import, "IMPORT_MAX_ENTRIES", 3)
+    body = ndjson([entry(day) for day in range(1, 6)])
+
+    report = diary_import.import_diaries(db, "alice", body).to_dict()
+
+    assert report["truncated"] is True
+    assert report["total"] == 3
+    assert report["imported"] == 3
+    assert report["errors"][-1]["line"] == 4
+    assert db.get_diary_entry("alice", "2024-01-04") is None
+
+
+def test_json_array_body(db):
+    body = json.dumps([entry(1), entry(2, entry_text="from entry_text", content=None, is_public=True)], indent=2)
+
+    report = diary_import.import_diaries(db, "alice", body, "application/json").to_dict()
+
+    assert report == {"total": 2, "imported": 2, "failed": 0, "truncated": False, "errors": []}
+    saved = db.get_diary_entry("alice", "2024-01-02")
+    assert saved["content"] == "from entry_text"
+    assert saved["is_public"] == "true"
+
+
+def test_json_array_syntax_error_stops_at_the_broken_element(db):
+    body = '[{"date": "2024-01-01", "content": "ok"}, {"date": "2024-01-02", "content": }, ' \
+           '{"date": "2024-01-03", "content": "unread"}]'
+
+    report = diary_import.import_diaries(db, "alice", body).to_dict()
+
+    assert report["imported"] == 1
+    assert report["errors"][0]["line"] == 2
+    assert db.get_diary_entry("alice", "2024-01-03") is None
+
+
+def test_entries_are_flushed_every_batch_write_limit(db):
+    count = BATCH_WRITE_MAX_ITEMS * 2 + 3
+    body = ndjson([
+        {"date": f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}", "content": "x"} for day in range(count)
+    ])
+
+    report = diary_import.import_diaries(db, "alice", body).to_dict()
+
+    assert report["imported"] == count
+    assert db.batch_sizes == [BATCH_WRITE_MAX_ITEMS, BATCH_WRITE_MAX_ITEMS, 3]
+
+
+def test_failed_batch_is_reported_per_line(db):
+    def failing_save(items):
+        db.batch_sizes.append(len(items))
+        return items[:1]
+
+    db.batch_save_diary_items = failing_save
+
+    report = diary_import.import_diaries(db, "alice", ndjson([entry(1), entry(2)])).to_dict()
+
+    assert report["imported"] == 1
+    assert report["failed"] == 1
+    assert report["errors"][0]["line"] == 1
@@ -5,6 +5,7 @@
  */
 
 import { useState } from 'react'
+import { getCalendarPhotoUrl } from '../services/apiService'
 import './FamilyCalendar.css'
 
 export default function FamilyCalendar({
@@ -158,13 +159,13 @@ export default function FamilyCalendar({
                         </div>
                         <div className="entry-body">
                           <div className="entry-text">{entry.entry_text}</div>
-                          {entry.photo_url && (
+                          {getCalendarPhotoUrl(entry) && (
                             <div className="entry-photo">
                               <img
-                                src={entry.photo_url}
+                                src={getCalendarPhotoUrl(entry)}
                                 alt="日記の写真"
                                 onError={(e) => {
-                                  console.error('写真の読み込みエラー:', entry.photo_url)
+                                  console.error('写真の読み込みエラー:', getCalendarPhotoUrl(entry))
                                   e.target.style.display = 'none'
                                   const errorDiv = document.createElement('div')
                                   errorDiv.className = 'photo-error'
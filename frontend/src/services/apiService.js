@@ -4,6 +4,7 @@
 
 import { config } from '../config/awsConfig'
 import { getToken, signOut } from './authService'
+import { uploadPhotoPartsToS3, uploadPhotoToS3 } from './storageService'
 
 const API_ENDPOINT = config.apiEndpoint
 
@@ -65,13 +66,93 @@ const apiCall = async (path, options = {}) => {
   return await response.json()
 }
 
+// 写真閲覧用の CloudFront 署名付きCookie（cloudfront モード時のみ API が発行）
+// 期限の5分前に再発行する。cloudfront モードでない場合（404 など）は1分間問い合わせない
+const PHOTO_SESSION_REFRESH_MARGIN_SEC = 300
+const PHOTO_SESSION_RETRY_MS = 60 * 1000
+let photoSessionExpiresAt = 0
+let photoSessionRetryAt = 0
+let photoSessionPromise = null
+
+/**
+ * 発行された Cookie をサイトのドメインに設定
+ * 写真はサイトと同じ CloudFront 配信の /photos/ 配下のため、ページの JavaScript から設定できる
+ */
+const setPhotoCookies = ({ cookies, expires_at: expiresAt, domain, path }) => {
+  const hostname = window.location.hostname
+  let domainAttribute = ''
+  if (domain && domain !== hostname) {
+    if (!hostname.endsWith(`.${domain}`)) {
+      console.warn(`Photo cookies are for ${domain}, cannot set them from ${hostname}`)
+      return false
+    }
+    domainAttribute = `; Domain=${domain}`
+  }
+  const expires = new Date(expiresAt * 1000).toUTCString()
+  Object.entries(cookies).forEach(([name, value]) => {
+    document.cookie = `${name}=${value}; Path=${path}; Expires=${expires}; Secure; SameSite=Lax${domainAttribute}`
+  })
+  return true
+}
+
+/**
+ * 写真閲覧用の署名付きCookieを用意（有効な Cookie があれば何もしない）
+ * 失敗しても日記の取得は続ける（写真が表示されないだけ）
+ */
+export const ensurePhotoSession = async () => {
+  const now = Date.now()
+  if (now / 1000 < photoSessionExpiresAt - PHOTO_SESSION_REFRESH_MARGIN_SEC || now < photoSessionRetryAt) {
+    return
+  }
+  if (!photoSessionPromise) {
+    photoSessionPromise = apiCall('/photo/session', { method: 'GET' })
+      .then((issued) => {
+        if (setPhotoCookies(issued)) {
+          photoSessionExpiresAt = issued.expires_at
+        } else {
+          photoSessionRetryAt = Date.now() + PHOTO_SESSION_RETRY_MS
+        }
+      })
+      .catch(() => {
+        photoSessionRetryAt = Date.now() + PHOTO_SESSION_RETRY_MS
+      })
+      .finally(() => {
+        photoSessionPromise = null
+      })
+  }
+  await photoSessionPromise
+}
+
 /**
  * 日記エントリを取得
  */
 export const getDiaryEntry = async (date) => {
+  await ensurePhotoSession()
   return apiCall(`/diary/${date}`, { method: 'GET' })
 }
 
+/**
+ * 期間内の日記エントリをまとめて取得（週表示など、1リクエスト）
+ * @param {string} from - 開始日 (YYYY-MM-DD)
+ * @param {string} to - 終了日 (YYYY-MM-DD、最大62日間)
+ * @returns {Promise<{entries: Array}>} 日付順、日記がない日は含まれない
+ */
+export const getDiaryEntriesInRange = async (from, to) => {
+  await ensurePhotoSession()
+  const params = new URLSearchParams({ from, to })
+  return apiCall(`/diary?${params}`, { method: 'GET' })
+}
+
+/**
+ * 指定日の日記エントリをまとめて取得（前後の日など、最大100件）
+ * @param {string[]} dates - 日付 (YYYY-MM-DD) の配列
+ */
+export const getDiaryEntriesForDates = async (dates) => {
+  await ensurePhotoSession()
+  const params = new URLSearchParams({ dates: dates.join(',') })
+  return apiCall(`/diary?${params}`, { method: 'GET' })
+}
+
 /**
  * 日記エントリを作成・更新
  */
@@ -86,6 +167,41 @@ export const saveDiaryEntry = async (date, entryText, isPublic, photoUrl = null)
   })
 }
 
+/**
+ * 既存の日記の一部の項目のみを更新（自動保存・公開設定の切り替えなど）
+ * @param {Object} changes - entry_text / mood / weather / is_public / photo_url のうち変更した項目
+ * @returns {Promise<Object>} 更新後の日記（getDiaryEntry と同じ形式）。日記がない場合は 404
+ */
+export const patchDiaryEntry = async (date, changes) => {
+  return apiCall(`/diary/${date}`, {
+    method: 'PATCH',
+    body: JSON.stringify(changes),
+  })
+}
+
+/**
+ * 全日記をエクスポート（バックアップ用）
+ * @returns {Promise<{url: string, filename: string, expires_in: number, count: number, bytes: number}>}
+ *   url は NDJSON ファイルの署名付きダウンロードURL（expires_in 秒有効）
+ */
+export const exportDiaryEntries = async () => {
+  return apiCall('/diary/export', { method: 'GET' })
+}
+
+/**
+ * 日記を一括インポート（他のアプリからの移行用）
+ * @param {Array<Object>} entries - {date, content, mood, weather, is_public, created_at} の配列（最大5000件）
+ * @returns {Promise<{total: number, imported: number, failed: number, truncated: boolean, errors: Array}>}
+ */
+export const importDiaryEntries = async (entries) => {
+  const body = entries.map((entry) => JSON.stringify(entry)).join('\n')
+  return apiCall('/diary/import', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/x-ndjson' },
+    body,
+  })
+}
+
 /**
  * 日記エントリを削除
  */
@@ -93,46 +209,91 @@ export const deleteDiaryEntry = async (date) => {
   return apiCall(`/diary/${date}`, { method: 'DELETE' })
 }
 
+// これより大きい写真はマルチパートでアップロードする（S3 のパートの最小サイズ）
+const MULTIPART_THRESHOLD = 5 * 1024 * 1024
+
 /**
- * 写真をアップロード
+ * 写真をアップロード（S3 に直接アップロードし、日記に添付）
+ * 1. 署名付き POST を取得 → 2. S3 にフォーム送信 → 3. アップロードを確認
+ * 大きな写真はマルチパート（uploadPhotoMultipart）
+ * @returns {Promise<{photo_url: string, photo_key: string, attached: boolean}>}
  */
 export const uploadPhoto = async (date, file) => {
-  const reader = new FileReader()
-  return new Promise((resolve, reject) => {
-    reader.onload = async (e) => {
-      // Data URLからBase64部分を抽出
-      const base64Data = e.target.result.split(',')[1]
-      try {
-        const response = await apiCall(`/diary/${date}/photo`, {
-          method: 'POST',
-          body: JSON.stringify({
-            image: base64Data,
-          }),
-        })
-        resolve(response)
-      } catch (error) {
-        reject(error)
-      }
+  if (file.size > MULTIPART_THRESHOLD) {
+    return uploadPhotoMultipart(date, file)
+  }
+  const upload = await getPhotoPresignedUrl(date, file)
+  const photoKey = await uploadPhotoToS3(upload, file)
+  return confirmPhotoUpload(date, photoKey)
+}
+
+/**
+ * 大きな写真をマルチパートでアップロードし、日記に添付
+ * パートの送信に失敗した場合は、アップロード済みのパートを残したまま URL を取り直して1回だけ再開する
+ */
+export const uploadPhotoMultipart = async (date, file) => {
+  const path = `/diary/${date}/photo/multipart`
+  let upload = await apiCall(path, {
+    method: 'POST',
+    body: JSON.stringify({ content_type: file.type || 'image/jpeg', size: file.size }),
+  })
+  const { photo_key, upload_id } = upload
+
+  let parts
+  try {
+    parts = await uploadPhotoPartsToS3(upload, file)
+  } catch (error) {
+    console.warn('Resuming multipart upload:', error)
+    upload = await apiCall(path, {
+      method: 'POST',
+      body: JSON.stringify({ photo_key, upload_id, size: file.size }),
+    })
+    try {
+      parts = await uploadPhotoPartsToS3(upload, file)
+    } catch (retryError) {
+      await apiCall(`${path}/abort`, {
+        method: 'POST',
+        body: JSON.stringify({ photo_key, upload_id }),
+      }).catch(() => {})
+      throw retryError
     }
-    reader.onerror = () => reject(new Error('Failed to read file'))
-    reader.readAsDataURL(file)
+  }
+
+  return apiCall(`${path}/complete`, {
+    method: 'POST',
+    body: JSON.stringify({ photo_key, upload_id, parts }),
+  })
+}
+
+/**
+ * 写真アップロード用の署名付き POST を取得
+ * @returns {Promise<{url: string, fields: Object, photo_key: string, expires_in: number, max_bytes: number}>}
+ */
+export const getPhotoPresignedUrl = async (date, file) => {
+  return apiCall(`/diary/${date}/photo`, {
+    method: 'POST',
+    body: JSON.stringify({
+      content_type: file.type || 'image/jpeg',
+      size: file.size,
+    }),
   })
 }
 
 /**
- * 写真アップロード用プリサイン URL を取得
+ * S3 にアップロードした写真を確認し、日記に添付
  */
-export const getPhotoPresignedUrl = async (date) => {
-  const response = await apiCall(`/diary/${date}/photo`, {
+export const confirmPhotoUpload = async (date, photoKey) => {
+  return apiCall(`/diary/${date}/photo/confirm`, {
     method: 'POST',
+    body: JSON.stringify({ photo_key: photoKey }),
   })
-  return response
 }
 
 /**
  * 家族カレンダーを取得（月間・公開日記のみ）
  */
 export const getFamilyCalendar = async (year, month) => {
+  await ensurePhotoSession()
   return apiCall(`/family/calendar/${year}/${month}`, { method: 'GET' })
 }
 
@@ -140,9 +301,26 @@ export const getFamilyCalendar = async (year, month) => {
  * 自分のカレンダーを取得（月間・公開/非公開すべて）
  */
 export const getMyCalendar = async (year, month) => {
+  await ensurePhotoSession()
   return apiCall(`/my/calendar/${year}/${month}`, { method: 'GET' })
 }
 
+/**
+ * カレンダーの写真の表示URL
+ * redirect モードでは photo_url の代わりに photo_ref（署名付きの参照）が返るため、
+ * <img src> で直接読み込める GET /photo/{ref} の URL に変換する（認可は ref の署名で行う）
+ */
+export const getCalendarPhotoUrl = (entry) => {
+  if (entry.photo_url) {
+    return entry.photo_url
+  }
+  if (!entry.photo_ref) {
+    return ''
+  }
+  const baseUrl = API_ENDPOINT.endsWith('/') ? API_ENDPOINT.slice(0, -1) : API_ENDPOINT
+  return `${baseUrl}/photo/${entry.photo_ref}`
+}
+
 /**
  * ヘルスチェック
  */
@@ -4,31 +4,70 @@
  */
 
 /**
- * 写真を S3 にアップロード（プリサイン URL を使用）
- * プリサイン URL はバックエンドで生成
+ * 写真を S3 にアップロード（署名付き POST を使用）
+ * 署名付き POST（url / fields / photo_key）はバックエンドの POST /diary/{date}/photo で取得
+ * @returns {Promise<string>} アップロードした写真の S3 キー
  */
-export const uploadPhotoToS3 = async (presignedUrl, photoKey, file) => {
+export const uploadPhotoToS3 = async (upload, file) => {
   try {
-    const response = await fetch(presignedUrl, {
-      method: 'PUT',
-      body: file,
-      // ヘッダーを送信しない（署名検証との一貫性を保つ）
+    const form = new FormData()
+    Object.entries(upload.fields).forEach(([name, value]) => form.append(name, value))
+    // file はポリシーの検証のため最後に追加する
+    form.append('file', file)
+
+    const response = await fetch(upload.url, {
+      method: 'POST',
+      body: form,
     })
 
     if (!response.ok) {
       throw new Error(`Upload failed: ${response.status}`)
     }
 
-    // S3 URL を返す（CloudFrontは写真バケットを経由しない）
-    const bucketName = presignedUrl.split('.s3.')[0].split('//')[1]
-    const s3Url = `https://${bucketName}.s3.amazonaws.com/${photoKey}`
-    return s3Url
+    return upload.photo_key
   } catch (error) {
     console.error('Upload photo error:', error)
     throw error
   }
 }
 
+/**
+ * 写真を S3 にマルチパートアップロード（パートを並列に PUT し、失敗したパートのみ再送）
+ * パートの署名付き URL はバックエンドの POST /diary/{date}/photo/multipart で取得
+ * @param {Object} upload - {part_size, parts: [{part_number, url}], uploaded: [{part_number, etag}]}
+ * @returns {Promise<Array<{part_number: number, etag: string}>>} 完了リクエストに渡すパート一覧
+ */
+export const uploadPhotoPartsToS3 = async (upload, file, { concurrency = 4, retries = 3 } = {}) => {
+  const completed = upload.uploaded.map(({ part_number, etag }) => ({ part_number, etag }))
+  const queue = [...upload.parts]
+
+  const uploadPart = async ({ part_number, url }) => {
+    const start = (part_number - 1) * upload.part_size
+    const body = file.slice(start, start + upload.part_size)
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const response = await fetch(url, { method: 'PUT', body })
+        if (!response.ok) {
+          throw new Error(`Upload part ${part_number} failed: ${response.status}`)
+        }
+        // ETag は S3 バケットの CORS 設定で公開している
+        return { part_number, etag: response.headers.get('ETag') }
+      } catch (error) {
+        if (attempt >= retries) throw error
+        await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** attempt))
+      }
+    }
+  }
+
+  const worker = async () => {
+    while (queue.length > 0) {
+      completed.push(await uploadPart(queue.shift()))
+    }
+  }
+  await Promise.all(Array.from({ length: Math.min(concurrency, queue.length) }, worker))
+  return completed.sort((a, b) => a.part_number - b.part_number)
+}
+
 /**
  * S3 から写真を削除
  * 注：バックエンドで削除エンドポイントを実装予定
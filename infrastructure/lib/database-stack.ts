@@ -68,20 +68,6 @@ export class DatabaseStack extends cdk.Stack {
       timeToLiveAttribute: 'expireAt',  // Auto-delete old prompts after 30 days
     });
 
-    // Add GSI to query prompts by date range (for fetching recent prompts)
-    this.diaryPromptsTable.addGlobalSecondaryIndex({
-      indexName: 'createdAt-index',
-      partitionKey: {
-        name: 'createdAt',
-        type: dynamodb.AttributeType.STRING,
-      },
-      sortKey: {
-        name: 'date',
-        type: dynamodb.AttributeType.STRING,
-      },
-      projectionType: dynamodb.ProjectionType.ALL,
-    });
-
     // Outputs
     new cdk.CfnOutput(this, 'TableName', {
       value: this.diaryTable.tableName,
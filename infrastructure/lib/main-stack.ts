@@ -10,6 +10,8 @@ import { S3BucketOrigin } from 'aws-cdk-lib/aws-cloudfront-origins';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as events from 'aws-cdk-lib/aws-events';
 import * as targets from 'aws-cdk-lib/aws-events-targets';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
+import * as s3n from 'aws-cdk-lib/aws-s3-notifications';
 import * as path from 'path';
 
 /**
@@ -85,6 +87,8 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       pointInTimeRecoverySpecification: {
         pointInTimeRecoveryEnabled: false,
       },
+      // 家族カレンダーの月次ドキュメント更新用
+      stream: dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
     });
 
     // Add GSI for querying by user_id and date
@@ -131,6 +135,22 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       timeToLiveAttribute: 'expireAt',  // Auto-delete old prompts after 30 days
     });
 
+    // === DynamoDB Table for Family Calendar Month Documents ===
+    // (家族, 年月) ごとに公開エントリを1アイテムにまとめたマテリアライズドビュー
+    const calendarMonthsTable = new dynamodb.Table(this, 'CalendarMonthsTable', {
+      tableName: 'diary_calendar_months',
+      partitionKey: {
+        name: 'family_month',
+        type: dynamodb.AttributeType.STRING,  // {family_id}#YYYY-MM
+      },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+      encryption: dynamodb.TableEncryption.AWS_MANAGED,
+      pointInTimeRecoverySpecification: {
+        pointInTimeRecoveryEnabled: false,
+      },
+    });
+
     // === S3 Bucket for Photos ===
     const photoBucket = new s3.Bucket(this, 'PhotoBucket', {
       encryption: s3.BucketEncryption.S3_MANAGED,
@@ -143,9 +163,24 @@ export class FamilyDiaryMainStack extends cdk.Stack {
           allowedMethods: [s3.HttpMethods.GET, s3.HttpMethods.PUT, s3.HttpMethods.POST],
           allowedOrigins: ['*'],
           allowedHeaders: ['*'],
+          // マルチパートアップロードの完了にはパートごとの ETag が必要
+          exposedHeaders: ['ETag'],
           maxAge: 3000,
         },
       ],
+      lifecycleRules: [
+        {
+          // 日記のエクスポート（GET /diary/export）は一時的なダウンロード用
+          prefix: 'exports/',
+          expiration: cdk.Duration.days(1),
+          abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
+        },
+        {
+          // 完了・中止されなかった写真のマルチパートアップロード（パートの保存料金がかかり続けるため）
+          prefix: 'photos/',
+          abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
+        },
+      ],
     });
 
     // === Lambda Function ===
@@ -164,6 +199,8 @@ export class FamilyDiaryMainStack extends cdk.Stack {
           '*.pyc',
           '.venv',
           'layers',
+          'benchmarks',
+          'tests',
         ],
       }),
       timeout: cdk.Duration.seconds(30),
@@ -171,6 +208,7 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       environment: {
         DYNAMODB_TABLE_NAME: diaryTable.tableName,
         DYNAMODB_PROMPTS_TABLE_NAME: diaryPromptsTable.tableName,
+        DYNAMODB_CALENDAR_TABLE_NAME: calendarMonthsTable.tableName,
         PHOTO_BUCKET_NAME: photoBucket.bucketName,
         COGNITO_USER_POOL_ID: userPool.userPoolId,
         COGNITO_CLIENT_ID: userPoolClient.userPoolClientId,
@@ -185,6 +223,7 @@ export class FamilyDiaryMainStack extends cdk.Stack {
     // Grant permissions
     diaryTable.grantReadWriteData(diaryFunction);
     diaryPromptsTable.grantReadWriteData(diaryFunction);
+    calendarMonthsTable.grantReadData(diaryFunction);
     photoBucket.grantReadWrite(diaryFunction);
     diaryFunction.addToRolePolicy(
       new iam.PolicyStatement({
@@ -193,6 +232,47 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       })
     );
 
+    // === Lambda Function for Calendar Month Documents (DynamoDB Streams) ===
+    const calendarProjectionFunction = new lambda.Function(this, 'CalendarProjectionFunction', {
+      functionName: 'family-diary-calendar-projection',
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'calendar_projection.stream_handler',
+      code: lambda.Code.fromAsset(path.join(__dirname, '../../backend'), {
+        exclude: [
+          'auth.py',
+          'main.py',
+          'api_handler.py',
+          'lambda_handler.py',
+          'prompt_generator_lambda.py',
+          'requirements.txt',
+          'requirements-lambda.txt',
+          '__pycache__',
+          '*.pyc',
+          '.venv',
+          'layers',
+          'benchmarks',
+          'tests',
+        ],
+      }),
+      timeout: cdk.Duration.seconds(60),
+      memorySize: 256,
+      environment: {
+        DYNAMODB_TABLE_NAME: diaryTable.tableName,
+        DYNAMODB_CALENDAR_TABLE_NAME: calendarMonthsTable.tableName,
+      },
+    });
+
+    diaryTable.grantReadData(calendarProjectionFunction);
+    calendarMonthsTable.grantReadWriteData(calendarProjectionFunction);
+    calendarProjectionFunction.addEventSource(
+      new lambdaEventSources.DynamoEventSource(diaryTable, {
+        startingPosition: lambda.StartingPosition.TRIM_HORIZON,
+        batchSize: 100,
+        bisectBatchOnError: true,
+        retryAttempts: 5,
+      })
+    );
+
     // === Create Python Dependencies Layer ===
     const pythonDependenciesLayer = new lambda.LayerVersion(this, 'PythonDependenciesLayer', {
       code: lambda.Code.fromAsset(path.join(__dirname, '../../backend'), {
@@ -208,6 +288,56 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       description: 'Python dependencies for Lambda functions',
     });
 
+    // API の Lambda でも依存パッケージ（brotli 圧縮、CloudFront 署名の cryptography など）を使う
+    diaryFunction.addLayers(pythonDependenciesLayer);
+
+    // === Lambda Function for Photo Renditions (S3 ObjectCreated) ===
+    // photos/ 配下の写真からサムネイル・中サイズの縮小版を作成（Pillow は依存パッケージレイヤー）
+    const photoThumbnailFunction = new lambda.Function(this, 'PhotoThumbnailFunction', {
+      functionName: 'family-diary-photo-thumbnails',
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'photo_thumbnails.s3_event_handler',
+      code: lambda.Code.fromAsset(path.join(__dirname, '../../backend'), {
+        exclude: [
+          'auth.py',
+          'main.py',
+          'api_handler.py',
+          'lambda_handler.py',
+          'prompt_generator_lambda.py',
+          'requirements.txt',
+          'requirements-lambda.txt',
+          '__pycache__',
+          '*.pyc',
+          '.venv',
+          'layers',
+          'benchmarks',
+          'tests',
+        ],
+      }),
+      layers: [pythonDependenciesLayer],
+      timeout: cdk.Duration.seconds(60),
+      // 画像のデコードはメモリ（と比例して割り当てられる CPU）に依存する
+      memorySize: 1024,
+      environment: {
+        DYNAMODB_TABLE_NAME: diaryTable.tableName,
+        PHOTO_BUCKET_NAME: photoBucket.bucketName,
+      },
+    });
+
+    diaryTable.grantReadWriteData(photoThumbnailFunction);
+    photoBucket.grantReadWrite(photoThumbnailFunction);
+    // 元の写真の拡張子（photo_upload.PHOTO_CONTENT_TYPES）ごとに通知する。
+    // 縮小版（*.thumb.jpeg / *.medium.jpeg）も photos/ 配下に保存されるが、拡張子が異なるため
+    // 関数は起動しない（ハンドラーも縮小版のキーを無視する）
+    const photoThumbnailDestination = new s3n.LambdaDestination(photoThumbnailFunction);
+    for (const extension of ['jpg', 'png', 'webp', 'heic', 'gif']) {
+      photoBucket.addEventNotification(
+        s3.EventType.OBJECT_CREATED,
+        photoThumbnailDestination,
+        { prefix: 'photos/', suffix: `.${extension}` }
+      );
+    }
+
     // === Lambda Function for Daily Prompt Generation ===
     const promptGeneratorFunction = new lambda.Function(this, 'PromptGeneratorFunction', {
       functionName: 'family-diary-prompt-generator',
@@ -225,6 +355,8 @@ export class FamilyDiaryMainStack extends cdk.Stack {
           '*.pyc',
           '.venv',
           'layers',
+          'benchmarks',
+          'tests',
         ],
       }),
       layers: [pythonDependenciesLayer],
@@ -284,6 +416,10 @@ export class FamilyDiaryMainStack extends cdk.Stack {
     const api = new apigateway.RestApi(this, 'DiaryApiV2', {
       restApiName: 'Family Diary API v2',
       description: 'API for Family Diary Application',
+      // Lambda が gzip/br 圧縮した base64 ボディをバイナリとして返すため
+      // （リクエストボディも base64 で届くため api_handler 側でデコードする。
+      //   CORS プリフライトの MOCK 統合は下でテキスト扱いに戻す）
+      binaryMediaTypes: ['*/*'],
       deployOptions: {
         stageName: 'prod',
         tracingEnabled: true,
@@ -302,6 +438,7 @@ export class FamilyDiaryMainStack extends cdk.Stack {
         allowHeaders: [
           'Content-Type',
           'Authorization',
+          'If-None-Match',
         ],
         allowCredentials: true,
       },
@@ -318,6 +455,11 @@ export class FamilyDiaryMainStack extends cdk.Stack {
 
     // Diary endpoints (認証必要)
     const diary = api.root.addResource('diary');
+    // 複数日の日記取得（?from=&to= / ?dates=）
+    diary.addMethod('GET', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
     const diaryDate = diary.addResource('{date}');
     diaryDate.addMethod('GET', lambdaIntegration, {
       authorizer: authorizer,
@@ -327,17 +469,54 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       authorizer: authorizer,
       authorizationType: apigateway.AuthorizationType.COGNITO,
     });
+    // 部分更新（変更した項目のみ）
+    diaryDate.addMethod('PATCH', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
     diaryDate.addMethod('DELETE', lambdaIntegration, {
       authorizer: authorizer,
       authorizationType: apigateway.AuthorizationType.COGNITO,
     });
 
+    // Export endpoint (認証必要、NDJSON を S3 に出力して署名付きURLを返す)
+    const diaryExport = diary.addResource('export');
+    diaryExport.addMethod('GET', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
+
+    // Bulk import endpoint (認証必要、JSON 配列 / NDJSON)
+    const diaryImport = diary.addResource('import');
+    diaryImport.addMethod('POST', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
+
     // Photo upload endpoint (認証必要)
     const photo = diaryDate.addResource('photo');
     photo.addMethod('POST', lambdaIntegration, {
       authorizer: authorizer,
       authorizationType: apigateway.AuthorizationType.COGNITO,
     });
+    // S3 に直接アップロードした写真の確認・添付
+    const photoConfirm = photo.addResource('confirm');
+    photoConfirm.addMethod('POST', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
+    // 大きな写真のマルチパートアップロード（開始・再開 / 完了 / 中止）
+    const photoMultipart = photo.addResource('multipart');
+    photoMultipart.addMethod('POST', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
+    for (const action of ['complete', 'abort']) {
+      photoMultipart.addResource(action).addMethod('POST', lambdaIntegration, {
+        authorizer: authorizer,
+        authorizationType: apigateway.AuthorizationType.COGNITO,
+      });
+    }
 
     // Family calendar endpoint (認証必要)
     const family = api.root.addResource('family');
@@ -359,6 +538,19 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       authorizationType: apigateway.AuthorizationType.COGNITO,
     });
 
+    // Photo redirect endpoint (認証不要) - GET /photo/{ref} → 署名付きURLへ302
+    // <img src> から読み込むため Authorization を送れない。ref 自体が閲覧者ごとの HMAC 署名付きトークン
+    const photoRedirect = api.root.addResource('photo');
+    const photoRef = photoRedirect.addResource('{ref}');
+    photoRef.addMethod('GET', lambdaIntegration);
+
+    // Photo session endpoint (認証必要) - CloudFront 署名付きCookieの発行
+    const photoSession = photoRedirect.addResource('session');
+    photoSession.addMethod('GET', lambdaIntegration, {
+      authorizer: authorizer,
+      authorizationType: apigateway.AuthorizationType.COGNITO,
+    });
+
     // Daily Prompt endpoint (認証必要)
     const promptResource = api.root.addResource('prompt');
     promptResource.addMethod('GET', lambdaIntegration, {
@@ -366,6 +558,18 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       authorizationType: apigateway.AuthorizationType.COGNITO,
     });
 
+    // === CORS プリフライト（OPTIONS）の MOCK 統合 ===
+    // binaryMediaTypes が */* のため、そのままではプリフライトのリクエストもバイナリとして扱われ、
+    // MOCK 統合のマッピングテンプレートが適用できず 500 になる。テキストに変換して処理させる
+    for (const method of api.methods) {
+      if (method.httpMethod === 'OPTIONS') {
+        (method.node.defaultChild as apigateway.CfnMethod).addPropertyOverride(
+          'Integration.ContentHandling',
+          'CONVERT_TO_TEXT'
+        );
+      }
+    }
+
     // === Gateway Responses for CORS on Auth Errors ===
     // 401 Unauthorizedレスポンスに明示的にCORSヘッダーを追加
     api.addGatewayResponse('Unauthorized', {
@@ -374,7 +578,7 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       responseHeaders: {
         'Access-Control-Allow-Origin': "'http://localhost:5174', 'https://d1l985y7ocpo2p.cloudfront.net'",
         'Access-Control-Allow-Headers': "'Content-Type,Authorization'",
-        'Access-Control-Allow-Methods': "'GET,POST,DELETE,OPTIONS'",
+        'Access-Control-Allow-Methods': "'GET,POST,PATCH,DELETE,OPTIONS'",
         'Access-Control-Allow-Credentials': "'true'",
       },
     });
@@ -386,7 +590,7 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       responseHeaders: {
         'Access-Control-Allow-Origin': "'https://d1l985y7ocpo2p.cloudfront.net'",
         'Access-Control-Allow-Headers': "'Content-Type,Authorization'",
-        'Access-Control-Allow-Methods': "'GET,POST,DELETE,OPTIONS'",
+        'Access-Control-Allow-Methods': "'GET,POST,PATCH,DELETE,OPTIONS'",
         'Access-Control-Allow-Credentials': "'true'",
       },
     });
@@ -452,6 +656,24 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       })
     );
 
+    // === CloudFront 署名付きCookie（オプション） ===
+    // cdk deploy -c photoSigningPublicKey="$(cat public_key.pem)" -c photoSigningPrivateKeyParameter=/family-diary/cloudfront-private-key
+    // 指定時のみ photos/* を署名付きCookie必須にする。API を cloudfront モードで動かすには
+    // さらに -c photoUrlMode=cloudfront を指定する（未指定時は従来どおり S3 の署名付きURLを返す）
+    const photoSigningPublicKey = this.node.tryGetContext('photoSigningPublicKey');
+    const photoSigningPrivateKeyParameter = this.node.tryGetContext('photoSigningPrivateKeyParameter');
+    let photoKeyGroup: cloudfront.KeyGroup | undefined;
+    let photoPublicKey: cloudfront.PublicKey | undefined;
+    if (photoSigningPublicKey && photoSigningPrivateKeyParameter) {
+      photoPublicKey = new cloudfront.PublicKey(this, 'PhotoSigningPublicKey', {
+        encodedKey: photoSigningPublicKey,
+        comment: 'Family Diary photo signed cookies',
+      });
+      photoKeyGroup = new cloudfront.KeyGroup(this, 'PhotoSigningKeyGroup', {
+        items: [photoPublicKey],
+      });
+    }
+
     const distribution = new cloudfront.Distribution(this, 'Distribution', {
       defaultBehavior: {
         origin: S3BucketOrigin.withOriginAccessIdentity(websiteBucket, {
@@ -473,6 +695,7 @@ export class FamilyDiaryMainStack extends cdk.Stack {
           cachedMethods: cloudfront.CachedMethods.CACHE_GET_HEAD_OPTIONS,
           cachePolicy: cloudfront.CachePolicy.CACHING_OPTIMIZED,
           compress: true,
+          trustedKeyGroups: photoKeyGroup ? [photoKeyGroup] : undefined,
         },
       },
       defaultRootObject: 'index.html',
@@ -495,6 +718,40 @@ export class FamilyDiaryMainStack extends cdk.Stack {
       comment: 'Family Diary Website Distribution',
     });
 
+    const photoUrlMode = this.node.tryGetContext('photoUrlMode');
+    if (photoUrlMode === 'cloudfront' && photoPublicKey && photoSigningPrivateKeyParameter) {
+      diaryFunction.addEnvironment('PHOTO_URL_MODE', 'cloudfront');
+      diaryFunction.addEnvironment('CLOUDFRONT_PHOTO_DOMAIN', distribution.distributionDomainName);
+      diaryFunction.addEnvironment('CLOUDFRONT_KEY_PAIR_ID', photoPublicKey.publicKeyId);
+      diaryFunction.addEnvironment('CLOUDFRONT_PRIVATE_KEY_PARAMETER', photoSigningPrivateKeyParameter);
+      // 署名の cryptography は依存パッケージレイヤー（API の Lambda に付与済み）
+      diaryFunction.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ['ssm:GetParameter'],
+          resources: [
+            `arn:aws:ssm:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:parameter${photoSigningPrivateKeyParameter}`,
+          ],
+        })
+      );
+    }
+
+    // === 写真のリダイレクト（オプション） ===
+    // cdk deploy -c photoUrlMode=redirect -c photoRefSecretParameter=/family-diary/photo-ref-secret
+    // （SSM SecureString に十分に長いランダムな文字列を保存しておく）
+    const photoRefSecretParameter = this.node.tryGetContext('photoRefSecretParameter');
+    if (photoUrlMode === 'redirect' && photoRefSecretParameter) {
+      diaryFunction.addEnvironment('PHOTO_URL_MODE', 'redirect');
+      diaryFunction.addEnvironment('PHOTO_REF_SECRET_PARAMETER', photoRefSecretParameter);
+      diaryFunction.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ['ssm:GetParameter'],
+          resources: [
+            `arn:aws:ssm:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:parameter${photoRefSecretParameter}`,
+          ],
+        })
+      );
+    }
+
     // === Outputs ===
     new cdk.CfnOutput(this, 'ApiEndpoint', {
       value: api.url,